@@ -0,0 +1,127 @@
+# bench_modbus.py – polling cost of the commissioning check's Modbus paths
+# -----------------------------------------------------------------------------------------
+# • Runs against drive_sim (started in-process): --spoc / --triol drives with the given
+#   latency and failure mix
+# • per-reg = what the dashboard did before: new ModbusTcpClient per drive, one
+#   read_holding_registers per parameter, drives one after the other
+# • pooled  = drive_modbus.ClientPool + coalesced block reads, drives one after the other
+# • fleet   = drive_modbus.poll_fleet (asyncio client), timed for several concurrencies
+# • Reports wall time, drives/s, per-drive latency, failed drives and Modbus requests sent
+#
+#   python bench_modbus.py                                   # 10 SPOC + 10 Triol, 20 ms
+#   python bench_modbus.py --spoc 50 --triol 50 --concurrency 8 32 100 --drop-rate 0.01
+
+import argparse
+import asyncio
+import logging
+import time
+
+import numpy as np
+from pymodbus.client import ModbusTcpClient
+
+import drive_modbus
+import drive_sim
+
+HOST = "127.0.0.1"
+
+
+def per_register_run(drives: list, timeout: float) -> dict:
+    """The previous handler: connect, one read per parameter, close – drive by drive."""
+    lat, failed = [], 0
+    t0 = time.perf_counter()
+    for drive, port in drives:
+        t = time.perf_counter()
+        client = ModbusTcpClient(HOST, port=port, timeout=timeout, retries=0)
+        try:
+            if not client.connect():
+                raise ConnectionError(port)
+            for addr, count in drive_sim.DRIVES[drive][0].values():
+                client.read_holding_registers(addr, count=count, device_id=1)
+        except Exception:
+            failed += 1
+        finally:
+            client.close()
+        lat.append(time.perf_counter() - t)
+    return {"wall": time.perf_counter() - t0, "lat": np.array(lat), "failed": failed}
+
+
+def pooled_run(drives: list, timeout: float, rounds: int = 2) -> dict:
+    """ClientPool + block plans; the first round pays the connects, later ones reuse them."""
+    pool = drive_modbus.ClientPool(timeout=timeout)
+    plans = {d: drive_modbus.plan_blocks(m) for d, (m, _) in drive_sim.DRIVES.items()}
+    lat, failed = [], 0
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for drive, port in drives:
+            t = time.perf_counter()
+            try:
+                pool.call(HOST, port, lambda c: drive_modbus.read_blocks(plans[drive], c))
+            except Exception:
+                failed += 1
+            lat.append(time.perf_counter() - t)
+    wall = (time.perf_counter() - t0) / rounds
+    pool.close()
+    return {"wall": wall, "lat": np.array(lat), "failed": failed / rounds}
+
+
+def fleet_run(drives: list, concurrency: int, timeout: float) -> dict:
+    jobs = [(HOST, port, drive_sim.DRIVES[drive][0]) for drive, port in drives]
+    t0 = time.perf_counter()
+    res = asyncio.run(drive_modbus.poll_fleet(jobs, concurrency, timeout))
+    return {
+        "wall": time.perf_counter() - t0,
+        "lat": np.array([r["elapsed"] for r in res]),
+        "failed": sum(r["error"] is not None for r in res),
+    }
+
+
+def report(name: str, conc, n: int, r: dict, requests: int):
+    p50, p95 = np.percentile(r["lat"], [50, 95])
+    print(f"{name:>8} {conc!s:>5} {n:>6} {r['wall']:>8.2f} {n / r['wall']:>9.1f} "
+          f"{p50 * 1000:>8.0f} {p95 * 1000:>8.0f} {r['lat'].max() * 1000:>8.0f} "
+          f"{r['failed']:>6g} {requests:>8}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the Modbus polling paths against drive_sim.")
+    ap.add_argument("--spoc", type=int, default=10)
+    ap.add_argument("--triol", type=int, default=10)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    ap.add_argument("--timeout", type=float, default=3.0, help="per drive, seconds")
+    ap.add_argument("--latency", type=float, default=20, help="simulated ms per request")
+    ap.add_argument("--jitter", type=float, default=5, help="± ms")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--drop-rate", type=float, default=0.0)
+    ap.add_argument("--strict", action="store_true", help="drives refuse reads over unmapped registers")
+    ap.add_argument("--skip-per-reg", action="store_true")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    logging.getLogger("pymodbus").setLevel(logging.CRITICAL)
+    cfg = drive_sim.SimConfig(args.latency / 1000, args.jitter / 1000, args.error_rate,
+                              drop_rate=args.drop_rate, strict=args.strict, seed=args.seed)
+    fleet = drive_sim.serve(["SPOC"] * args.spoc + ["Triol"] * args.triol, cfg)
+    drives = fleet.drives
+    print(f"sim: {args.spoc} SPOC + {args.triol} Triol, {args.latency:.0f}±{args.jitter:.0f} ms, "
+          f"error rate {args.error_rate:.0%}, drop rate {args.drop_rate:.0%}"
+          f"{', strict' if args.strict else ''}")
+
+    def sent():
+        return cfg.stats["requests"]
+
+    print(f"{'mode':>8} {'conc':>5} {'drives':>6} {'wall s':>8} {'drives/s':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'failed':>6} {'requests':>8}")
+    if not args.skip_per_reg:
+        before = sent()
+        report("per-reg", 1, len(drives), per_register_run(drives, args.timeout), sent() - before)
+    before = sent()
+    report("pooled", 1, len(drives), pooled_run(drives, args.timeout), (sent() - before) // 2)
+    for conc in args.concurrency:
+        before = sent()
+        report("fleet", conc, len(drives), fleet_run(drives, conc, args.timeout), sent() - before)
+
+    fleet.stop()
+
+
+if __name__ == "__main__":
+    main()
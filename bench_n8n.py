@@ -0,0 +1,111 @@
+# bench_n8n.py – latency / throughput of the dashboard's n8n trigger path
+# -----------------------------------------------------------------------------------------
+# • Runs against n8n_stub (started in-process) or any webhook given with --url
+# • sync     = what the dashboard did before: requests.post per well, one after the other,
+#              new connection each time, page blocked for the whole call
+# • dispatch = well_n8n.TriggerDispatcher (pooled session, worker threads, retries),
+#              timed for several worker counts
+# • Reports end-to-end latency per well (submit → result), throughput, failures
+#   and how long submit() blocks the caller
+#
+#   python bench_n8n.py                              # 200 ms stub, 100 wells
+#   python bench_n8n.py --wells 300 --workers 4 8 16 32 --error-rate 0.1
+#   python bench_n8n.py --url http://n8n.local/webhook --wells 20 --workers 4
+
+import argparse
+import time
+
+import numpy as np
+import requests
+
+import n8n_stub
+import well_n8n
+
+
+def sync_run(url: str, wells: list, timeout: float = 10.0) -> dict:
+    """The previous handler: one blocking requests.post per click."""
+    lat, failed = [], 0
+    t0 = time.perf_counter()
+    for w in wells:
+        t = time.perf_counter()
+        try:
+            resp = requests.post(url, json={"well_name": w}, timeout=timeout)
+            resp.raise_for_status()
+            resp.json()
+        except Exception:
+            failed += 1
+        lat.append(time.perf_counter() - t)
+    wall = time.perf_counter() - t0
+    # each call blocks the page for its whole duration
+    return {"wall": wall, "lat": np.array(lat), "failed": failed, "block": max(lat)}
+
+
+def dispatch_run(url: str, wells: list, workers: int, retries: int, backoff: float) -> dict:
+    d = well_n8n.TriggerDispatcher(url, workers=workers, retries=retries, backoff=backoff)
+    t0 = time.perf_counter()
+    block = []
+    for w in wells:
+        t = time.perf_counter()
+        d.submit(w)
+        block.append(time.perf_counter() - t)
+    while d.pending(wells):
+        time.sleep(0.01)
+    wall = time.perf_counter() - t0
+    res = d.results(wells)
+    d.session.close()
+    return {
+        "wall": wall,
+        "lat": np.array([r["finished"] - r["submitted"] for r in res]),
+        "failed": sum(r["status"] == "error" for r in res),
+        "retried": sum(r["attempts"] > 1 for r in res),
+        "block": max(block),
+    }
+
+
+def report(name: str, workers, n: int, r: dict):
+    p50, p95 = np.percentile(r["lat"], [50, 95])
+    print(f"{name:>9} {workers!s:>7} {n:>6} {r['wall']:>8.2f} {n / r['wall']:>9.1f} "
+          f"{p50 * 1000:>8.0f} {p95 * 1000:>8.0f} {r['lat'].max() * 1000:>8.0f} "
+          f"{r['failed']:>6} {r.get('retried', 0):>7} {r['block'] * 1000:>9.2f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the n8n trigger path against a stub or a real webhook.")
+    ap.add_argument("--url", help="webhook to hit (default: start n8n_stub in-process)")
+    ap.add_argument("--wells", type=int, default=100)
+    ap.add_argument("--sync-wells", type=int, default=20, help="wells for the sequential baseline (0 = skip)")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    ap.add_argument("--retries", type=int, default=3)
+    ap.add_argument("--backoff", type=float, default=0.2)
+    ap.add_argument("--latency", type=float, default=200, help="stub mean latency, ms")
+    ap.add_argument("--jitter", type=float, default=50, help="stub ± ms")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--drop-rate", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        cfg = n8n_stub.StubConfig(args.latency / 1000, args.jitter / 1000, args.error_rate,
+                                  drop_rate=args.drop_rate, seed=args.seed)
+        server = n8n_stub.serve(cfg)
+        url = f"http://127.0.0.1:{server.server_port}/webhook"
+        print(f"stub: {args.latency:.0f}±{args.jitter:.0f} ms, "
+              f"error rate {args.error_rate:.0%}, drop rate {args.drop_rate:.0%}")
+
+    wells = [f"BENCH {i:05d}" for i in range(args.wells)]
+    print(f"{'mode':>9} {'workers':>7} {'wells':>6} {'wall s':>8} {'wells/s':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'failed':>6} {'retried':>7} {'block ms':>9}")
+    if args.sync_wells:
+        n = min(args.sync_wells, args.wells)
+        report("sync", "-", n, sync_run(url, wells[:n]))
+    for workers in args.workers:
+        report("dispatch", workers, len(wells), dispatch_run(url, wells, workers, args.retries, args.backoff))
+
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
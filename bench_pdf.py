@@ -0,0 +1,124 @@
+# bench_pdf.py – reportlab (well_pdf) vs pdfkit/wkhtmltopdf for the well-table PDF
+# -----------------------------------------------------------------------------------------
+# • Builds a synthetic table shaped like the dashboard's export (same columns)
+# • Times each renderer over a few table sizes, best of N repeats
+# • pdfkit path = what the dashboard used before: df.to_html() → wkhtmltopdf; pdfkit is
+#   no longer a requirement – pip install pdfkit (plus wkhtmltopdf) to include it
+#
+#   python bench_pdf.py                   # 50, 500, 5000 rows, 3 repeats
+#   python bench_pdf.py --rows 100 2000 --repeat 5
+
+import argparse
+import importlib.util
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+import well_pdf
+
+COLUMNS = [
+    "Well Name", "Trigger", "Running Days", "TerribleScore", "PoorPerformance", "SpeedUp",
+    "At_Max_Capacity", "Overload_Risk",
+    "High Motor Temp", "High Downtime", "Max Vibration", "Pressure Difference", "Frequency Spread Ratio",
+    "Amp Spread Ratio", "Tubing-Casing Δ", "Fault Count",
+    "Uptime %", "NearUnderload Ratio",
+    "Normal_vs_Overload",
+    "MissingSensor", "Drive Type", "State Detail/Op Mode",
+]
+RULES = {
+    "At_Max_Capacity": (">=", 1.05), "Overload_Risk": (">=", 1.05), "High Motor Temp": (">=", 210),
+    "High Downtime": (">", 6), "Max Vibration": (">=", 1.0), "Pressure Difference": ("<=", 0.0),
+    "Frequency Spread Ratio": (">=", 1.0), "Amp Spread Ratio": (">=", 1.0), "Tubing-Casing Δ": ("<=", 30),
+    "Fault Count": (">=", 1), "Uptime %": ("<", 90), "NearUnderload Ratio": ("<", 1.43),
+}
+MARKS = {
+    "PoorPerformance": ("✗", "bad"), "Normal_vs_Overload": ("✗", "bad"),
+    "MissingSensor": ("✗", "bad"), "SpeedUp": ("✓", "good"),
+}
+
+
+def synthetic_table(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    mark = lambda p, m: np.where(rng.random(n) < p, m, "")
+    df = pd.DataFrame({
+        "Well Name": [f"WELL {i:05d}" for i in range(n)],
+        "Trigger": "Trigger",
+        "Running Days": rng.integers(0, 400, n),
+        "TerribleScore": rng.random(n) * 8,
+        "PoorPerformance": np.where(rng.random(n) < 0.3, "✗", "✓"),
+        "SpeedUp": np.where(rng.random(n) < 0.2, "✓", "✗"),
+        "At_Max_Capacity": rng.random(n) * 1.3,
+        "Overload_Risk": rng.random(n) * 1.3,
+        "High Motor Temp": rng.random(n) * 300,
+        "High Downtime": rng.random(n) * 24,
+        "Max Vibration": rng.random(n) * 2,
+        "Pressure Difference": rng.normal(500, 400, n),
+        "Frequency Spread Ratio": rng.random(n) * 1.5,
+        "Amp Spread Ratio": rng.random(n) * 1.5,
+        "Tubing-Casing Δ": rng.normal(60, 50, n),
+        "Fault Count": rng.integers(0, 5, n),
+        "Uptime %": rng.random(n) * 100,
+        "NearUnderload Ratio": 1 + rng.random(n),
+        "Normal_vs_Overload": mark(0.05, "✗"),
+        "MissingSensor": mark(0.05, "✗"),
+        "Drive Type": rng.choice(["SPOC", "Triol", "GE"], n),
+        "State Detail/Op Mode": rng.choice(["RUNNING", "MODEM OFFLINE", "STOPPED"], n),
+    })
+    return df[COLUMNS]
+
+
+def pdfkit_render(df: pd.DataFrame) -> bytes:
+    """The previous dashboard path: static HTML table → wkhtmltopdf."""
+    import pdfkit
+    html = f"""
+    <html>
+    <head>
+      <style>
+        table, th, td {{
+          border: 1px solid #999;
+          border-collapse: collapse;
+          padding: 4px;
+        }}
+      </style>
+    </head>
+    <body>
+      {df.to_html(index=False)}
+    </body>
+    </html>
+    """
+    return pdfkit.from_string(html, False)
+
+
+def best_of(fn, repeat: int):
+    times, out = [], b""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return min(times), len(out)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--rows", type=int, nargs="+", default=[50, 500, 5000])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    has_wkhtml = shutil.which("wkhtmltopdf") is not None and importlib.util.find_spec("pdfkit") is not None
+    if not has_wkhtml:
+        print("pdfkit / wkhtmltopdf not installed – timing the reportlab renderer only")
+
+    print(f"{'rows':>7} {'renderer':>10} {'best s':>9} {'bytes':>11}")
+    for n in args.rows:
+        df = synthetic_table(n)
+        secs, size = best_of(lambda: well_pdf.render_table_pdf(df, RULES, MARKS), args.repeat)
+        print(f"{n:>7} {'reportlab':>10} {secs:>9.3f} {size:>11,}")
+        if has_wkhtml:
+            secs, size = best_of(lambda: pdfkit_render(df), args.repeat)
+            print(f"{n:>7} {'pdfkit':>10} {secs:>9.3f} {size:>11,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 import streamlit as st
 import pandas as pd
-from pymodbus.client import ModbusTcpClient
 import pdfplumber
+import drive_modbus
 import re
+import asyncio
+import threading
 from math import sqrt
 from datetime import datetime
 import webbrowser
@@ -74,114 +76,13 @@ if st.session_state.dark_mode:
 # ───────────────────────────────────────────────────────
 
 # =============================
-# Modbus register definitions
+# Modbus register definitions (drive_maps.py)
 # =============================
-registers = {
-    "Set_Point_Value_Underload":        (26, 1),
-    "Start_Delay_Underload":           (105, 1),
-    "Trigger_Delay_Underload":         (106, 1),
-    "Restart_Attempts_Underload":      (108, 1),
-    "Down_Time_Underload":             (107, 1),
-    "Set_Point_Value_Overload":        (27, 1),
-    "Start_Delay_Overload":            (113, 1),
-    "Trigger_Delay_Overload":          (114, 1),
-    "Restart_Attempts_Overload":       (116, 1),
-    "Down_Time_Overload":              (115, 1),
-    "Set_Point_Value_Low_Frequency":   (33, 1),
-    "Start_Delay_Low_Frequency":       (117, 1),
-    "Trigger_Delay_Low_Frequency":     (118, 1),
-    "Restart_Attempts_Low_Frequency":  (120, 1),
-    "Down_Time_Low_Frequency":         (119, 1),
-    "Set_Point_Value_High_Winding_Temp": (225, 1),
-    "Start_Delay_High_Winding_Temp":   (131, 1),
-    "Trigger_Delay_High_Winding_Temp": (132, 1),
-    "Restart_Attempts_High_Winding_Temp": (134,1),
-    "Down_Time_High_Winding_Temp":     (133, 1),
-}
-
-additional_registers = {
-    "Output_Freq_Hz":                     (2103, 1),
-    "Motor_Current_A":                    (2149, 1),
-    "VFD_Current_A":                      (2105, 1),
-    "Fluid_Temp_F":                       (0,    1),
-    "Motor_Temp_F":                       (2,    1),
-    "DC_Bus_Voltage_V":                   (2109, 1),
-    "Motor_Voltage_V":                    (2150, 1),
-    "Output_Voltage_V":                   (2108, 1),
-    "General_Down_Time":                  (28,   1),
-    "Max_Volt_at_max_Frequency_Spoc_(V)": (29,   1),
-    "Normal_Running_Amp_(A)":             (30,   1),
-    "DH_MOTOR_TEMP_UL_ACTION":            (226,  1),
-}
-# ————————————————————————————————————————————————————————————————
-# Triol-specific Modbus maps & scaling
-# ————————————————————————————————————————————————————————————————
-TRIOL_REGISTERS = {
-    "Protection_Underload":             (2304, 1),
-    "Protection_Overload":              (2181, 1),
-    "Protection_Low_Frequency":         (3460, 1),
-    "Protection_High_Intake_Temp":      (4999, 1),
-    "Protection_High_Winding_Temp":     (8839, 1),
-    "Set_Point_Value_Underload":        (2308, 1),
-    "Set_Point_Value_Overload":         (2178, 1),
-    "Set_Point_Value_Low_Frequency":    (3457, 1),
-    "Set_Point_Value_High_Intake_Temp": (4997, 2),
-    "Set_Point_Value_High_Winding_Temp":(8837, 2),
-    "Start_Delay_Underload":            (2309, 1),
-    "Start_Delay_Overload":             (2179, 1),
-    "Start_Delay_Low_Frequency":        (3458, 1),
-    "Start_Delay_High_Intake_Temp":     (5002, 1),
-    "Start_Delay_High_Winding_Temp":    (8842, 1),
-    "Trigger_Delay_Underload":          (2310, 1),
-    "Trigger_Delay_Overload":           (2180, 1),
-    "Trigger_Delay_Low_Frequency":      (3459, 1),
-    "Trigger_Delay_High_Intake_Temp":   (5003, 1),
-    "Trigger_Delay_High_Winding_Temp":  (8843, 1),
-    "Restart_Attempts_Underload":       (2312, 1),
-    "Restart_Attempts_Overload":        (2182, 1),
-    "Restart_Attempts_Low_Frequency":   (3461, 1),
-    "Restart_Attempts_High_Intake_Temp":(5001, 1),
-    "Restart_Attempts_High_Winding_Temp":(8841,1),
-    "Down_Time_Underload":              (2313, 1),
-    "Down_Time_Overload":               (2183, 1),
-    "Down_Time_Low_Frequency":          (3456, 1),
-    "Down_Time_High_Intake_Temp":       (5000, 1),
-    "Down_Time_High_Winding_Temp":      (8840, 1),
-}
-
-TRIOL_ADDITIONAL = {
-    "Output_Freq_Hz":        (1,    1),
-    "Motor_Current_A":       (2,    1),
-    "VFD_Current_A":         (8,    1),
-    "Fluid_Temp_F":          (4993, 2),
-    "Motor_Temp_F":          (8833, 2),
-    "DC_Bus_Voltage_V":      (128,  1),
-    "Motor_Voltage_V":       (132,  1),
-    "Output_Voltage_V":      (135,  1),
-    "Power_factor":          (7,    1),
-}
-
-# scale‐maps lifted from your template logic
-TRIOL_DIVIDE = {
-    **{k: 10 for k in ("Output_Freq_Hz","Motor_Current_A","Power_factor")},
-    **{k: 100 for k in ("Fluid_Temp_F","Motor_Temp_F")},
-    **{k: 10 for k in (
-        "Set_Point_Value_Underload","Set_Point_Value_Overload",
-        "Set_Point_Value_Low_Frequency"
-    )},
-    "Set_Point_Value_High_Intake_Temp":  100,
-    "Set_Point_Value_High_Winding_Temp": 100,
-    **{k: 10 for k in (
-        "Start_Delay_Underload","Start_Delay_Overload",
-        "Start_Delay_Low_Frequency","Start_Delay_High_Intake_Temp",
-        "Start_Delay_High_Winding_Temp",
-
-    )},
-}
+from drive_maps import (
+    registers, additional_registers, TRIOL_REGISTERS, TRIOL_ADDITIONAL,
+    TRIOL_DIVIDE, TRIOL_MULTIPLY, SPOC_ADDITIONAL_DIVIDE,
+)
 
-TRIOL_MULTIPLY = {
-    # if you had any multiply rules—e.g. none by default:
-}
 def make_template_bytes(core_map: dict,
                         add_map: dict,
                         drive_name: str,
@@ -218,49 +119,50 @@ def make_template_bytes(core_map: dict,
     )
     buf.seek(0)
     return buf.read()
-def read_registers(reg_dict, client):
-    """Read a dict of registers from Modbus client."""
-    vals = {}
-    for name, (addr, count) in reg_dict.items():
-        resp = client.read_holding_registers(addr, count=count, device_id=1)
-        if not resp.isError():
-            if count == 2:
-                low, high = resp.registers
-                vals[name] = (high << 16) | low
-            else:
-                vals[name] = resp.registers[0]
-        else:
-            vals[name] = None
-    return vals
+# Registers closer than this are fetched in the same request (unused ones in
+# between are read and discarded); raise it on high-latency modem links.
+MODBUS_MAX_GAP = drive_modbus.DEFAULT_MAX_GAP
+
+def read_registers(reg_dict, client, max_gap: int = MODBUS_MAX_GAP):
+    """Read a dict of registers from Modbus client, merged into as few block reads as possible."""
+    blocks = drive_modbus.plan_blocks(reg_dict, max_gap)
+    log_message(f"Reading {len(reg_dict)} registers in {len(blocks)} request(s)")
+    return drive_modbus.read_blocks(blocks, client)
+
+def read_register_maps(client, *reg_dicts, max_gap: int = MODBUS_MAX_GAP):
+    """Several register maps through one block plan; returns one value dict per map."""
+    merged = {(i, name): spec for i, d in enumerate(reg_dicts) for name, spec in d.items()}
+    vals = read_registers(merged, client, max_gap)
+    return [{name: vals[(i, name)] for name in d} for i, d in enumerate(reg_dicts)]
+
+@st.cache_resource(show_spinner=False)
+def modbus_pool():
+    """Drive connections kept open between polls (server-wide, keyed by ip/port)."""
+    return drive_modbus.ClientPool()
 
 def read_modbus_data(ip: str, port: int):
     """Connect to SPOC drive via Modbus, scale values, and build
     a 12-column live-data table with Protection logic."""
-    # 1) Connect
+    # 1) Connect (pooled – reuses the open link to this drive if it is still alive)
+    # 2) Read raw registers
     log_message("Attempting Modbus connection...")
-    client = ModbusTcpClient(ip, port=port)
-    if not client.connect():
+    try:
+        before, additional = modbus_pool().call(
+            ip, port, lambda client: read_register_maps(client, registers, additional_registers)
+        )
+    except ConnectionError:
         log_message("Modbus connection failed")
-        raise ConnectionError("Could not connect to Modbus device")
+        raise
     log_message("Modbus connected successfully")
+    return spoc_tables(before, additional)
 
-    # 2) Read raw registers
-    before     = read_registers(registers, client)
-    additional = read_registers(additional_registers, client)
-    client.close()
-
+def spoc_tables(before: dict, additional: dict):
+    """Raw SPOC register values → scaled values + live-data and additional tables."""
     # 3) Apply your existing SPOC scaling rules
     log_message("Scaling Modbus values")
-    if isinstance(additional.get("VFD_Current_A"), (int, float)):
-        additional["VFD_Current_A"] /= 10
-    if isinstance(additional.get("Fluid_Temp_F"), (int, float)):
-        additional["Fluid_Temp_F"] /= 10
-    if isinstance(additional.get("Motor_Temp_F"), (int, float)):
-        additional["Motor_Temp_F"] /= 10
-    if isinstance(additional.get("Output_Voltage_V"), (int, float)):
-        additional["Output_Voltage_V"] /= 10
-    if isinstance(additional.get("Output_Freq_Hz"), (int, float)):
-        additional["Output_Freq_Hz"] /= 100
+    for key, div in SPOC_ADDITIONAL_DIVIDE.items():
+        if isinstance(additional.get(key), (int, float)):
+            additional[key] /= div
 
     for key in ("Set_Point_Value_Underload","Set_Point_Value_Overload"):
         if isinstance(before.get(key),(int,float)):
@@ -324,13 +226,13 @@ def read_triold_modbus_data(ip: str, port: int):
     """Like read_modbus_data but for Triol’s registers & scaling,
     and with Triol-specific Protection decoding."""
     # 1) Connect & read raw
-    client = ModbusTcpClient(ip, port=port)
-    if not client.connect():
-        raise ConnectionError("Could not connect to Triol device")
-    before     = read_registers(TRIOL_REGISTERS, client)
-    additional = read_registers(TRIOL_ADDITIONAL, client)
-    client.close()
+    before, additional = modbus_pool().call(
+        ip, port, lambda client: read_register_maps(client, TRIOL_REGISTERS, TRIOL_ADDITIONAL)
+    )
+    return triol_tables(before, additional)
 
+def triol_tables(before: dict, additional: dict):
+    """Raw Triol register values → scaled values + live-data and additional tables."""
     # 2) Apply Triol scaling
     for nm, raw in list(before.items()):
         if raw is None: continue
@@ -391,6 +293,110 @@ def read_triold_modbus_data(ip: str, port: int):
 
     return additional, before, df_live, df_additional
 
+# =============================
+# Fleet poll
+# =============================
+# drive type → (core map, additional map, tables builder)
+FLEET_DRIVES = {
+    "SPOC":  (registers, additional_registers, spoc_tables),
+    "Triol": (TRIOL_REGISTERS, TRIOL_ADDITIONAL, triol_tables),
+}
+
+def poll_fleet(entries: list, concurrency: int = 16, timeout: float = 10.0):
+    """
+    Poll [(ip, port, drive type), …] concurrently (asyncio Modbus client).
+    Returns (status table – one row per drive, combined live-data table –
+    the 5 protection rows of every drive that answered, tagged with it).
+    """
+    merged = {
+        drive: {**{(0, k): v for k, v in core.items()}, **{(1, k): v for k, v in add.items()}}
+        for drive, (core, add, _) in FLEET_DRIVES.items()
+    }
+    jobs = [(ip, int(port), merged[drive]) for ip, port, drive in entries]
+    log_message(f"Fleet poll: {len(jobs)} drive(s), {concurrency} at a time")
+    results = asyncio.run(drive_modbus.poll_fleet(jobs, concurrency, timeout, MODBUS_MAX_GAP))
+
+    status, tables = [], []
+    for (ip, port, drive), res in zip(entries, results):
+        row = {"IP": ip, "Port": int(port), "Drive": drive,
+               "Status": "OK" if res["error"] is None else "Failed",
+               "Time (ms)": round(res["elapsed"] * 1000), "Error": res["error"] or ""}
+        status.append(row)
+        if res["error"] is not None:
+            log_message(f"Fleet poll {ip}:{port} failed: {res['error']}")
+            continue
+        core, add, build = FLEET_DRIVES[drive]
+        vals = res["values"]
+        before = {k: vals[(0, k)] for k in core}
+        additional = {k: vals[(1, k)] for k in add}
+        _, _, df_live, _ = build(before, additional)
+        df_live.insert(0, "Drive", drive)
+        df_live.insert(0, "Port", int(port))
+        df_live.insert(0, "IP", ip)
+        tables.append(df_live)
+    combined = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+    return pd.DataFrame(status), combined
+
+# =============================
+# Live mode
+# =============================
+# drive type → (channels that can be watched, divisors)
+LIVE_DRIVES = {
+    "SPOC":  (additional_registers, SPOC_ADDITIONAL_DIVIDE),
+    "Triol": (TRIOL_ADDITIONAL, TRIOL_DIVIDE),
+}
+LIVE_DEFAULT_CHANNELS = ["Output_Freq_Hz", "Motor_Current_A", "DC_Bus_Voltage_V"]
+
+@st.cache_resource(show_spinner=False)
+def live_pollers():
+    """Server-wide running pollers, (ip, port, drive) → LivePoller; sessions watching one drive share it."""
+    return {}, threading.Lock()
+
+def start_live_poller(ip: str, port: int, drive: str, channels: list, rate_hz: float, capacity: int):
+    regs, divide = LIVE_DRIVES[drive]
+    key = (ip, int(port), drive)
+    pollers, lock = live_pollers()
+    with lock:
+        old = pollers.get(key)
+        if old is not None:
+            old.stop()
+        pollers[key] = drive_modbus.LivePoller(
+            modbus_pool(), ip, port, {c: regs[c] for c in channels}, divide,
+            rate_hz=rate_hz, capacity=capacity, max_gap=MODBUS_MAX_GAP,
+        ).start()
+    log_message(f"Live mode started for {ip}:{port} ({drive}) at {rate_hz:g} Hz")
+    return key
+
+def stop_live_poller(key):
+    pollers, lock = live_pollers()
+    with lock:
+        poller = pollers.pop(key, None)
+    if poller is not None:
+        poller.stop()
+        log_message(f"Live mode stopped for {key[0]}:{key[1]}")
+
+@st.fragment(run_every=1)
+def live_chart(key):
+    """Redraws only the chart from the ring buffer – the page itself is not rerun."""
+    poller = live_pollers()[0].get(key)
+    if poller is None:
+        st.info("Live mode is not running.")
+        return
+    t, values = poller.snapshot()
+    if len(t):
+        df = pd.DataFrame(values.T, columns=poller.channels,
+                          index=pd.to_datetime(t, unit="s").tz_localize("UTC").tz_convert(None))
+        st.line_chart(df, height=320)
+        latest = df.iloc[-1]
+        cols = st.columns(len(poller.channels))
+        for c, name in zip(cols, poller.channels):
+            c.metric(name, "—" if pd.isna(latest[name]) else f"{latest[name]:,.2f}")
+    state = "running" if poller.running else "stopped (idle)"
+    st.caption(
+        f"{state} · {min(poller.buffer.written, poller.buffer.capacity)}/{poller.buffer.capacity} samples · "
+        f"{poller.errors} failed read(s)" + (f" · last error: {poller.last_error}" if poller.last_error else "")
+    )
+
 # =============================
 # PDF Extraction (from enerflowv5) – FINAL
 # =============================
@@ -895,7 +901,6 @@ def decode_dh_status(raw: int | None) -> str:
 
 def render_inputs_modbus_tab():
     import pandas as pd
-    from pymodbus.client import ModbusTcpClient
     from datetime import datetime
 
     if st.session_state.pop("clear_connection", False):
@@ -907,7 +912,7 @@ def render_inputs_modbus_tab():
     # ── 0) Init imported‐drives storage
     if "imported_drives" not in st.session_state:
         st.session_state.imported_drives = []
-        st.session_state.mapping_dfs = {}
+        st.session_state.decoder_plans = {}
 
     # ── 1) Drive selector + download/import templates
     drives = ["Triol", "SPOC"] + st.session_state.imported_drives
@@ -973,8 +978,13 @@ def render_inputs_modbus_tab():
             else:
                 for drv in df_map["Drive Type"].unique():
                     if drv not in st.session_state.imported_drives:
+                        try:
+                            plan = drive_modbus.compile_mappings(df_map[df_map["Drive Type"] == drv], MODBUS_MAX_GAP)
+                        except ValueError as e:
+                            st.error(f"{drv}: {e}")
+                            continue
                         st.session_state.imported_drives.append(drv)
-                        st.session_state.mapping_dfs[drv] = df_map[df_map["Drive Type"] == drv]
+                        st.session_state.decoder_plans[drv] = plan
 
     # ── 2) Clear everything
     if st.button("🗑️ Clear All"):
@@ -1002,37 +1012,10 @@ def render_inputs_modbus_tab():
                 elif option == "SPOC":
                     add_vals, before_vals, df_live, df_add = read_modbus_data(ip, port)
                 else:
-                    # generic: use the imported mapping
-                    df_map = st.session_state.mapping_dfs[option]
-                    # build core_regs & add_regs
-                    core_regs = {
-                        row["Parameter Name"]: (int(row["Register Address"]), int(row["Register Count"]))
-                        for _, row in df_map[df_map.Category == "core"].iterrows()
-                    }
-                    add_regs = {
-                        row["Parameter Name"]: (int(row["Register Address"]), int(row["Register Count"]))
-                        for _, row in df_map[df_map.Category == "additional"].iterrows()
-                    }
-                    # read raw
-                    client = ModbusTcpClient(ip, port=port)
-                    if not client.connect():
-                        raise ConnectionError("Could not connect")
-                    raw_before = read_registers(core_regs, client)
-                    raw_add    = read_registers(add_regs, client)
-                    client.close()
-                    # apply scale from df_map
-                    for nm, raw in list(raw_before.items()):
-                        cfg = df_map[df_map["Parameter Name"] == nm].iloc[0]
-                        dv, mv = cfg["Scale Divide"], cfg["Scale Multiply"]
-                        if pd.notna(dv): raw /= dv
-                        if pd.notna(mv): raw *= mv
-                        raw_before[nm] = raw
-                    for nm, raw in list(raw_add.items()):
-                        cfg = df_map[df_map["Parameter Name"] == nm].iloc[0]
-                        dv, mv = cfg["Scale Divide"], cfg["Scale Multiply"]
-                        if pd.notna(dv): raw /= dv
-                        if pd.notna(mv): raw *= mv
-                        raw_add[nm] = raw
+                    # generic: imported mapping, compiled into a decoder plan on upload
+                    plan = st.session_state.decoder_plans[option]
+                    raw_before, raw_add = modbus_pool().call(ip, port, plan.poll)
+                    log_message(f"Read {len(plan)} registers in {len(plan.blocks)} request(s)")
                     # build dfs
                     df_live = pd.DataFrame([
                         {
@@ -1068,6 +1051,77 @@ def render_inputs_modbus_tab():
                 st.error(f"Modbus error: {e}")
                 log_message(f"Modbus error: {e}")
 
+    # ── 3b) Fleet poll: many SPOC / Triol drives at once
+    with st.expander("Fleet Poll", expanded=False):
+        st.caption("One row per drive. All drives are polled concurrently; a slow or dead drive only costs its own timeout.")
+        fleet = st.data_editor(
+            pd.DataFrame({"IP": [""], "Port": [502], "Drive Type": ["SPOC"]}),
+            num_rows="dynamic",
+            key="fleet_editor",
+            column_config={
+                "Port": st.column_config.NumberColumn(min_value=1, max_value=65535, step=1),
+                "Drive Type": st.column_config.SelectboxColumn(options=list(FLEET_DRIVES)),
+            },
+            use_container_width=True,
+        )
+        f1, f2 = st.columns(2)
+        concurrency = f1.number_input("Drives at a time", min_value=1, max_value=256, value=16, key="fleet_concurrency")
+        timeout = f2.number_input("Timeout per drive (s)", min_value=1.0, max_value=120.0, value=10.0, key="fleet_timeout")
+
+        if st.button("📡 Poll fleet"):
+            entries = [
+                (str(r["IP"]).strip(), int(r["Port"]), r["Drive Type"])
+                for _, r in fleet.iterrows()
+                if str(r["IP"] or "").strip() and pd.notna(r["Port"]) and r["Drive Type"] in FLEET_DRIVES
+            ]
+            if not entries:
+                st.warning("Add at least one drive (IP, Port, Drive Type).")
+            else:
+                t0 = datetime.now()
+                with st.spinner(f"Polling {len(entries)} drive(s)…"):
+                    st.session_state.fleet_status, st.session_state.fleet_table = poll_fleet(
+                        entries, int(concurrency), float(timeout)
+                    )
+                secs = (datetime.now() - t0).total_seconds()
+                log_message(f"Fleet poll finished in {secs:.1f}s")
+                st.session_state.fleet_poll_ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        if "fleet_status" in st.session_state:
+            status = st.session_state.fleet_status
+            ok = int((status["Status"] == "OK").sum())
+            st.markdown(f"**Last fleet poll:** {st.session_state.fleet_poll_ts} – {ok}/{len(status)} drive(s) answered")
+            st.dataframe(status, use_container_width=True, hide_index=True)
+            if not st.session_state.fleet_table.empty:
+                st.dataframe(st.session_state.fleet_table, use_container_width=True, hide_index=True)
+                st.download_button(
+                    "Download fleet settings (.csv)",
+                    st.session_state.fleet_table.to_csv(index=False).encode(),
+                    file_name=f"fleet_settings_{datetime.now():%Y%m%d_%H%M}.csv",
+                    mime="text/csv",
+                )
+
+    # ── 3c) Live mode: chart a few registers continuously
+    with st.expander("Live Mode", expanded=False):
+        if option not in LIVE_DRIVES:
+            st.info("Live mode is available for SPOC and Triol drives.")
+        else:
+            regs, _ = LIVE_DRIVES[option]
+            channels = st.multiselect(
+                "Registers to watch", list(regs),
+                default=[c for c in LIVE_DEFAULT_CHANNELS if c in regs], key="live_channels",
+            )
+            l1, l2 = st.columns(2)
+            rate = l1.slider("Polls per second", 0.2, 10.0, 1.0, 0.2, key="live_rate")
+            window = l2.number_input("Samples kept", min_value=10, max_value=100_000, value=600, step=10,
+                                     key="live_window", help="Ring buffer size per register – memory stays fixed.")
+            b1, b2 = st.columns(2)
+            if b1.button("▶️ Start live mode", disabled=not (ip and channels)):
+                st.session_state.live_key = start_live_poller(ip, port, option, channels, rate, int(window))
+            if b2.button("⏹️ Stop", disabled="live_key" not in st.session_state):
+                stop_live_poller(st.session_state.pop("live_key"))
+            if "live_key" in st.session_state:
+                live_chart(st.session_state.live_key)
+
     # ── 4) Manual Inputs (auto‐populate from any drive)
     st.subheader("Manual Inputs")
     mapping = {
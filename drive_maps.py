@@ -0,0 +1,124 @@
+# drive_maps.py – Modbus register maps for the SPOC and Triol drives
+# -----------------------------------------------------------------------------------------
+# • {name: (address, count)} – count 2 = 32-bit value, low word first
+# • TRIOL_DIVIDE / TRIOL_MULTIPLY / SPOC_ADDITIONAL_DIVIDE: raw → engineering units
+# • Shared by the commissioning dashboard and drive_sim; no Streamlit import
+
+# =============================
+# Modbus register definitions
+# =============================
+registers = {
+    "Set_Point_Value_Underload":        (26, 1),
+    "Start_Delay_Underload":           (105, 1),
+    "Trigger_Delay_Underload":         (106, 1),
+    "Restart_Attempts_Underload":      (108, 1),
+    "Down_Time_Underload":             (107, 1),
+    "Set_Point_Value_Overload":        (27, 1),
+    "Start_Delay_Overload":            (113, 1),
+    "Trigger_Delay_Overload":          (114, 1),
+    "Restart_Attempts_Overload":       (116, 1),
+    "Down_Time_Overload":              (115, 1),
+    "Set_Point_Value_Low_Frequency":   (33, 1),
+    "Start_Delay_Low_Frequency":       (117, 1),
+    "Trigger_Delay_Low_Frequency":     (118, 1),
+    "Restart_Attempts_Low_Frequency":  (120, 1),
+    "Down_Time_Low_Frequency":         (119, 1),
+    "Set_Point_Value_High_Winding_Temp": (225, 1),
+    "Start_Delay_High_Winding_Temp":   (131, 1),
+    "Trigger_Delay_High_Winding_Temp": (132, 1),
+    "Restart_Attempts_High_Winding_Temp": (134,1),
+    "Down_Time_High_Winding_Temp":     (133, 1),
+}
+
+additional_registers = {
+    "Output_Freq_Hz":                     (2103, 1),
+    "Motor_Current_A":                    (2149, 1),
+    "VFD_Current_A":                      (2105, 1),
+    "Fluid_Temp_F":                       (0,    1),
+    "Motor_Temp_F":                       (2,    1),
+    "DC_Bus_Voltage_V":                   (2109, 1),
+    "Motor_Voltage_V":                    (2150, 1),
+    "Output_Voltage_V":                   (2108, 1),
+    "General_Down_Time":                  (28,   1),
+    "Max_Volt_at_max_Frequency_Spoc_(V)": (29,   1),
+    "Normal_Running_Amp_(A)":             (30,   1),
+    "DH_MOTOR_TEMP_UL_ACTION":            (226,  1),
+}
+# ————————————————————————————————————————————————————————————————
+# Triol-specific Modbus maps & scaling
+# ————————————————————————————————————————————————————————————————
+TRIOL_REGISTERS = {
+    "Protection_Underload":             (2304, 1),
+    "Protection_Overload":              (2181, 1),
+    "Protection_Low_Frequency":         (3460, 1),
+    "Protection_High_Intake_Temp":      (4999, 1),
+    "Protection_High_Winding_Temp":     (8839, 1),
+    "Set_Point_Value_Underload":        (2308, 1),
+    "Set_Point_Value_Overload":         (2178, 1),
+    "Set_Point_Value_Low_Frequency":    (3457, 1),
+    "Set_Point_Value_High_Intake_Temp": (4997, 2),
+    "Set_Point_Value_High_Winding_Temp":(8837, 2),
+    "Start_Delay_Underload":            (2309, 1),
+    "Start_Delay_Overload":             (2179, 1),
+    "Start_Delay_Low_Frequency":        (3458, 1),
+    "Start_Delay_High_Intake_Temp":     (5002, 1),
+    "Start_Delay_High_Winding_Temp":    (8842, 1),
+    "Trigger_Delay_Underload":          (2310, 1),
+    "Trigger_Delay_Overload":           (2180, 1),
+    "Trigger_Delay_Low_Frequency":      (3459, 1),
+    "Trigger_Delay_High_Intake_Temp":   (5003, 1),
+    "Trigger_Delay_High_Winding_Temp":  (8843, 1),
+    "Restart_Attempts_Underload":       (2312, 1),
+    "Restart_Attempts_Overload":        (2182, 1),
+    "Restart_Attempts_Low_Frequency":   (3461, 1),
+    "Restart_Attempts_High_Intake_Temp":(5001, 1),
+    "Restart_Attempts_High_Winding_Temp":(8841,1),
+    "Down_Time_Underload":              (2313, 1),
+    "Down_Time_Overload":               (2183, 1),
+    "Down_Time_Low_Frequency":          (3456, 1),
+    "Down_Time_High_Intake_Temp":       (5000, 1),
+    "Down_Time_High_Winding_Temp":      (8840, 1),
+}
+
+TRIOL_ADDITIONAL = {
+    "Output_Freq_Hz":        (1,    1),
+    "Motor_Current_A":       (2,    1),
+    "VFD_Current_A":         (8,    1),
+    "Fluid_Temp_F":          (4993, 2),
+    "Motor_Temp_F":          (8833, 2),
+    "DC_Bus_Voltage_V":      (128,  1),
+    "Motor_Voltage_V":       (132,  1),
+    "Output_Voltage_V":      (135,  1),
+    "Power_factor":          (7,    1),
+}
+
+# scale‐maps lifted from your template logic
+TRIOL_DIVIDE = {
+    **{k: 10 for k in ("Output_Freq_Hz","Motor_Current_A","Power_factor")},
+    **{k: 100 for k in ("Fluid_Temp_F","Motor_Temp_F")},
+    **{k: 10 for k in (
+        "Set_Point_Value_Underload","Set_Point_Value_Overload",
+        "Set_Point_Value_Low_Frequency"
+    )},
+    "Set_Point_Value_High_Intake_Temp":  100,
+    "Set_Point_Value_High_Winding_Temp": 100,
+    **{k: 10 for k in (
+        "Start_Delay_Underload","Start_Delay_Overload",
+        "Start_Delay_Low_Frequency","Start_Delay_High_Intake_Temp",
+        "Start_Delay_High_Winding_Temp",
+
+    )},
+}
+
+TRIOL_MULTIPLY = {
+    # if you had any multiply rules—e.g. none by default:
+}
+
+# SPOC additional-register scaling (raw / divisor)
+SPOC_ADDITIONAL_DIVIDE = {
+    "VFD_Current_A":    10,
+    "Fluid_Temp_F":     10,
+    "Motor_Temp_F":     10,
+    "Output_Voltage_V": 10,
+    "Output_Freq_Hz":   100,
+}
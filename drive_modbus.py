@@ -0,0 +1,496 @@
+# drive_modbus.py – coalesced Modbus register reads for the commissioning check
+# -----------------------------------------------------------------------------------------
+# • plan_blocks: register map {name: (address, count)} → sorted, merged blocks of at most
+#   125 registers (the Modbus limit per read), bridging gaps of up to `max_gap` registers
+# • read_blocks: one read_holding_registers per block, values sliced back out by name;
+#   a block the drive refuses (e.g. it spans an unimplemented address) is re-read as
+#   gap-free runs, then one parameter at a time – one walk (_plan_reads) shared by the
+#   sync, asyncio and flat-buffer (read_words) readers
+# • decode: count 2 → (high << 16) | low with the low word first, as the drives send it
+# • ClientPool: one open ModbusTcpClient per (ip, port), kept between polls – TCP
+#   keep-alive, a liveness check before reuse, reconnect + one retry on a dead link,
+#   idle connections closed after `idle_timeout`
+# • poll_fleet: many drives at once on pymodbus' asyncio client – at most `concurrency`
+#   in flight, each drive bounded by its own timeout, one result per drive
+# • LivePoller: background thread polling a few registers at a fixed rate into a
+#   RingBuffer (preallocated NumPy arrays – memory fixed however long it runs);
+#   stops by itself once nobody has looked at it for `idle_stop` seconds
+# • DecoderPlan: an imported Mappings sheet compiled once into parallel arrays (buffer
+#   index, count, signedness, divide, multiply) plus its block plan; a poll reads the
+#   blocks into one flat uint16 buffer and decodes every parameter in one NumPy pass
+# • No Streamlit import
+
+import asyncio
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+from pymodbus.client import AsyncModbusTcpClient, ModbusTcpClient
+from pymodbus.exceptions import ModbusException
+
+MAX_BLOCK = 125          # holding registers per request (Modbus spec)
+DEFAULT_MAX_GAP = 64     # unused registers worth reading to save a round trip
+
+
+class Block(NamedTuple):
+    start: int
+    count: int
+    fields: tuple        # ((name, offset, count), …)
+
+
+def plan_blocks(reg_dict: dict, max_gap: int = DEFAULT_MAX_GAP, max_count: int = MAX_BLOCK) -> list:
+    """Merge a register map into as few contiguous read blocks as the limits allow."""
+    items = sorted(reg_dict.items(), key=lambda kv: (kv[1][0], kv[1][1]))
+    blocks, start, end, fields = [], None, None, []
+    for name, (addr, count) in items:
+        if start is not None and addr - end <= max_gap and max(end, addr + count) - start <= max_count:
+            end = max(end, addr + count)
+        else:
+            if start is not None:
+                blocks.append(Block(start, end - start, tuple(fields)))
+            start, end, fields = addr, addr + count, []
+        fields.append((name, addr - start, count))
+    if start is not None:
+        blocks.append(Block(start, end - start, tuple(fields)))
+    return blocks
+
+
+def decode(words: list, count: int):
+    if count == 2:
+        low, high = words[0], words[1]
+        return (high << 16) | low
+    return words[0]
+
+
+def _read(client, start: int, count: int, device_id: int):
+    resp = client.read_holding_registers(start, count=count, device_id=device_id)
+    if resp.isError() or len(resp.registers) < count:
+        return None
+    return resp.registers
+
+
+def _fallback(block: Block) -> list:
+    """A refused block re-planned: gap-free runs first, single parameters if that changes nothing."""
+    fields = {name: (block.start + offset, count) for name, offset, count in block.fields}
+    runs = plan_blocks(fields, max_gap=0)
+    if len(runs) == 1:
+        runs = [Block(addr, count, ((name, 0, count),)) for name, (addr, count) in fields.items()]
+    return runs
+
+
+def _plan_reads(blocks: list):
+    """
+    The reads a block plan takes, fallback included: yields (block, pos) – pos = the
+    block's offset in the plan's flat buffer – and is sent back the words read, or
+    None if the drive refused them. A refused block of several parameters is retried
+    as its _fallback() runs, depth first.
+    """
+    todo, pos = [], 0
+    for block in blocks:
+        todo.append((block, pos))
+        pos += block.count
+    while todo:
+        block, pos = todo.pop(0)
+        words = yield block, pos
+        if words is None and len(block.fields) > 1:
+            todo[:0] = [(run, pos + run.start - block.start) for run in _fallback(block)]
+
+
+def _send(reads, words):
+    """Next (block, pos) of a _plan_reads walk, or None once it is done."""
+    try:
+        return reads.send(words)
+    except StopIteration:
+        return None
+
+
+def _execute(blocks: list, read) -> list:
+    """Run a plan with read(start, count) → words | None; [(block, pos, words), …] per read."""
+    done, reads = [], _plan_reads(blocks)
+    step = next(reads, None)
+    while step is not None:
+        block, pos = step
+        words = read(block.start, block.count)
+        done.append((block, pos, words))
+        step = _send(reads, words)
+    return done
+
+
+def _values(reads: list) -> dict:
+    """Executed reads → {name: decoded value}; parameters refused on their own → None."""
+    vals = {}
+    for block, _, words in reads:
+        if words is not None:
+            for name, offset, count in block.fields:
+                vals[name] = decode(words[offset:offset + count], count)
+        elif len(block.fields) == 1:
+            vals[block.fields[0][0]] = None
+    return vals
+
+
+def read_blocks(blocks: list, client, device_id: int = 1) -> dict:
+    """Execute a block plan; unreadable parameters come back as None."""
+    return _values(_execute(blocks, lambda start, count: _read(client, start, count, device_id)))
+
+
+# ───── Connection pool ─────
+def _alive(client) -> bool:
+    """Socket still open and not closed by the drive (non-blocking peek)."""
+    sock = client.socket
+    if sock is None:
+        return False
+    timeout = sock.gettimeout()
+    try:
+        sock.setblocking(False)
+        try:
+            return sock.recv(1, socket.MSG_PEEK) != b""
+        finally:
+            sock.settimeout(timeout)
+    except (BlockingIOError, InterruptedError):
+        return True          # nothing to read = healthy idle connection
+    except OSError:
+        return False
+
+
+class _Conn:
+    def __init__(self, client):
+        self.client = client
+        self.lock = threading.Lock()       # a ModbusTcpClient serves one caller at a time
+        self.last_used = time.monotonic()
+
+
+class ClientPool:
+    """Open Modbus TCP connections shared across reruns and sessions, keyed by (ip, port)."""
+
+    def __init__(self, timeout: float = 3.0, idle_timeout: float = 300.0):
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._conns = {}
+        # its own lock: counts are bumped while a connection's lock is held, and close()
+        # takes self._lock before connection locks, so sharing self._lock could deadlock
+        self._stats_lock = threading.Lock()
+        self.stats = {"connects": 0, "reuses": 0, "reconnects": 0}
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _connect(self, conn: _Conn, ip: str, port: int):
+        if not conn.client.connect():
+            raise ConnectionError(f"Could not connect to Modbus device at {ip}:{port}")
+        conn.client.socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self._count("connects")
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        for key, conn in list(self._conns.items()):
+            if now - conn.last_used > self.idle_timeout and conn.lock.acquire(blocking=False):
+                try:
+                    conn.client.close()
+                    del self._conns[key]
+                finally:
+                    conn.lock.release()
+
+    @contextmanager
+    def client(self, ip: str, port: int):
+        """A connected client for (ip, port), held exclusively for the with-block."""
+        key = (ip, int(port))
+        with self._lock:
+            self._evict_idle()
+            conn = self._conns.get(key)
+            if conn is None:
+                conn = self._conns[key] = _Conn(ModbusTcpClient(ip, port=int(port), timeout=self.timeout))
+        with conn.lock:
+            if _alive(conn.client):
+                self._count("reuses")
+            else:
+                conn.client.close()
+                self._connect(conn, ip, port)
+            try:
+                yield conn.client
+            finally:
+                conn.last_used = time.monotonic()
+
+    def call(self, ip: str, port: int, fn):
+        """fn(client) on a pooled connection; a link that dies mid-call is reopened and fn retried once."""
+        for attempt in (1, 2):
+            with self.client(ip, port) as client:
+                try:
+                    return fn(client)
+                except (ModbusException, OSError):
+                    client.close()
+                    if attempt == 2:
+                        raise
+                    self._count("reconnects")
+
+    def close(self, ip: str | None = None, port: int | None = None):
+        """Close one drive's connection, or all of them."""
+        with self._lock:
+            keys = [k for k in self._conns if ip is None or k == (ip, int(port))]
+            for k in keys:
+                conn = self._conns.pop(k)
+                with conn.lock:
+                    conn.client.close()
+
+
+# ───── Fleet poll (asyncio) ─────
+async def _read_async(client, start: int, count: int, device_id: int):
+    resp = await client.read_holding_registers(start, count=count, device_id=device_id)
+    if resp.isError() or len(resp.registers) < count:
+        return None
+    return resp.registers
+
+
+async def _execute_async(blocks: list, read) -> list:
+    """_execute for an awaitable read(start, count)."""
+    done, reads = [], _plan_reads(blocks)
+    step = next(reads, None)
+    while step is not None:
+        block, pos = step
+        words = await read(block.start, block.count)
+        done.append((block, pos, words))
+        step = _send(reads, words)
+    return done
+
+
+async def read_blocks_async(blocks: list, client, device_id: int = 1) -> dict:
+    """read_blocks for an AsyncModbusTcpClient (same fallback for refused blocks)."""
+    reads = await _execute_async(blocks, lambda start, count: _read_async(client, start, count, device_id))
+    return _values(reads)
+
+
+async def poll_drive(ip: str, port: int, blocks: list, timeout: float, device_id: int = 1) -> dict:
+    """Connect, read a block plan and close – the whole exchange bounded by `timeout` seconds."""
+    t0 = time.perf_counter()
+    client = AsyncModbusTcpClient(ip, port=int(port), timeout=min(timeout, 3.0), retries=0, reconnect_delay=0)
+
+    async def _poll():
+        if not await client.connect():
+            raise ConnectionError(f"Could not connect to {ip}:{port}")
+        return await read_blocks_async(blocks, client, device_id)
+
+    try:
+        values = await asyncio.wait_for(_poll(), timeout)
+        return {"ip": ip, "port": port, "values": values, "error": None,
+                "elapsed": time.perf_counter() - t0}
+    except asyncio.TimeoutError:
+        error = f"timed out after {timeout:g}s"
+    except (ModbusException, OSError) as e:
+        error = str(e) or type(e).__name__
+    finally:
+        client.close()
+    return {"ip": ip, "port": port, "values": None, "error": error, "elapsed": time.perf_counter() - t0}
+
+
+async def poll_fleet(jobs: list, concurrency: int = 16, timeout: float = 10.0,
+                     max_gap: int = DEFAULT_MAX_GAP) -> list:
+    """
+    jobs: [(ip, port, reg_dict), …] → one poll_drive result per job, in job order.
+    At most `concurrency` drives are talked to at once.
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+    plans = {}
+
+    async def _one(ip, port, reg_dict):
+        key = id(reg_dict)
+        if key not in plans:
+            plans[key] = plan_blocks(reg_dict, max_gap)
+        async with sem:
+            return await poll_drive(ip, port, plans[key], timeout)
+
+    return await asyncio.gather(*(_one(*job) for job in jobs))
+
+
+# ───── Live mode ─────
+class RingBuffer:
+    """Last `capacity` samples of a fixed set of channels (float64, NaN = no reading)."""
+
+    def __init__(self, channels: list, capacity: int):
+        self.channels = list(channels)
+        self.capacity = int(capacity)
+        self.t = np.full(self.capacity, np.nan)
+        self.data = np.full((len(self.channels), self.capacity), np.nan)
+        self.written = 0
+        self._lock = threading.Lock()
+
+    def append(self, t: float, values):
+        with self._lock:
+            i = self.written % self.capacity
+            self.t[i] = t
+            self.data[:, i] = values
+            self.written += 1
+
+    def snapshot(self):
+        """(times, values[channel, sample]) oldest first – copies, safe to keep."""
+        with self._lock:
+            if self.written <= self.capacity:
+                return self.t[:self.written].copy(), self.data[:, :self.written].copy()
+            i = self.written % self.capacity
+            order = np.r_[i:self.capacity, 0:i]
+            return self.t[order], self.data[:, order]
+
+
+class LivePoller:
+    """Poll `reg_dict` on a pooled connection every 1/rate_hz seconds into a RingBuffer."""
+
+    def __init__(self, pool: ClientPool, ip: str, port: int, reg_dict: dict, scale: dict | None = None,
+                 rate_hz: float = 1.0, capacity: int = 600, idle_stop: float = 60.0,
+                 max_gap: int = DEFAULT_MAX_GAP):
+        self.pool, self.ip, self.port = pool, ip, int(port)
+        self.blocks = plan_blocks(reg_dict, max_gap)
+        self.channels = list(reg_dict)
+        self.divide = np.array([(scale or {}).get(c, 1) or 1 for c in self.channels], dtype=float)
+        self.period = 1.0 / rate_hz
+        self.idle_stop = idle_stop
+        self.buffer = RingBuffer(self.channels, capacity)
+        self.errors = 0
+        self.last_error = None
+        self._last_seen = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name=f"live-{ip}:{port}")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive() and not self._stop.is_set()
+
+    def snapshot(self):
+        self._last_seen = time.monotonic()
+        return self.buffer.snapshot()
+
+    def _sample(self) -> np.ndarray:
+        vals = self.pool.call(self.ip, self.port, lambda c: read_blocks(self.blocks, c))
+        raw = np.array([np.nan if vals.get(c) is None else vals[c] for c in self.channels], dtype=float)
+        return raw / self.divide
+
+    def _loop(self):
+        due = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                row = self._sample()
+            except Exception as e:          # keep polling; the gap shows as NaN
+                self.errors += 1
+                self.last_error = str(e)
+                row = np.full(len(self.channels), np.nan)
+            self.buffer.append(time.time(), row)
+
+            now = time.monotonic()
+            if now - self._last_seen > self.idle_stop:
+                break
+            due = max(due + self.period, now)   # don't burst to catch up after a slow read
+            self._stop.wait(due - now)
+        self._stop.set()
+
+
+# ───── Imported templates ─────
+MAPPING_COLUMNS = ("Parameter Name", "Register Address", "Register Count", "Category")
+
+
+def read_words(blocks: list, size: int, client, device_id: int = 1):
+    """
+    Execute a block plan into one flat buffer, blocks back to back in plan order.
+    Returns (words uint16[size], valid bool[size]); refused blocks fall back as in
+    read_blocks, registers that still can't be read stay invalid.
+    """
+    words = np.zeros(size, dtype=np.uint16)
+    valid = np.zeros(size, dtype=bool)
+    for block, pos, got in _execute(blocks, lambda start, count: _read(client, start, count, device_id)):
+        if got is not None:
+            words[pos:pos + block.count] = got[:block.count]
+            valid[pos:pos + block.count] = True
+    return words, valid
+
+
+class DecoderPlan:
+    """A drive's Mappings sheet compiled for repeated polling (see compile_mappings)."""
+
+    def __init__(self, names, core, address, count, signed, divide, multiply,
+                 max_gap: int = DEFAULT_MAX_GAP):
+        self.names = list(names)
+        self.core = np.asarray(core, dtype=bool)
+        self.count = np.asarray(count, dtype=np.int64)
+        self.signed = np.asarray(signed, dtype=bool)
+        self.divide = np.asarray(divide, dtype=float)
+        self.multiply = np.asarray(multiply, dtype=float)
+        self.scaled = (self.divide != 1) | (self.multiply != 1)
+        # parameters are keyed by row number, so duplicate names can't collide in the plan
+        self.blocks = plan_blocks({i: (int(a), int(c)) for i, (a, c) in enumerate(zip(address, self.count))},
+                                  max_gap)
+        self.size = sum(b.count for b in self.blocks)
+        self.index = np.zeros(len(self.names), dtype=np.int64)
+        pos = 0
+        for block in self.blocks:
+            for i, offset, _ in block.fields:
+                self.index[i] = pos + offset
+            pos += block.count
+        self.high = np.where(self.count == 2, self.index + 1, self.index)
+
+    def __len__(self):
+        return len(self.names)
+
+    def decode(self, words, valid):
+        """(raw int64, scaled float64, ok bool) for every parameter, in sheet order."""
+        low = words[self.index].astype(np.int64)
+        high = words[self.high].astype(np.int64)
+        two = self.count == 2
+        raw = np.where(two, (high << 16) | low, low)
+        raw = np.where(self.signed & ~two & (raw >= 1 << 15), raw - (1 << 16), raw)
+        raw = np.where(self.signed & two & (raw >= 1 << 31), raw - (1 << 32), raw)
+        return raw, raw / self.divide * self.multiply, valid[self.index] & valid[self.high]
+
+    def poll(self, client, device_id: int = 1):
+        """Read and decode → (core values, additional values) by name; None = unreadable."""
+        raw, scaled, ok = self.decode(*read_words(self.blocks, self.size, client, device_id))
+        values = scaled.astype(object)
+        values[~self.scaled] = raw[~self.scaled]      # unscaled parameters stay ints
+        values[~ok] = None
+        values = values.tolist()
+        core = {n: v for n, v, c in zip(self.names, values, self.core) if c}
+        additional = {n: v for n, v, c in zip(self.names, values, self.core) if not c}
+        return core, additional
+
+
+def compile_mappings(df_map: pd.DataFrame, max_gap: int = DEFAULT_MAX_GAP) -> DecoderPlan:
+    """
+    Mappings sheet rows (one drive type) → DecoderPlan. Rows without a name or
+    address, or with a Category other than core / additional, are skipped.
+    Data Type int16 / int32 decodes two's complement, anything else unsigned;
+    an empty or zero Scale Divide / Scale Multiply means 1.
+    """
+    missing = [c for c in MAPPING_COLUMNS if c not in df_map.columns]
+    if missing:
+        raise ValueError(f"Mappings sheet is missing column(s): {', '.join(missing)}")
+
+    category = df_map["Category"].astype(str).str.strip().str.lower()
+    address = pd.to_numeric(df_map["Register Address"], errors="coerce")
+    keep = df_map["Parameter Name"].notna() & address.notna() & category.isin(["core", "additional"])
+    df = df_map[keep]
+
+    def _numeric(col, default):
+        if col not in df.columns:
+            return np.full(len(df), default, dtype=float)
+        vals = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+        return np.where(np.isnan(vals) | (vals == 0), default, vals)
+
+    dtype = df["Data Type"] if "Data Type" in df.columns else pd.Series("", index=df.index)
+    return DecoderPlan(
+        names=df["Parameter Name"].astype(str).str.strip(),
+        core=(category[keep] == "core").to_numpy(),
+        address=address[keep].astype(int).to_numpy(),
+        count=_numeric("Register Count", 1).astype(int),
+        signed=dtype.astype(str).str.strip().str.lower().isin(["int16", "int32"]).to_numpy(),
+        divide=_numeric("Scale Divide", 1),
+        multiply=_numeric("Scale Multiply", 1),
+        max_gap=max_gap,
+    )
@@ -0,0 +1,298 @@
+# drive_sim.py – local Modbus TCP stand-in for SPOC and Triol drives
+# -----------------------------------------------------------------------------------------
+# • Serves the dashboard's register maps (drive_maps) with plausible raw values: set
+#   points, delays and restarts as a commissioned drive holds them, telemetry (frequency,
+#   currents, temperatures, voltages) wandering a little on every read
+# • Configurable latency (mean + jitter) and failure mix: Modbus exception replies
+#   ("register errors", DEVICE_BUSY by default) and dropped requests (no reply at all –
+#   the client runs into its timeout)
+# • strict=True answers ILLEGAL_ADDRESS for any read touching an unmapped register, like
+#   the real drives; by default the gaps between mapped registers read as 0
+# • Any number of drives on consecutive ports, all on one asyncio loop in a background
+#   thread; port 0 picks free ports (SimFleet.drives has the ones in use)
+# • Point the dashboard's Fleet Poll / Live Mode at 127.0.0.1:<port>
+#
+#   python drive_sim.py                                       # 1 SPOC on :5020
+#   python drive_sim.py --spoc 20 --triol 20 --latency 40 --drop-rate 0.02
+#   python drive_sim.py --triol 5 --strict --error-rate 0.1 --base-port 6000
+
+import argparse
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from pymodbus.constants import ExcCodes
+from pymodbus.datastore import ModbusDeviceContext, ModbusServerContext, ModbusSparseDataBlock
+from pymodbus.exceptions import NoSuchIdException
+from pymodbus.server import ModbusTcpServer
+
+import drive_modbus
+from drive_maps import registers, additional_registers, TRIOL_REGISTERS, TRIOL_ADDITIONAL
+
+# raw register values, i.e. before the dashboard's scaling (see spoc_tables / TRIOL_DIVIDE)
+SPOC_VALUES = {
+    "Set_Point_Value_Underload":          250,    # /10  → 25.0 A
+    "Set_Point_Value_Overload":           600,    # /10  → 60.0 A
+    "Set_Point_Value_Low_Frequency":      3500,   # /100 → 35.00 Hz
+    "Set_Point_Value_High_Winding_Temp":  2500,   # /10  → 250.0 °F
+    "Start_Delay_Underload":              2,      # ×60  → 120 s
+    "Start_Delay_Overload":               2,
+    "Start_Delay_Low_Frequency":          1,
+    "Start_Delay_High_Winding_Temp":      60,
+    "Trigger_Delay_Underload":            5,
+    "Trigger_Delay_Overload":             5,
+    "Trigger_Delay_Low_Frequency":        10,
+    "Trigger_Delay_High_Winding_Temp":    10,
+    "Restart_Attempts_Underload":         3,
+    "Restart_Attempts_Overload":          3,
+    "Restart_Attempts_Low_Frequency":     3,
+    "Restart_Attempts_High_Winding_Temp": 1,
+    "Down_Time_Underload":                30,
+    "Down_Time_Overload":                 30,
+    "Down_Time_Low_Frequency":            15,
+    "Down_Time_High_Winding_Temp":        60,
+    "Output_Freq_Hz":                     5500,   # /100 → 55.00 Hz
+    "Motor_Current_A":                    42,
+    "VFD_Current_A":                      385,    # /10  → 38.5 A
+    "Fluid_Temp_F":                       1800,   # /10  → 180.0 °F
+    "Motor_Temp_F":                       2400,   # /10  → 240.0 °F
+    "DC_Bus_Voltage_V":                   650,
+    "Motor_Voltage_V":                    2100,
+    "Output_Voltage_V":                   4800,   # /10  → 480.0 V
+    "General_Down_Time":                  30,
+    "Max_Volt_at_max_Frequency_Spoc_(V)": 480,
+    "Normal_Running_Amp_(A)":             40,
+    "DH_MOTOR_TEMP_UL_ACTION":            2,      # On
+}
+
+TRIOL_VALUES = {
+    **{f"Protection_{p}": v for p, v in (
+        ("Underload", 2), ("Overload", 1), ("Low_Frequency", 2),
+        ("High_Intake_Temp", 3), ("High_Winding_Temp", 1),
+    )},                                           # 1 Lockout, 2 Autorestart, 3 Warning
+    "Set_Point_Value_Underload":          250,    # /10  → 25.0 A
+    "Set_Point_Value_Overload":           600,
+    "Set_Point_Value_Low_Frequency":      350,    # /10  → 35.0 Hz
+    "Set_Point_Value_High_Intake_Temp":   25000,  # /100 → 250.00 °F, 32-bit
+    "Set_Point_Value_High_Winding_Temp":  30000,  # /100 → 300.00 °F, 32-bit
+    **{f"Start_Delay_{p}": 1200 for p in (       # /10  → 120.0 s
+        "Underload", "Overload", "Low_Frequency", "High_Intake_Temp", "High_Winding_Temp")},
+    **{f"Trigger_Delay_{p}": 5 for p in (
+        "Underload", "Overload", "Low_Frequency", "High_Intake_Temp", "High_Winding_Temp")},
+    **{f"Restart_Attempts_{p}": 3 for p in (
+        "Underload", "Overload", "Low_Frequency", "High_Intake_Temp", "High_Winding_Temp")},
+    **{f"Down_Time_{p}": 30 for p in (
+        "Underload", "Overload", "Low_Frequency", "High_Intake_Temp", "High_Winding_Temp")},
+    "Output_Freq_Hz":                     550,    # /10  → 55.0 Hz
+    "Motor_Current_A":                    420,    # /10  → 42.0 A
+    "VFD_Current_A":                      38,
+    "Fluid_Temp_F":                       18000,  # /100 → 180.00 °F, 32-bit
+    "Motor_Temp_F":                       24000,
+    "DC_Bus_Voltage_V":                   650,
+    "Motor_Voltage_V":                    2100,
+    "Output_Voltage_V":                   480,
+    "Power_factor":                       9,      # /10  → 0.9
+}
+
+DRIVES = {
+    "SPOC":  ({**registers, **additional_registers}, SPOC_VALUES),
+    "Triol": ({**TRIOL_REGISTERS, **TRIOL_ADDITIONAL}, TRIOL_VALUES),
+}
+
+# measured values – these drift between reads, everything else is a setting
+TELEMETRY = (
+    "Output_Freq_Hz", "Motor_Current_A", "VFD_Current_A", "Fluid_Temp_F", "Motor_Temp_F",
+    "DC_Bus_Voltage_V", "Motor_Voltage_V", "Output_Voltage_V",
+)
+
+
+class SimConfig:
+    def __init__(self, latency=0.02, jitter=0.005, error_rate=0.0,
+                 error_code=ExcCodes.DEVICE_BUSY, drop_rate=0.0, noise=0.01,
+                 strict=False, seed=None):
+        self.latency = latency            # seconds per request
+        self.jitter = jitter              # ± seconds, uniform
+        self.error_rate = error_rate      # share of reads answered with error_code
+        self.error_code = ExcCodes(error_code)
+        self.drop_rate = drop_rate        # share of reads never answered
+        self.noise = noise                # relative σ of the telemetry drift
+        self.strict = strict              # unmapped registers → ILLEGAL_ADDRESS
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "dropped": 0, "refused": 0}
+
+    def draw(self):
+        """(delay, outcome) for one request; outcome ∈ ok / error / drop."""
+        with self.lock:
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+            r = self.rng.random()
+            outcome = ("drop" if r < self.drop_rate
+                       else "error" if r < self.drop_rate + self.error_rate
+                       else "ok")
+            return delay, outcome
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+
+def encode(value: int, count: int) -> list:
+    """Inverse of drive_modbus.decode: count 2 → [low, high]."""
+    value = int(value) & 0xFFFFFFFF
+    if count == 2:
+        return [value & 0xFFFF, value >> 16]
+    return [value & 0xFFFF]
+
+
+def drive_image(drive: str, rng: random.Random, strict: bool = False):
+    """
+    Register image of one drive: ({address: word}, {address: (count, raw)} for the
+    telemetry). Each drive gets its own operating point, ±5 % around the defaults.
+    """
+    reg_map, values = DRIVES[drive]
+    words, live = {}, {}
+    if not strict:
+        for block in drive_modbus.plan_blocks(reg_map):
+            words.update(dict.fromkeys(range(block.start, block.start + block.count), 0))
+    for name, (addr, count) in reg_map.items():
+        raw = values.get(name, 0)
+        if name in TELEMETRY:
+            raw = round(raw * rng.uniform(0.95, 1.05))
+            live[addr] = (count, raw)
+        for i, word in enumerate(encode(raw, count)):
+            words[addr + i] = word
+    return words, live
+
+
+class SimContext:
+    """
+    Sits in front of the server's datastore (server.context – pymodbus may have
+    converted the ModbusServerContext handed to it): fault injection and telemetry
+    drift on reads, everything else passed through.
+    """
+
+    def __init__(self, inner, live: dict, cfg: SimConfig):
+        self.inner = inner
+        self.live = live
+        self.cfg = cfg
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    async def async_getValues(self, device_id, func_code, address, count=1):
+        cfg = self.cfg
+        cfg.count("requests")
+        delay, outcome = cfg.draw()
+        if delay:
+            await asyncio.sleep(delay)
+        if outcome == "drop":
+            # with ignore_missing_devices the server sends nothing back
+            cfg.count("dropped")
+            raise NoSuchIdException("dropped by drive_sim")
+        if outcome == "error":
+            cfg.count("errors")
+            return cfg.error_code
+
+        values = await self.inner.async_getValues(device_id, func_code, address, count)
+        if not isinstance(values, list):
+            cfg.count("refused")
+            return values
+        for addr, (n, raw) in self.live.items():
+            if address <= addr and addr + n <= address + count:
+                with cfg.lock:
+                    drift = 1 + cfg.rng.gauss(0, cfg.noise)
+                values[addr - address:addr - address + n] = encode(max(0, round(raw * drift)), n)
+        cfg.count("ok")
+        return values
+
+
+class SimFleet:
+    """Running simulators: drives = [(drive type, port), …]; stop() shuts all of them down."""
+
+    def __init__(self, loop, thread, servers, drives, cfg):
+        self.loop = loop
+        self.thread = thread
+        self.servers = servers
+        self.drives = drives
+        self.cfg = cfg
+
+    def stop(self, timeout: float = 5.0):
+        async def _shutdown():
+            for server in self.servers:
+                await server.shutdown()
+
+        asyncio.run_coroutine_threadsafe(_shutdown(), self.loop).result(timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+
+
+def serve(drives: list, cfg: SimConfig | None = None, host: str = "127.0.0.1",
+          base_port: int = 0) -> SimFleet:
+    """
+    Start one simulator per entry of `drives` ("SPOC" / "Triol") on a background
+    thread, on base_port, base_port + 1, … (base_port 0 = free ports). Returns once
+    every drive is listening.
+    """
+    cfg = cfg or SimConfig()
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True, name="drive-sim")
+    thread.start()
+
+    async def _start():
+        servers, ports = [], []
+        for i, drive in enumerate(drives):
+            words, live = drive_image(drive, cfg.rng, cfg.strict)
+            port = base_port + i if base_port else 0
+            context = ModbusServerContext(devices={1: ModbusDeviceContext(hr=ModbusSparseDataBlock(words))})
+            server = ModbusTcpServer(context, address=(host, port), ignore_missing_devices=True)
+            server.context = SimContext(server.context, live, cfg)
+            await server.serve_forever(background=True)
+            servers.append(server)
+            ports.append(server.transport.sockets[0].getsockname()[1])
+        return servers, ports
+
+    try:
+        servers, ports = asyncio.run_coroutine_threadsafe(_start(), loop).result(30)
+    except BaseException:
+        loop.call_soon_threadsafe(loop.stop)
+        raise
+    return SimFleet(loop, thread, servers, list(zip(drives, ports)), cfg)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local Modbus TCP simulator for SPOC and Triol drives.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--base-port", type=int, default=5020, help="first port, one port per drive")
+    ap.add_argument("--spoc", type=int, default=None, help="number of SPOC drives (default 1)")
+    ap.add_argument("--triol", type=int, default=0, help="number of Triol drives")
+    ap.add_argument("--latency", type=float, default=20, help="mean response time per request, ms")
+    ap.add_argument("--jitter", type=float, default=5, help="± ms, uniform")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share answered with --error-code")
+    ap.add_argument("--error-code", type=int, default=int(ExcCodes.DEVICE_BUSY),
+                    help="Modbus exception code for injected errors (default 6, device busy)")
+    ap.add_argument("--drop-rate", type=float, default=0.0, help="share of requests never answered")
+    ap.add_argument("--noise", type=float, default=0.01, help="relative drift of the telemetry")
+    ap.add_argument("--strict", action="store_true", help="refuse reads over unmapped registers")
+    ap.add_argument("--seed", type=int)
+    args = ap.parse_args()
+
+    logging.getLogger("pymodbus").setLevel(logging.ERROR)   # datastore deprecation notices
+    spoc = 1 if args.spoc is None and not args.triol else args.spoc or 0
+    cfg = SimConfig(args.latency / 1000, args.jitter / 1000, args.error_rate, args.error_code,
+                    args.drop_rate, args.noise, args.strict, args.seed)
+    fleet = serve(["SPOC"] * spoc + ["Triol"] * args.triol, cfg, args.host, args.base_port)
+    for drive, port in fleet.drives:
+        print(f"   {drive:<5} {args.host}:{port}")
+    print(f"{len(fleet.drives)} simulated drive(s) – Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"   {cfg.stats}", flush=True)
+    except KeyboardInterrupt:
+        fleet.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# n8n_stub.py – local stand-in for the n8n "Trigger" webhook
+# -----------------------------------------------------------------------------------------
+# • POST {"well_name": …} → JSON list of tickets, shaped like the n8n workflow's reply
+# • Configurable latency (mean + jitter) and failure mix: HTTP errors (retried by the
+#   dashboard on 5xx/429, optionally with a Retry-After header) and dropped connections
+# • Keep-alive (HTTP/1.1), one thread per connection
+# • Point the dashboard at it:  N8N_WEBHOOK_URL=http://127.0.0.1:8765/webhook
+#
+#   python n8n_stub.py                                  # 200 ms ± 50 ms, no errors
+#   python n8n_stub.py --latency 800 --error-rate 0.2 --drop-rate 0.05
+
+import argparse
+import datetime as dt
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubConfig:
+    def __init__(self, latency=0.2, jitter=0.05, error_rate=0.0, error_status=503,
+                 drop_rate=0.0, max_tickets=3, seed=None, retry_after=None):
+        self.latency = latency            # seconds
+        self.jitter = jitter              # ± seconds, uniform
+        self.error_rate = error_rate      # share of requests answered with error_status
+        self.error_status = error_status
+        self.retry_after = retry_after    # seconds sent as Retry-After on error replies, or None
+        self.drop_rate = drop_rate        # share of connections closed without a reply
+        self.max_tickets = max_tickets
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.ticket_ids = itertools.count(1000)
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "dropped": 0}
+
+    def draw(self):
+        """(delay, outcome, n_tickets) for one request; outcome ∈ ok / error / drop."""
+        with self.lock:
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+            r = self.rng.random()
+            outcome = ("drop" if r < self.drop_rate
+                       else "error" if r < self.drop_rate + self.error_rate
+                       else "ok")
+            return delay, outcome, self.rng.randint(1, max(1, self.max_tickets))
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+
+def make_handler(cfg: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status: int, payload, headers=None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            cfg.count("requests")
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                well = json.loads(self.rfile.read(length) or b"{}")["well_name"]
+            except (ValueError, KeyError):
+                cfg.count("errors")
+                return self._reply(400, {"error": "expected JSON body with well_name"})
+
+            delay, outcome, n = cfg.draw()
+            time.sleep(delay)
+            if outcome == "drop":
+                cfg.count("dropped")
+                self.close_connection = True
+                self.connection.close()
+                return
+            if outcome == "error":
+                cfg.count("errors")
+                headers = {} if cfg.retry_after is None else {"Retry-After": str(cfg.retry_after)}
+                return self._reply(cfg.error_status, {"error": "stub failure"}, headers)
+
+            now = dt.datetime.now().isoformat(timespec="seconds")
+            with cfg.lock:
+                ids = [next(cfg.ticket_ids) for _ in range(n)]
+            cfg.count("ok")
+            self._reply(200, [
+                {"Ticket": f"WR-{i}", "Well": well, "Status": "Open", "Created": now,
+                 "Summary": f"Review requested for {well}"}
+                for i in ids
+            ])
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(cfg: StubConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the stub on a background thread; port 0 picks a free port (server.server_port)."""
+    server = ThreadingHTTPServer((host, port), make_handler(cfg))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="n8n-stub").start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local stand-in for the n8n Trigger webhook.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=200, help="mean response time, ms")
+    ap.add_argument("--jitter", type=float, default=50, help="± ms, uniform")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share answered with --error-status")
+    ap.add_argument("--error-status", type=int, default=503)
+    ap.add_argument("--retry-after", type=int, help="Retry-After seconds sent with error replies")
+    ap.add_argument("--drop-rate", type=float, default=0.0, help="share of connections dropped")
+    ap.add_argument("--tickets", type=int, default=3, help="max tickets per reply")
+    ap.add_argument("--seed", type=int)
+    args = ap.parse_args()
+
+    cfg = StubConfig(args.latency / 1000, args.jitter / 1000, args.error_rate, args.error_status,
+                     args.drop_rate, args.tickets, args.seed, args.retry_after)
+    server = serve(cfg, args.host, args.port)
+    print(f"n8n stub on http://{args.host}:{server.server_port}/webhook – Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"   {cfg.stats}", flush=True)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
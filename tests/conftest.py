@@ -0,0 +1,5 @@
+# conftest.py – the helper modules live at the repo root, next to the Streamlit scripts
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
@@ -0,0 +1,163 @@
+# test_drive_modbus.py – block reads and the asyncio fleet poll against drive_sim
+import asyncio
+import logging
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+from pymodbus.client import ModbusTcpClient
+
+import drive_modbus
+import drive_sim
+
+HOST = "127.0.0.1"
+
+logging.getLogger("pymodbus").setLevel(logging.CRITICAL)
+
+
+@pytest.fixture
+def sim():
+    fleets = []
+
+    def start(drives, **kw):
+        kw.setdefault("latency", 0.0)
+        kw.setdefault("jitter", 0.0)
+        kw.setdefault("noise", 0.0)           # telemetry holds still between reads
+        fleet = drive_sim.serve(drives, drive_sim.SimConfig(seed=0, **kw))
+        fleets.append(fleet)
+        return fleet
+
+    yield start
+    for fleet in fleets:
+        fleet.stop()
+
+
+def per_register(port: int, reg_dict: dict) -> dict:
+    """One read per parameter – the reference the block plans must agree with."""
+    client = ModbusTcpClient(HOST, port=port, timeout=3, retries=0)
+    assert client.connect()
+    try:
+        vals = {}
+        for name, (addr, count) in reg_dict.items():
+            resp = client.read_holding_registers(addr, count=count, device_id=1)
+            vals[name] = None if resp.isError() else drive_modbus.decode(resp.registers, count)
+        return vals
+    finally:
+        client.close()
+
+
+def fleet_jobs(fleet) -> list:
+    return [(HOST, port, drive_sim.DRIVES[drive][0]) for drive, port in fleet.drives]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def test_plan_blocks_respects_limits():
+    reg_map = drive_sim.DRIVES["Triol"][0]
+    blocks = drive_modbus.plan_blocks(reg_map)
+    assert len(blocks) < len(reg_map)
+    assert all(b.count <= drive_modbus.MAX_BLOCK for b in blocks)
+    assert sorted(n for b in blocks for n, _, _ in b.fields) == sorted(reg_map)
+
+
+@pytest.mark.parametrize("strict", [False, True])
+def test_fleet_poll_matches_per_register_reads(sim, strict):
+    fleet = sim(["SPOC", "Triol", "SPOC"], strict=strict)
+    res = asyncio.run(drive_modbus.poll_fleet(fleet_jobs(fleet), concurrency=2, timeout=10))
+    assert [r["port"] for r in res] == [port for _, port in fleet.drives]
+    for (drive, port), r in zip(fleet.drives, res):
+        assert r["error"] is None
+        expected = per_register(port, drive_sim.DRIVES[drive][0])
+        assert None not in expected.values()
+        assert r["values"] == expected
+
+
+def test_strict_drive_refuses_blocks_and_falls_back(sim):
+    fleet = sim(["Triol"], strict=True)
+    (drive, port), = fleet.drives
+    reg_map = drive_sim.DRIVES[drive][0]
+    blocks = drive_modbus.plan_blocks(reg_map)
+    assert any(len(b.fields) > 1 for b in blocks)
+
+    res, = asyncio.run(drive_modbus.poll_fleet(fleet_jobs(fleet), timeout=10))
+    assert res["error"] is None
+    assert fleet.cfg.stats["refused"] > 0                 # the gap-bridging blocks were refused …
+    assert fleet.cfg.stats["requests"] > len(blocks)
+    assert res["values"] == per_register(port, reg_map)    # … and every value still came back
+
+
+def test_read_blocks_matches_async(sim):
+    fleet = sim(["SPOC"], strict=True)
+    (drive, port), = fleet.drives
+    reg_map = drive_sim.DRIVES[drive][0]
+    pool = drive_modbus.ClientPool()
+    try:
+        vals = pool.call(HOST, port, lambda c: drive_modbus.read_blocks(drive_modbus.plan_blocks(reg_map), c))
+    finally:
+        pool.close()
+    assert vals == per_register(port, reg_map)
+
+
+def test_one_drive_down_does_not_fail_the_fleet(sim):
+    fleet = sim(["SPOC", "Triol"])
+    silent = sim(["SPOC"], drop_rate=1.0)                # connects, never answers
+    jobs = fleet_jobs(fleet)
+    jobs.insert(1, (HOST, free_port(), drive_sim.DRIVES["SPOC"][0]))   # nothing listening
+    jobs.append(fleet_jobs(silent)[0])
+
+    res = asyncio.run(drive_modbus.poll_fleet(jobs, concurrency=4, timeout=1.5))
+    assert [r["port"] for r in res] == [port for _, port, _ in jobs]
+    good = [res[0], res[2]]
+    for (drive, port), r in zip(fleet.drives, good):
+        assert r["error"] is None
+        assert r["values"] == per_register(port, drive_sim.DRIVES[drive][0])
+    assert res[1]["values"] is None and res[1]["error"]
+    assert res[3]["values"] is None and res[3]["error"]
+    assert res[3]["elapsed"] < 3
+
+
+def test_decoder_plan_falls_back_like_read_blocks(sim):
+    fleet = sim(["Triol"], strict=True)
+    (drive, port), = fleet.drives
+    reg_map = {**drive_sim.DRIVES[drive][0], "Not_On_Drive": (9000, 2)}
+    df_map = pd.DataFrame({
+        "Parameter Name":   list(reg_map),
+        "Register Address": [a for a, _ in reg_map.values()],
+        "Register Count":   [c for _, c in reg_map.values()],
+        "Category":         "core",
+    })
+    plan = drive_modbus.compile_mappings(df_map, max_gap=10_000)   # one block per 125 registers
+    pool = drive_modbus.ClientPool()
+    try:
+        core, additional = pool.call(HOST, port, plan.poll)
+        blocks = pool.call(HOST, port, lambda c: drive_modbus.read_blocks(drive_modbus.plan_blocks(reg_map), c))
+    finally:
+        pool.close()
+    assert additional == {}
+    assert core == blocks == per_register(port, reg_map)
+    assert core["Not_On_Drive"] is None
+
+
+def test_client_pool_stats_under_concurrency(sim):
+    fleet = sim(["SPOC", "Triol"])
+    blocks = {d: drive_modbus.plan_blocks(drive_sim.DRIVES[d][0]) for d, _ in fleet.drives}
+    pool = drive_modbus.ClientPool()
+
+    def poll(i):
+        drive, port = fleet.drives[i % 2]
+        return pool.call(HOST, port, lambda c: drive_modbus.read_blocks(blocks[drive], c))
+
+    try:
+        with ThreadPoolExecutor(max_workers=8) as ex:
+            results = list(ex.map(poll, range(40)))
+    finally:
+        pool.close()
+    assert all(None not in r.values() for r in results)
+    assert pool.stats["connects"] == 2
+    assert pool.stats["connects"] + pool.stats["reuses"] == 40
+    assert pool.stats["reconnects"] == 0
@@ -0,0 +1,217 @@
+# test_well_n8n.py – TriggerDispatcher / TicketCache against n8n_stub on an ephemeral port
+import time
+
+import pytest
+
+import n8n_stub
+import well_n8n
+
+
+class ScriptedConfig(n8n_stub.StubConfig):
+    """StubConfig whose requests follow a fixed list of outcomes, then succeed."""
+
+    def __init__(self, outcomes=(), **kw):
+        kw.setdefault("latency", 0.0)
+        kw.setdefault("jitter", 0.0)
+        super().__init__(seed=0, **kw)
+        self.outcomes = list(outcomes)
+
+    def draw(self):
+        with self.lock:
+            outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+            return self.latency, outcome, 2
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(cfg):
+        server = n8n_stub.serve(cfg)
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}/webhook"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def wait(dispatcher, wells, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while dispatcher.pending(wells):
+        assert time.monotonic() < deadline, "dispatcher still pending"
+        time.sleep(0.01)
+    return {r["well"]: r for r in dispatcher.results(wells)}
+
+
+# ───── retries ─────
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retries_retryable_status_then_succeeds(stub, status):
+    cfg = ScriptedConfig(["error", "error"], error_status=status)
+    d = well_n8n.TriggerDispatcher(stub(cfg), retries=3, backoff=0.01)
+    d.submit("W-1")
+    res = wait(d, ["W-1"])["W-1"]
+    assert res["status"] == "done"
+    assert res["attempts"] == 3
+    assert cfg.stats["requests"] == 3
+    assert [t["Well"] for t in res["tickets"]] == ["W-1", "W-1"]
+
+
+def test_retries_dropped_connection(stub):
+    cfg = ScriptedConfig(["drop"])
+    d = well_n8n.TriggerDispatcher(stub(cfg), retries=2, backoff=0.01)
+    d.submit("W-1")
+    res = wait(d, ["W-1"])["W-1"]
+    assert res["status"] == "done"
+    assert res["attempts"] == 2
+
+
+def test_gives_up_after_retries(stub):
+    cfg = ScriptedConfig(["error"] * 10, error_status=502)
+    d = well_n8n.TriggerDispatcher(stub(cfg), retries=2, backoff=0.01)
+    d.submit("W-1")
+    res = wait(d, ["W-1"])["W-1"]
+    assert res["status"] == "error"
+    assert "502" in res["error"]
+    assert cfg.stats["requests"] == 3
+
+
+def test_other_4xx_not_retried(stub):
+    cfg = ScriptedConfig(["error"] * 10, error_status=404)
+    d = well_n8n.TriggerDispatcher(stub(cfg), retries=3, backoff=0.01)
+    d.submit("W-1")
+    res = wait(d, ["W-1"])["W-1"]
+    assert res["status"] == "error"
+    assert res["attempts"] == 1
+    assert cfg.stats["requests"] == 1
+
+
+def test_retry_after_honoured(stub):
+    cfg = ScriptedConfig(["error"], error_status=429, retry_after=1)
+    d = well_n8n.TriggerDispatcher(stub(cfg), retries=1, backoff=0.0)
+    t0 = time.monotonic()
+    d.submit("W-1")
+    res = wait(d, ["W-1"])["W-1"]
+    assert res["status"] == "done"
+    assert time.monotonic() - t0 >= 1.0     # backoff alone would retry at once
+
+
+def test_retry_after_capped():
+    class Resp:
+        headers = {"Retry-After": "120"}
+
+    d = well_n8n.TriggerDispatcher("http://127.0.0.1:9/webhook", backoff=0.0)
+    assert d._delay(0, Resp()) == 30.0
+    Resp.headers = {"Retry-After": "2"}
+    assert d._delay(0, Resp()) == 2.0
+
+
+# ───── submit_many ─────
+def test_submit_many_sends_each_well_once_in_parallel(stub):
+    cfg = ScriptedConfig(latency=0.3)
+    d = well_n8n.TriggerDispatcher(stub(cfg), workers=5)
+    wells = ["W-1", "W-2", "W-3", "W-2", "W-4", "W-5"]
+    t0 = time.monotonic()
+    queued = d.submit_many(wells)
+    assert [r["well"] for r in queued] == ["W-1", "W-2", "W-3", "W-4", "W-5"]
+    assert all(r["status"] == "pending" for r in queued)
+    res = wait(d, wells)
+    assert time.monotonic() - t0 < 5 * 0.3    # not one after the other
+    assert cfg.stats["requests"] == 5
+    for well, r in res.items():
+        assert r["status"] == "done"
+        assert {t["Well"] for t in r["tickets"]} == {well}
+
+    rows = well_n8n.ticket_rows(d.results(dict.fromkeys(wells)))
+    assert len(rows) == 10
+    assert {r["Trigger Status"] for r in rows} == {"done"}
+
+
+def test_pending_well_not_sent_twice(stub):
+    cfg = ScriptedConfig(latency=0.2)
+    d = well_n8n.TriggerDispatcher(stub(cfg))
+    d.submit("W-1")
+    assert d.submit("W-1")["status"] == "pending"
+    wait(d, ["W-1"])
+    assert cfg.stats["requests"] == 1
+
+
+# ───── TicketCache ─────
+def test_ticket_cache_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(well_n8n.time, "monotonic", lambda: now[0])
+    cache = well_n8n.TicketCache(ttl=10)
+    cache.put("W-1", ["T1"])
+    now[0] = 109.9
+    assert cache.get("W-1") == ["T1"]
+    now[0] = 110.0
+    assert cache.get("W-1") is None
+    assert len(cache) == 0
+
+
+def test_ticket_cache_invalidate_and_max_entries():
+    cache = well_n8n.TicketCache(max_entries=3)
+    for w in ["W-1", "W-2", "W-3", "W-4"]:
+        cache.put(w, [w])
+    assert cache.get("W-1") is None          # oldest insert evicted
+    cache.invalidate("W-2")
+    assert cache.get("W-2") is None and cache.get("W-3") == ["W-3"]
+    cache.invalidate(["W-3"])
+    assert cache.get("W-3") is None and len(cache) == 1
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_dispatcher_answers_from_cache(stub):
+    cfg = ScriptedConfig()
+    cache = well_n8n.TicketCache(ttl=60)
+    url = stub(cfg)
+    first = well_n8n.TriggerDispatcher(url, cache=cache)
+    first.submit("W-1")
+    tickets = wait(first, ["W-1"])["W-1"]["tickets"]
+
+    second = well_n8n.TriggerDispatcher(url, cache=cache)     # shared between dispatchers
+    res = second.submit("W-1")
+    assert res["status"] == "done" and res["cached"] and res["tickets"] == tickets
+    assert cfg.stats["requests"] == 1
+
+    second.submit("W-1", refresh=True)
+    assert wait(second, ["W-1"])["W-1"]["cached"] is False
+    assert cfg.stats["requests"] == 2
+
+    cache.invalidate("W-1")
+    assert second.submit("W-1")["status"] == "pending"
+    wait(second, ["W-1"])
+    assert cfg.stats["requests"] == 3
+
+
+def test_errors_are_not_cached(stub):
+    cfg = ScriptedConfig(["error"], error_status=400)
+    cache = well_n8n.TicketCache()
+    d = well_n8n.TriggerDispatcher(stub(cfg), cache=cache)
+    d.submit("W-1")
+    assert wait(d, ["W-1"])["W-1"]["status"] == "error"
+    assert cache.get("W-1") is None
+
+
+# ───── _trim ─────
+def test_trim_drops_oldest_finished_keeps_pending():
+    d = well_n8n.TriggerDispatcher("http://127.0.0.1:9/webhook", keep=2)
+    d._results = {
+        "old":     {"status": "done"},
+        "pending": {"status": "pending"},
+        "failed":  {"status": "error"},
+        "new":     {"status": "done"},
+    }
+    d._trim()
+    assert list(d._results) == ["pending", "new"]
+
+
+def test_trim_on_submit_bounds_results():
+    cache = well_n8n.TicketCache()
+    for i in range(5):
+        cache.put(f"W-{i}", [i])
+    d = well_n8n.TriggerDispatcher("http://127.0.0.1:9/webhook", keep=3, cache=cache)
+    d.submit_many([f"W-{i}" for i in range(5)])   # cache hits: finished at once, no posts
+    assert [r["well"] for r in d.results([f"W-{i}" for i in range(5)])] == ["W-2", "W-3", "W-4"]
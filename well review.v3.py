@@ -14,29 +14,59 @@
 # • Top‐corner: company logo + contact info
 # • Night mode toggle in sidebar
 
-import pathlib, re, datetime as dt, numpy as np, pandas as pd, streamlit as st
+import pathlib, datetime as dt, numpy as np, pandas as pd, streamlit as st
 from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
-import openpyxl
-import zipfile, xlrd
-from io import BytesIO
 import json
+import copy
+import hashlib
+import time
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import urllib.parse
-import requests
-import pdfkit, json
+import well_pdf, well_reports
+import well_engine
+import well_settings
+import well_n8n
+from well_engine import col, LOOKBACK_DAYS
 SETTINGS_FILE = pathlib.Path("customer_settings.json")
 # ─── PLACEHOLDER: put your real n8n webhook URL here ───────────────
-N8N_WEBHOOK_URL = "https://<YOUR-N8N-HOST>/webhook"
+# (or set N8N_WEBHOOK_URL, e.g. to a local stub while testing)
+N8N_WEBHOOK_URL = os.environ.get("N8N_WEBHOOK_URL", "https://<YOUR-N8N-HOST>/webhook")
+# seconds a well's tickets are reused before a trigger posts to n8n again
+N8N_TICKET_TTL = float(os.environ.get("N8N_TICKET_TTL", 300))
 # ───── Load or initialize settings ─────
-if SETTINGS_FILE.exists():
+@st.cache_resource(show_spinner=False)
+def settings_store():
+    """One store per server: parsed settings shared by all sessions, re-read only when the file changes."""
+    return well_settings.SettingsStore(SETTINGS_FILE)
+
+store = settings_store()
+settings = store.load()     # shared – change it only through save_settings()
+if store.error is not None:
+    st.warning(f"⚠️ Failed to read {SETTINGS_FILE.name}. Resetting to blank.")
+
+def save_settings(key: str, fn, expected: str | None, where=None) -> bool:
+    """
+    settings[key] = fn(current entry) through the store (atomic, this key only).
+    `expected` is the digest of the entry this session's widgets were built
+    from; if another session saved the key since, nothing is written and the
+    conflict is shown in `where` – the sidebar by default; fragments pass `st`
+    so the warning lands in their own container.
+    """
     try:
-        settings = json.loads(SETTINGS_FILE.read_text())
-        if "DEFAULT" not in settings:
-            settings["DEFAULT"] = {}
-    except Exception as e:
-        st.warning(f"⚠️ Failed to read {SETTINGS_FILE.name}. Resetting to blank.")
-        settings = {"DEFAULT": {}}
-else:
-    settings = {"DEFAULT": {}}
+        digest = store.update(key, fn, expected)
+    except well_settings.SettingsConflict:
+        (where or st.sidebar).warning(
+            f"⚠️ Settings for {key} were changed in another session and have been reloaded. "
+            "Review them and save again."
+        )
+        st.session_state.settings_seen[key] = store.digest(key)
+        return False
+    st.session_state.settings_seen[key] = digest
+    return True
 
 # ───── Persisted slider keys (for JSON) ─────
 THRESH_KEYS = [
@@ -52,11 +82,11 @@ WEIGHT_KEYS = [
 # ───────────────────────── Page config & theme toggle ─────────────────────────
 st.set_page_config(layout="wide")
 
+# count full-script runs – fragments compare against it to spot their own reruns
+st.session_state.app_run = st.session_state.get("app_run", 0) + 1
+
 DATA_DIR      = pathlib.Path("data")
-LOOKBACK_DAYS = 4   # today + previous 3 days
-ROLL_DAYS     = 3
 today         = dt.date.today()
-csv_date_re   = re.compile(r"(\d{4}-\d{2}-\d{2})", re.I)
 
 
 # ──────────── Sidebar: Night Mode Toggle & CSS Overrides ─────────────────
@@ -171,7 +201,7 @@ if night_mode:
         }
 
         /* (b) Default all data-row cells to white + black text.
-            Any inline `js_color` background (green/red) will override this white where it applies. */
+            Any red/green status class (wr-red / wr-green) will override this white where it applies. */
         .ag-theme-alpine-dark .ag-center-cols-container .ag-row .ag-cell {
             background-color: #ffffff;    /* plain white */
             color: #000000;               /* plain black */
@@ -284,102 +314,46 @@ with col2:
         unsafe_allow_html=True,
     )
 
-# ───────────── Helper: ensure Date column ─────────────
-def ensure_date_column(df: pd.DataFrame, source_name: str, *, excel_date=None):
-    if "Date" not in df.columns:
-        if excel_date is not None:
-            df.insert(0, "Date", pd.to_datetime(excel_date).date())
-        else:
-            m = csv_date_re.search(source_name)
-            day = m.group(1) if m else today.strftime("%Y-%m-%d")
-            df.insert(0, "Date", pd.to_datetime(day).date())
-    return df
+# ───────────── Helper: instrumentation ─────────────
+# metrics go to the "Show debug timings" panel and to this logger at DEBUG level
+perf_log = logging.getLogger("well_review.perf")
 
+def perf_note(key: str, value):
+    """Record a timing/size metric for this rerun."""
+    st.session_state.setdefault("perf", {})[key] = value
+    perf_log.debug("%s = %s", key, value)
 
-# ───────────── Excel / CSV loaders ─────────────
-def load_excel(buf) -> pd.DataFrame:
-    """
-    Load .xlsx/.xlsm via pandas + openpyxl hyperlinks,
-    or .xls via xlrd (v1.2.0) with hyperlinks.
-    Always returns a DataFrame with a 'Date' column and 'Link URL'.
-    """
-    raw = buf.read()
-    fname = buf.name.lower()
-
-    # ─── .xlsx / .xlsm ────────────────────────────────────────────────
-    if fname.endswith((".xlsx", ".xlsm")):
-        # read data (header row=5 → index=4)
-        bio = BytesIO(raw)
-        df = pd.read_excel(bio, sheet_name=0, header=4)
-        df.columns = [str(c).strip() for c in df.columns]
-
-        # extract report date from AK2
-        bio.seek(0)
-        dt_val = pd.read_excel(bio, sheet_name=0, header=None, usecols="AK", nrows=2).iloc[1, 0]
-        df = ensure_date_column(df, fname, excel_date=dt_val)
-
-        # default Link URL
-        df["Link URL"] = None
-
-        # attempt to pull hyperlinks
-        try:
-            wb = openpyxl.load_workbook(BytesIO(raw), read_only=True, data_only=True)
-            ws = wb.active
-            # find "link" column in header row 5
-            link_idx = next(
-                (i for i, cell in enumerate(ws[5], start=1)
-                 if isinstance(cell.value, str) and "link" in cell.value.strip().lower()),
-                None
-            )
-            if link_idx:
-                links = []
-                for row in ws.iter_rows(min_row=6, max_row=6+len(df)-1, min_col=link_idx, max_col=link_idx):
-                    cell = row[0]
-                    links.append(cell.hyperlink.target if cell.hyperlink else None)
-                df["Link URL"] = links
-        except (zipfile.BadZipFile, openpyxl.utils.exceptions.InvalidFileException):
-            pass
-
-        return df
-
-    # ─── .xls ─────────────────────────────────────────────────────────
-    if fname.endswith(".xls"):
-        if xlrd.__version__ != "1.2.0":
-            raise RuntimeError(f"xlrd version must be 1.2.0, found {xlrd.__version__}")
-        raw_book = xlrd.open_workbook(file_contents=raw, formatting_info=True)
-        sheet    = raw_book.sheet_by_index(0)
-
-        # header row=5 → index 4
-        cols = [str(v).strip() for v in sheet.row_values(4)]
-        data = [sheet.row_values(r) for r in range(5, sheet.nrows)]
-        df   = pd.DataFrame(data, columns=cols)
-
-        # extract report date from AK2 (row=2, col AK=index 36)
-        dt_val = sheet.cell_value(1, 36)
-        df = ensure_date_column(df, fname, excel_date=dt_val)
-
-        df["Link URL"] = None
-        # find "link" header index
-        link_idx = next((i for i, h in enumerate(cols) if isinstance(h, str) and "link" in h.lower()), None)
-        if link_idx is not None and hasattr(sheet, "hyperlink_map"):
-            links = []
-            for r in range(5, sheet.nrows):
-                h = sheet.hyperlink_map.get((r, link_idx))
-                links.append(h.url_or_path if h else None)
-            df["Link URL"] = links
-
-        return df
-
-    # unsupported
-    raise ValueError(f"Unsupported Excel type: {fname}")
-
-def load_csv(buf, name) -> pd.DataFrame:
-    """Load CSV, ensure Date column, add Link URL placeholder."""
-    # THE FIX: Added header=4 to correctly read the CSV.
-    df = pd.read_csv(buf, header=4) 
-    df = ensure_date_column(df, name)
-    df["Link URL"] = None
-    return df
+@contextmanager
+def perf_timer(section: str):
+    """Time a block (a fragment body, a pipeline stage) as `<section>_ms`."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        perf_since(section, t0)
+
+def perf_since(section: str, t0: float):
+    """Record the milliseconds elapsed since `t0` as `<section>_ms`."""
+    perf_note(f"{section}_ms", round((time.perf_counter() - t0) * 1000, 1))
+
+@st.fragment(run_every=2)
+def debug_timings():
+    """Latest stage / fragment timings – refreshes in place, no app rerun."""
+    perf = st.session_state.get("perf", {})
+    st.dataframe(
+        pd.DataFrame({"Metric": list(perf), "Value": [str(v) for v in perf.values()]}),
+        hide_index=True, use_container_width=True,
+    )
+
+show_timings = st.sidebar.checkbox("Show debug timings")
+if show_timings:
+    with st.sidebar:
+        debug_timings()
+
+@st.cache_data(show_spinner=False)
+def load_source(raw: bytes, name: str) -> pd.DataFrame:
+    """Parse one uploaded/scanned file; cached on its bytes so reruns skip the parse."""
+    return well_engine.load_source(raw, name)
 
 # ───────────── File input & landing-page logic ─────────────
 print("📂 Starting file import…", flush=True)
@@ -404,37 +378,26 @@ else:
         st.stop()
     sources = sorted(recent, key=lambda f: f.stat().st_mtime)
 
+load_t0 = time.perf_counter()
 dfs = []
+version = hashlib.md5()
 for src in sources:
-    if upl:
-        buf, name = src, src.name
-    else:
-        buf, name = open(src, "rb"), src.name
-    try:
-        df = load_csv(buf, name) if name.lower().endswith(".csv") else load_excel(buf)
-    finally:
-        if not upl:
-            buf.close()
+    raw = src.getvalue() if upl else src.read_bytes()
+    name = src.name
+    version.update(name.encode())
+    version.update(raw)
+    df = load_source(raw, name)
     print(f"   📥 Loaded `{name}`, columns = {list(df.columns)}", flush=True)
     dfs.append(df)
+perf_since("load", load_t0)
 
 if not dfs:
     st.error("❌ No files to process. Upload or add files to data dir.")
     st.stop()
 
 # ───────────── Concatenate all input files and standardize headers ─────────────
-df_raw = pd.concat(dfs, ignore_index=True)
-df_raw.columns = [str(c).strip() for c in df_raw.columns]
-# ─── DROP ANY BLANK‐NAMED COLUMNS ─────────────────────────────────────────────
-blank_cols = [c for c in df_raw.columns if c == ""]
-if blank_cols:
-    print(f"DEBUG: Dropping blank columns: {blank_cols}", flush=True)
-    df_raw.drop(columns=blank_cols, inplace=True)
-
-# ───────────── Detect “Customer” column and normalize header ─────────────
-cust_col = next((col for col in df_raw.columns if col.strip().lower() == "customer"), None)
-if cust_col and cust_col != "Customer":
-    df_raw.rename(columns={cust_col: "Customer"}, inplace=True)
+# (blank-named columns dropped, “Customer” header normalised)
+df_raw = well_engine.standardize_raw(dfs)
 
 # — INSERT THIS —
 has_customer = "Customer" in df_raw.columns
@@ -455,9 +418,18 @@ if not has_customer:
     if cust_input:
         df_raw["Customer"] = cust_input
         has_customer = True
+        version.update(cust_input.encode())
+
+# identifies the loaded data for the caches below
+data_version = version.hexdigest()
 # ───────────── Set up well‐to‐customer mapping ─────────────
+@st.cache_data(show_spinner=False)
+def well_customer_map(data_version: str, _df_raw: pd.DataFrame) -> dict:
+    """Well → customer, one entry per well (see well_engine.well_customer_map)."""
+    return well_engine.well_customer_map(_df_raw)
+
 if has_customer:
-    well2cust = df_raw.set_index("Well Name")["Customer"].to_dict()
+    well2cust = well_customer_map(data_version, df_raw)
 else:
     well2cust = {}
 
@@ -513,22 +485,24 @@ defs = settings.get(current_key, settings["DEFAULT"])
 params = st.query_params
 # ─── HANDLE “Trigger” BUTTON → n8n call ─────────────────────────────
 
+@st.cache_resource(show_spinner=False)
+def n8n_ticket_cache():
+    """Server-wide well → tickets cache, shared by every session and dispatcher."""
+    return well_n8n.TicketCache(ttl=N8N_TICKET_TTL)
+
+@st.cache_resource(show_spinner=False)
+def n8n_dispatcher():
+    """Shared pooled session + worker threads; triggers never block a rerun."""
+    return well_n8n.TriggerDispatcher(N8N_WEBHOOK_URL, cache=n8n_ticket_cache())
+
 if "trigger_well" in params:
-    well_to_trigger = params["trigger_well"][0]
-    try:
-        resp = requests.post(
-            N8N_WEBHOOK_URL,
-            json={"well_name": well_to_trigger},
-            timeout=10
-        )
-        resp.raise_for_status()
-        st.session_state["n8n_response"] = resp.json()
-        st.session_state["last_triggered_well"] = well_to_trigger
-    except Exception as e:
-        st.error(f"❌ Error triggering workflow for {well_to_trigger}: {e}")
+    well_to_trigger = params["trigger_well"]
+    n8n_dispatcher().submit(well_to_trigger)
+    st.session_state["n8n_triggered"] = list(dict.fromkeys(
+        st.session_state.get("n8n_triggered", []) + [well_to_trigger]
+    ))
     # clear param so we don’t auto-retrigger on rerun
-    st.set_query_params()
-    st.rerun()
+    del st.query_params["trigger_well"]
 if page == "Customers" and "customer" in params:
     cust = params["customer"][0]
     st.session_state.selected_customer = cust
@@ -544,129 +518,14 @@ if "selected_customer" not in st.session_state:
 current_key = st.session_state.selected_customer or "DEFAULT"
 defs = settings.get(current_key, settings["DEFAULT"])
 
-# ───────────── Sidebar thresholds & weights ─────────────
-st.sidebar.header("Thresholds")
-thr = dict(
-    CapLoadPct = st.sidebar.slider(
-        "Cap load pct (Max / Normal)", 0.50, 5.0,
-        defs.get("CapLoadPct", 1.05), 0.01,
-        help=(
-            "CapLoad = (Max Drive Amps) ÷ (Normal Running Amps).\n"
-            "• We flag At_Max_Capacity whenever CapLoad ≥ this slider’s value."
-            "• We also use this same threshold to decide if there’s “spare load” in SpeedUp logic."
-        )
-    ),
-    RiskPct = st.sidebar.slider(
-        "Risk pct (Max / Overload)", 0.50, 5.0,
-        defs.get("RiskPct", 1.05), 0.01,
-        help=(
-            "CapRisk = (Max Drive Amps) ÷ (Motor Overload).\n"
-            "We flag Overload_Risk whenever CapRisk ≥ this slider’s value."
-        )
-    ),
-    HighIntake = st.sidebar.number_input(
-        "High intake ψ (psi)", 0, 10000,
-        defs.get("HighIntake", 300),
-        help=(
-            "High intake threshold is used in SpeedUp logic.\n"
-            "We require Avg Intake Pressure > [this value] to consider speeding up."
-        )
-    ),
-    SmallDrawdown = st.sidebar.number_input(
-        "Small drawdown ψ (psi)", 0, 5000,
-        defs.get("SmallDrawdown", 50),
-        help=(
-            "Drawdown = (Max Intake Pressure – Min Intake Pressure).\n"
-            "We require Drawdown < [this value] to consider speeding up."
-        )
-    ),
-    NearUnderLower = st.sidebar.slider(
-        "Near-underload lower bound", 1.0, 5.0,
-        defs.get("NearUnderLower", 1.43), 0.01,
-        help=(
-            "NearUnderload Ratio = (Avg Drive Amps) ÷ (Motor Underload).\n"
-            "We flag NearUnderload when ratio < [this slider’s value]."
-        )
-    ),
-    LowUptime = st.sidebar.slider(
-        "Low uptime % threshold", 0, 100,
-        defs.get("LowUptime", 90),
-        help=(
-            "If (Uptime %) < [this value], we flag LowUptime.\n"
-            "Used in TerribleScore and PoorPerformance."
-        )
-    ),
-    HighDT = st.sidebar.number_input(
-        "High downtime hrs (3 days)", 0, 72,
-        defs.get("HighDT", 6),
-        help=(
-            "Downtime (Hr) = hours of downtime over the lookback window.\n"
-            "If Downtime > [this value], we flag HighDT (for coloring only)."
-        )
-    ),
-    VibHigh = st.sidebar.number_input(
-        "High vibration threshold", 0.0, 10.0,
-        defs.get("VibHigh", 1.00), 0.01,
-        help=(
-            "If (Avg Vib X ≥ [this]) or (Avg Vib Y ≥ [this]), we flag HighVib.\n"
-            "Used in TerribleScore and PoorPerformance."
-        )
-    ),
-    FreqSpread = st.sidebar.number_input(
-        "High Frequency Spread Ratio threshold (unitless)",
-        0.0, 10.0,
-        defs.get("FreqSpread", 1.0),
-        0.01,
-        help="Flag when (Max−Min) ÷ Avg Drive Frequency ≥ this value."
-    ),
-    ampSpreadRatio = st.sidebar.number_input(
-        "High Amp Spread Ratio ≥ (unitless)", 0.0, 10.0,
-        defs.get("ampSpreadRatio", 1.0), 0.01,
-        help=(
-            "ampSpreadRatio = (Max Drive Amps – Min Drive Amps) ÷ (Avg Drive Amps).\n"
-            "If Min Drive Amps = 0, we display ‘N/A’ and never flag SpreadFlag.\n"
-            "We set SpreadFlag when ampSpreadRatio ≥ [this value]."
-        )
-    ),
-    TempHigh = st.sidebar.number_input(
-        "High motor temp °F", 0, 500,
-        defs.get("TempHigh", 210),
-        help=(
-            "If (Max Motor Temp) ≥ [this value], we flag HighMotorTemp.\n"
-            "Used in TerribleScore and PoorPerformance."
-        )
-    ),
-    LowDelta = st.sidebar.number_input(
-        "Low Tub-Casing Δ ψ", -5000, 5000,
-        defs.get("LowDelta", 30),
-        help=(
-            "Δ = (Avg Tubing Pressure) – (Avg Casing Pressure).\n"
-            "If Δ ≤ [this value], we flag LowDeltaTC (for coloring only)."
-        )
-    ),
-    HighFaultCount = st.sidebar.number_input(
-        "High fault count (cumulative)", 0, 1000,
-        defs.get("HighFaultCount", 1),
-        help=(
-            "If (Fault Count) ≥ [this value], we flag FaultHigh.\n"
-            "Used in TerribleScore and PoorPerformance."
-        )
-    ),
-    HighRunningDays = st.sidebar.number_input(
-        "High running days",0, 365 * 5,
-        defs.get("HighRunningDays", 90),  # default
-        help=("If (Running Days) > this, flag as ‘high running days’")
-    ),
-    PressureDiff = st.sidebar.number_input(
-        "Low Pressure difference threshold (psi)",
-        -10000.0, 10000.0,
-        defs.get("PressureDiff", 0.0),
-        step=0.1,
-        help="Flag when (Avg Disch Pressure − Avg Intake Pressure) ≤ this threshold."
-    ),
-    
-    
-)
+# the entry version this session's sliders were built from on its previous run –
+# a save is refused if another session changed the key after that
+seen = st.session_state.setdefault("settings_seen", {})
+settings_base = seen.get(current_key)
+default_base = seen.get("DEFAULT")       # "Save default settings" checks against this one
+for key in {current_key, "DEFAULT"}:
+    seen[key] = well_settings.entry_digest(settings.get(key))
+
 # ─── Default lists for PoorPerformance & SpeedUp ───────────────────
 poor_defaults = [
     "LowUptime","HighVib","SpreadFlag","HighMotorTemp","FaultHigh"
@@ -679,70 +538,323 @@ speed_true_defaults = [
     "Overload_Risk"
 ]
 
-# ───────────── PoorPerformance & SpeedUp Settings ─────────────
-with st.sidebar.expander("PoorPerformance Settings", expanded=True):
-    PoorTrue = st.multiselect(
-        "Must be TRUE",
-        [
-            "LowUptime","HighVib","SpreadFlag","HighMotorTemp","FaultHigh",
-            "High running days","At_Max_Capacity","Overload_Risk",
-            "High Motor Temp","High Downtime","Max Vibration",
-            "Amp Spread Ratio","Tubing-Casing Δ","Fault Count","High Frequency Spread Ratio","Low Pressure Difference",
-            "Uptime %","NearUnderload Ratio","NearUnderload",
-            "Normal_vs_Overload","MissingSensor"
-        ],
-        default=defs.get("PoorTrue", ["LowUptime","HighVib","SpreadFlag","HighMotorTemp","FaultHigh"]),
-        key="PoorTrue",
-        help="Any of these TRUE → contributes to PoorPerformance"
-    )
-    PoorFalse = st.multiselect(
-        "Must be FALSE",
-        [
-            "LowUptime","HighVib","SpreadFlag","HighMotorTemp","FaultHigh",
-            "High running days","At_Max_Capacity","Overload_Risk",
-            "High Motor Temp","High Downtime","Max Vibration",
-            "Amp Spread Ratio","Tubing-Casing Δ","Fault Count","High Frequency Spread Ratio","Low Pressure Difference",
-            "Uptime %","NearUnderload Ratio","NearUnderload",
-            "Normal_vs_Overload","MissingSensor"
-        ],
-        default=defs.get("PoorFalse", []),
-        key="PoorFalse",
-        help="All of these must be FALSE → to qualify as PoorPerformance"
-    )
-    thr["PoorTrue"]  = PoorTrue
-    thr["PoorFalse"] = PoorFalse
-
-with st.sidebar.expander("SpeedUp Settings", expanded=True):
-    SpeedTrue = st.multiselect(
-        "Must be TRUE",
-        [
-            "Avg Intake Pressure > HighIntake","Drawdown < SmallDrawdown",
-            "High running days","At_Max_Capacity","Overload_Risk",
-            "High Motor Temp","High Downtime","Max Vibration",
-            "Amp Spread Ratio","Tubing-Casing Δ","Fault Count","High Frequency Spread Ratio","Low Pressure Difference",
-            "HighVib","Uptime %","NearUnderload Ratio","NearUnderload",
-            "Normal_vs_Overload","MissingSensor"
-        ],
-        default=defs.get("SpeedTrue", ["Avg Intake Pressure > HighIntake","Drawdown < SmallDrawdown","High running days","At_Max_Capacity","Overload_Risk"]),
-        key="SpeedTrue",
-        help="Select flags that must evaluate to True"
-    )
-    SpeedFalse = st.multiselect(
-        "Must be FALSE",
-        [
-            "Avg Intake Pressure > HighIntake","Drawdown < SmallDrawdown",
-            "High running days","At_Max_Capacity","Overload_Risk",
-            "High Motor Temp","High Downtime","Max Vibration",
-            "Amp Spread Ratio","Tubing-Casing Δ","Fault Count","High Frequency Spread Ratio","Low Pressure Difference",
-            "HighVib","Uptime %","NearUnderload Ratio","NearUnderload",
-            "Normal_vs_Overload","MissingSensor"
-        ],
-        default=defs.get("SpeedFalse", []),
-        key="SpeedFalse",
-        help="Select flags that must evaluate to False"
-    )
-    thr["SpeedTrue"]  = SpeedTrue
-    thr["SpeedFalse"] = SpeedFalse
+# ───────────── Sidebar thresholds & weights ─────────────
+def curve_count(curve: tuple, value: float) -> int:
+    """Number of wells a threshold flags, read off a flag_count_curves() entry."""
+    vals, op = curve
+    i = int(np.searchsorted(vals, value, side="right" if op in (">", "<=") else "left"))
+    return len(vals) - i if op in (">", ">=") else i
+
+def threshold_preview(pending: dict, applied: dict):
+    """Pending vs applied flag counts, from the cached curves only (no pipeline run)."""
+    curves = st.session_state.get("flag_curves", {})
+    rows = [
+        {"Threshold": k,
+         "Applied": curve_count(curves[k], applied[k]),
+         "Pending": curve_count(curves[k], pending[k])}
+        for k in curves
+        if pending.get(k) != applied.get(k)
+    ]
+    if rows:
+        st.caption("Wells flagged (all customers)")
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+    st.caption("List and weight changes take effect on Apply.")
+
+@st.fragment
+def threshold_panel(defs: dict):
+    """
+    Thresholds, PoorPerformance/SpeedUp lists and score weights.
+    Moving a widget reruns only this panel. In batch mode edits pile up
+    against a preview until "Apply" triggers a single app rerun; otherwise
+    every edit requests one app rerun straight away. Either way the loaders
+    and aggregation are served from cache.
+    """
+    with perf_timer("sidebar_thresholds"):
+        st.header("Thresholds")
+        batch = st.toggle(
+            "Batch edits (Apply)", value=True, key="batch_thresholds",
+            help="Collect threshold, list and weight edits and recompute once on Apply.",
+        )
+        thr = dict(
+            CapLoadPct = st.slider(
+                "Cap load pct (Max / Normal)", 0.50, 5.0,
+                defs.get("CapLoadPct", 1.05), 0.01,
+                help=(
+                    "CapLoad = (Max Drive Amps) ÷ (Normal Running Amps).\n"
+                    "• We flag At_Max_Capacity whenever CapLoad ≥ this slider’s value."
+                    "• We also use this same threshold to decide if there’s “spare load” in SpeedUp logic."
+                )
+            ),
+            RiskPct = st.slider(
+                "Risk pct (Max / Overload)", 0.50, 5.0,
+                defs.get("RiskPct", 1.05), 0.01,
+                help=(
+                    "CapRisk = (Max Drive Amps) ÷ (Motor Overload).\n"
+                    "We flag Overload_Risk whenever CapRisk ≥ this slider’s value."
+                )
+            ),
+            HighIntake = st.number_input(
+                "High intake ψ (psi)", 0, 10000,
+                defs.get("HighIntake", 300),
+                help=(
+                    "High intake threshold is used in SpeedUp logic.\n"
+                    "We require Avg Intake Pressure > [this value] to consider speeding up."
+                )
+            ),
+            SmallDrawdown = st.number_input(
+                "Small drawdown ψ (psi)", 0, 5000,
+                defs.get("SmallDrawdown", 50),
+                help=(
+                    "Drawdown = (Max Intake Pressure – Min Intake Pressure).\n"
+                    "We require Drawdown < [this value] to consider speeding up."
+                )
+            ),
+            NearUnderLower = st.slider(
+                "Near-underload lower bound", 1.0, 5.0,
+                defs.get("NearUnderLower", 1.43), 0.01,
+                help=(
+                    "NearUnderload Ratio = (Avg Drive Amps) ÷ (Motor Underload).\n"
+                    "We flag NearUnderload when ratio < [this slider’s value]."
+                )
+            ),
+            LowUptime = st.slider(
+                "Low uptime % threshold", 0, 100,
+                defs.get("LowUptime", 90),
+                help=(
+                    "If (Uptime %) < [this value], we flag LowUptime.\n"
+                    "Used in TerribleScore and PoorPerformance."
+                )
+            ),
+            HighDT = st.number_input(
+                "High downtime hrs (3 days)", 0, 72,
+                defs.get("HighDT", 6),
+                help=(
+                    "Downtime (Hr) = hours of downtime over the lookback window.\n"
+                    "If Downtime > [this value], we flag HighDT (for coloring only)."
+                )
+            ),
+            VibHigh = st.number_input(
+                "High vibration threshold", 0.0, 10.0,
+                defs.get("VibHigh", 1.00), 0.01,
+                help=(
+                    "If (Avg Vib X ≥ [this]) or (Avg Vib Y ≥ [this]), we flag HighVib.\n"
+                    "Used in TerribleScore and PoorPerformance."
+                )
+            ),
+            FreqSpread = st.number_input(
+                "High Frequency Spread Ratio threshold (unitless)",
+                0.0, 10.0,
+                defs.get("FreqSpread", 1.0),
+                0.01,
+                help="Flag when (Max−Min) ÷ Avg Drive Frequency ≥ this value."
+            ),
+            ampSpreadRatio = st.number_input(
+                "High Amp Spread Ratio ≥ (unitless)", 0.0, 10.0,
+                defs.get("ampSpreadRatio", 1.0), 0.01,
+                help=(
+                    "ampSpreadRatio = (Max Drive Amps – Min Drive Amps) ÷ (Avg Drive Amps).\n"
+                    "If Min Drive Amps = 0, we display ‘N/A’ and never flag SpreadFlag.\n"
+                    "We set SpreadFlag when ampSpreadRatio ≥ [this value]."
+                )
+            ),
+            TempHigh = st.number_input(
+                "High motor temp °F", 0, 500,
+                defs.get("TempHigh", 210),
+                help=(
+                    "If (Max Motor Temp) ≥ [this value], we flag HighMotorTemp.\n"
+                    "Used in TerribleScore and PoorPerformance."
+                )
+            ),
+            LowDelta = st.number_input(
+                "Low Tub-Casing Δ ψ", -5000, 5000,
+                defs.get("LowDelta", 30),
+                help=(
+                    "Δ = (Avg Tubing Pressure) – (Avg Casing Pressure).\n"
+                    "If Δ ≤ [this value], we flag LowDeltaTC (for coloring only)."
+                )
+            ),
+            HighFaultCount = st.number_input(
+                "High fault count (cumulative)", 0, 1000,
+                defs.get("HighFaultCount", 1),
+                help=(
+                    "If (Fault Count) ≥ [this value], we flag FaultHigh.\n"
+                    "Used in TerribleScore and PoorPerformance."
+                )
+            ),
+            HighRunningDays = st.number_input(
+                "High running days",0, 365 * 5,
+                defs.get("HighRunningDays", 90),  # default
+                help=("If (Running Days) > this, flag as ‘high running days’")
+            ),
+            PressureDiff = st.number_input(
+                "Low Pressure difference threshold (psi)",
+                -10000.0, 10000.0,
+                defs.get("PressureDiff", 0.0),
+                step=0.1,
+                help="Flag when (Avg Disch Pressure − Avg Intake Pressure) ≤ this threshold."
+            ),
+
+
+        )
+        # ───────────── PoorPerformance & SpeedUp Settings ─────────────
+        with st.expander("PoorPerformance Settings", expanded=True):
+            PoorTrue = st.multiselect(
+                "Must be TRUE",
+                [
+                    "LowUptime","HighVib","SpreadFlag","HighMotorTemp","FaultHigh",
+                    "High running days","At_Max_Capacity","Overload_Risk",
+                    "High Motor Temp","High Downtime","Max Vibration",
+                    "Amp Spread Ratio","Tubing-Casing Δ","Fault Count","High Frequency Spread Ratio","Low Pressure Difference",
+                    "Uptime %","NearUnderload Ratio","NearUnderload",
+                    "Normal_vs_Overload","MissingSensor"
+                ],
+                default=defs.get("PoorTrue", ["LowUptime","HighVib","SpreadFlag","HighMotorTemp","FaultHigh"]),
+                key="PoorTrue",
+                help="Any of these TRUE → contributes to PoorPerformance"
+            )
+            PoorFalse = st.multiselect(
+                "Must be FALSE",
+                [
+                    "LowUptime","HighVib","SpreadFlag","HighMotorTemp","FaultHigh",
+                    "High running days","At_Max_Capacity","Overload_Risk",
+                    "High Motor Temp","High Downtime","Max Vibration",
+                    "Amp Spread Ratio","Tubing-Casing Δ","Fault Count","High Frequency Spread Ratio","Low Pressure Difference",
+                    "Uptime %","NearUnderload Ratio","NearUnderload",
+                    "Normal_vs_Overload","MissingSensor"
+                ],
+                default=defs.get("PoorFalse", []),
+                key="PoorFalse",
+                help="All of these must be FALSE → to qualify as PoorPerformance"
+            )
+            thr["PoorTrue"]  = PoorTrue
+            thr["PoorFalse"] = PoorFalse
+
+        with st.expander("SpeedUp Settings", expanded=True):
+            SpeedTrue = st.multiselect(
+                "Must be TRUE",
+                [
+                    "Avg Intake Pressure > HighIntake","Drawdown < SmallDrawdown",
+                    "High running days","At_Max_Capacity","Overload_Risk",
+                    "High Motor Temp","High Downtime","Max Vibration",
+                    "Amp Spread Ratio","Tubing-Casing Δ","Fault Count","High Frequency Spread Ratio","Low Pressure Difference",
+                    "HighVib","Uptime %","NearUnderload Ratio","NearUnderload",
+                    "Normal_vs_Overload","MissingSensor"
+                ],
+                default=defs.get("SpeedTrue", ["Avg Intake Pressure > HighIntake","Drawdown < SmallDrawdown","High running days","At_Max_Capacity","Overload_Risk"]),
+                key="SpeedTrue",
+                help="Select flags that must evaluate to True"
+            )
+            SpeedFalse = st.multiselect(
+                "Must be FALSE",
+                [
+                    "Avg Intake Pressure > HighIntake","Drawdown < SmallDrawdown",
+                    "High running days","At_Max_Capacity","Overload_Risk",
+                    "High Motor Temp","High Downtime","Max Vibration",
+                    "Amp Spread Ratio","Tubing-Casing Δ","Fault Count","High Frequency Spread Ratio","Low Pressure Difference",
+                    "HighVib","Uptime %","NearUnderload Ratio","NearUnderload",
+                    "Normal_vs_Overload","MissingSensor"
+                ],
+                default=defs.get("SpeedFalse", []),
+                key="SpeedFalse",
+                help="Select flags that must evaluate to False"
+            )
+            thr["SpeedTrue"]  = SpeedTrue
+            thr["SpeedFalse"] = SpeedFalse
+
+        st.markdown("---")
+        st.subheader("Weights – Terrible‐Performance Score")
+        weights = dict(
+            uptime        = st.slider(
+                "Downtime weight", 0.0, 5.0,
+                defs.get("uptime", 1.0), 0.1,
+                help=(
+                    "Adds (LowUptime × [this value]) to TerribleScore.\n"
+                    "LowUptime = 1 if Uptime% < Low uptime threshold, else 0."
+                )
+            ),
+            missing       = st.slider(
+                "Missing sensor weight", 0.0, 5.0,
+                defs.get("missing", 1.0), 0.1,
+                help=(
+                    "Adds (MissingSensor × [this value]) to TerribleScore.\n"
+                    "MissingSensor = 1 if Avg Motor Amps=0 or Avg Intake Pressure=0 or flat-line in either; else 0."
+                )
+            ),
+            spread        = st.slider(
+                "Amp Spread Ratio weight", 0.0, 5.0,
+                defs.get("spread", 1.0), 0.1,
+                help=(
+                    "Adds (ampSpreadRatio × [this value]) to TerribleScore.\n"
+                    "ampSpreadRatio = (Max Drive Amps − Min Drive Amps) ÷ (Avg Drive Amps)."
+                )
+            ),
+            motortemp     = st.slider(
+                "Motor temp weight", 0.0, 5.0,
+                defs.get("motortemp", 1.0), 0.1,
+                help=(
+                    "Adds (HighMotorTemp × [this value]) to TerribleScore.\n"
+                    "HighMotorTemp = 1 if Max Motor Temp ≥ High motor temp threshold, else 0."
+                )
+            ),
+            drawdown      = st.slider(
+                "Intake drawdown weight", 0.0, 5.0,
+                defs.get("drawdown", 1.0), 0.1,
+                help=(
+                    "Adds ([Drawdown < SmallDrawdown] × [this value]) to TerribleScore.\n"
+                    "Drawdown = Max Intake Pressure − Min Intake Pressure."
+                )
+            ),
+            delta_tc      = st.slider(
+                "Tub-Cas Δ weight", 0.0, 5.0,
+                defs.get("delta_tc", 1.0), 0.1,
+                help=(
+                    "Removed from TerribleScore (set to 0); kept here only for coloring."
+                )
+            ),
+            nearunderload = st.slider(
+                "NearUnderload weight", 0.0, 5.0,
+                defs.get("nearunderload", 1.0), 0.1,
+                help=(
+                    "Adds (NearUnderload × [this value]) to TerribleScore.\n"
+                    "NearUnderload = 1 if (Avg Drive Amps ÷ Motor Underload) < Near-underload threshold, else 0."
+                )
+            ),
+            vibration     = st.slider(
+                "Vibration weight", 0.0, 5.0,
+                defs.get("vibration", 1.0), 0.1,
+                help=(
+                    "Adds (HighVib × [this value]) to TerribleScore.\n"
+                    "HighVib = 1 if (Max Vibration ≥ High vibration threshold)."
+                )
+            ),
+            fault         = st.slider(
+                "Fault count weight", 0.0, 5.0,
+                defs.get("fault", 1.0), 0.1,
+                help=(
+                    "Adds (FaultHigh × [this value]) to TerribleScore.\n"
+                    "FaultHigh = 1 if Fault Count ≥ High fault count threshold, else 0."
+                )
+            ),
+        )
+
+        applied = st.session_state.get("applied_thresholds")
+        if not batch or applied is None or applied[0] != defs:
+            # live mode, first run, or new defaults (customer switch / reset)
+            applied = st.session_state.applied_thresholds = (defs, thr, weights)
+        _, thr_applied, weights_applied = applied
+        if batch and (thr, weights) != (thr_applied, weights_applied):
+            threshold_preview(thr, thr_applied)
+            if st.button("Apply", type="primary", use_container_width=True):
+                st.session_state.applied_thresholds = (defs, thr, weights)
+                st.rerun()   # one recompute for the whole batch
+
+    if not batch and st.session_state.get("threshold_panel_run") == st.session_state.app_run:
+        st.rerun()   # fragment-only rerun → recompute flags, cards & grid
+    st.session_state.threshold_panel_run = st.session_state.app_run
+    return thr_applied, weights_applied
+
+with st.sidebar:
+    thr, weights = threshold_panel(defs)
 
 # ───────────── Inject CSS for coloured pills ─────────────
 st.sidebar.markdown(
@@ -779,422 +891,154 @@ if page == "Dashboard" and st.session_state.selected_customer:
     if cust in settings and cust != "DEFAULT":
         st.sidebar.info(f"⚙️ Custom settings applied for {cust}.")
         if st.sidebar.button(f"Reset settings to default for {cust}"):
-            settings.pop(cust, None)
-            SETTINGS_FILE.write_text(json.dumps(settings, indent=2))
-            st.sidebar.success(f"Settings for {cust} reset to default.")
-            st.rerun()
-
-st.sidebar.markdown("---")
-st.sidebar.subheader("Weights – Terrible‐Performance Score")
-weights = dict(
-    uptime        = st.sidebar.slider(
-        "Downtime weight", 0.0, 5.0,
-        defs.get("uptime", 1.0), 0.1,
-        help=(
-            "Adds (LowUptime × [this value]) to TerribleScore.\n"
-            "LowUptime = 1 if Uptime% < Low uptime threshold, else 0."
-        )
-    ),
-    missing       = st.sidebar.slider(
-        "Missing sensor weight", 0.0, 5.0,
-        defs.get("missing", 1.0), 0.1,
-        help=(
-            "Adds (MissingSensor × [this value]) to TerribleScore.\n"
-            "MissingSensor = 1 if Avg Motor Amps=0 or Avg Intake Pressure=0 or flat-line in either; else 0."
-        )
-    ),
-    spread        = st.sidebar.slider(
-        "Amp Spread Ratio weight", 0.0, 5.0,
-        defs.get("spread", 1.0), 0.1,
-        help=(
-            "Adds (ampSpreadRatio × [this value]) to TerribleScore.\n"
-            "ampSpreadRatio = (Max Drive Amps − Min Drive Amps) ÷ (Avg Drive Amps)."
-        )
-    ),
-    motortemp     = st.sidebar.slider(
-        "Motor temp weight", 0.0, 5.0,
-        defs.get("motortemp", 1.0), 0.1,
-        help=(
-            "Adds (HighMotorTemp × [this value]) to TerribleScore.\n"
-            "HighMotorTemp = 1 if Max Motor Temp ≥ High motor temp threshold, else 0."
-        )
-    ),
-    drawdown      = st.sidebar.slider(
-        "Intake drawdown weight", 0.0, 5.0,
-        defs.get("drawdown", 1.0), 0.1,
-        help=(
-            "Adds ([Drawdown < SmallDrawdown] × [this value]) to TerribleScore.\n"
-            "Drawdown = Max Intake Pressure − Min Intake Pressure."
-        )
-    ),
-    delta_tc      = st.sidebar.slider(
-        "Tub-Cas Δ weight", 0.0, 5.0,
-        defs.get("delta_tc", 1.0), 0.1,
-        help=(
-            "Removed from TerribleScore (set to 0); kept here only for coloring."
-        )
-    ),
-    nearunderload = st.sidebar.slider(
-        "NearUnderload weight", 0.0, 5.0,
-        defs.get("nearunderload", 1.0), 0.1,
-        help=(
-            "Adds (NearUnderload × [this value]) to TerribleScore.\n"
-            "NearUnderload = 1 if (Avg Drive Amps ÷ Motor Underload) < Near-underload threshold, else 0."
-        )
-    ),
-    vibration     = st.sidebar.slider(
-        "Vibration weight", 0.0, 5.0,
-        defs.get("vibration", 1.0), 0.1,
-        help=(
-            "Adds (HighVib × [this value]) to TerribleScore.\n"
-            "HighVib = 1 if (Max Vibration ≥ High vibration threshold)."
-        )
-    ),
-    fault         = st.sidebar.slider(
-        "Fault count weight", 0.0, 5.0,
-        defs.get("fault", 1.0), 0.1,
-        help=(
-            "Adds (FaultHigh × [this value]) to TerribleScore.\n"
-            "FaultHigh = 1 if Fault Count ≥ High fault count threshold, else 0."
-        )
-    ),
-)
+            if save_settings(cust, lambda _: None, settings_base):
+                st.sidebar.success(f"Settings for {cust} reset to default.")
+                st.rerun()
 
 # ───── Save settings buttons ─────
+# thresholds replace the saved ones; the entry's custom cards are kept
+def with_thresholds(entry):
+    return {**(entry or {}), **thr}
+
 if page == "Customers" and st.sidebar.button("Save default settings"):
-    settings["DEFAULT"] = thr
-    SETTINGS_FILE.write_text(json.dumps(settings, indent=2))
-    # ───── Custom Cards (up to 5) ─────
-    st.sidebar.success("Default settings saved.")
+    if save_settings("DEFAULT", with_thresholds, default_base):
+        st.sidebar.success("Default settings saved.")
 
 if (
     page == "Dashboard"
     and st.session_state.selected_customer
     and st.sidebar.button(f"Save settings for {st.session_state.selected_customer}")
 ):
-    settings[st.session_state.selected_customer] = thr
-    SETTINGS_FILE.write_text(json.dumps(settings, indent=2))
-    st.sidebar.success(f"Settings saved for {st.session_state.selected_customer}.")
+    if save_settings(st.session_state.selected_customer, with_thresholds, settings_base):
+        st.sidebar.success(f"Settings saved for {st.session_state.selected_customer}.")
 # ───────────── Aggregate last 3 distinct days per well ─────────────
-last_dates = sorted(df_raw["Date"].unique())[-ROLL_DAYS:]
-df_recent  = df_raw[df_raw["Date"].isin(last_dates)].copy()
-hist_days  = len(last_dates)
-use_flat   = hist_days >= 3
-
-# ── RIGHT BEFORE the pd.to_numeric loop: Sanitize Uptime (%) ──
-if "Uptime (%)" in df_recent.columns:
-    col = (
-        df_recent["Uptime (%)"]
-            .astype(str)
-            .str.strip()
-            .str.replace('%', '', regex=False)
-            .str.lower()
-            .replace({'': np.nan, 'n/a': np.nan, 'na': np.nan, 'nan': np.nan, '--': np.nan})
-    )
-    num = pd.to_numeric(col, errors='coerce')
-    # If ≤1.05 assume fraction (0–1); if >1.05 assume percent (0–100)
-    df_recent["Uptime (%)"] = np.where(num <= 1.05, num, num / 100.0)
-
-# Convert all other columns (except text fields) to numeric
-non_txt = {
-    "Well Name", "Field", "Installation Date", "Current Status",
-    "Pump Type", "Drive Type", "State Detail/Op Mode", "Links",
-    "Latest Fault", "Fault Date", "Link URL"
-}
-
-for c in df_recent.columns:
-    if c not in non_txt and c != "Date":
-        col_data = df_recent[c]
-        if not (isinstance(col_data, pd.Series) and col_data.ndim == 1):
-            print(f"Column {c} is not a Series or is not 1D, got type {type(col_data)} and ndim {getattr(col_data,'ndim',None)}")
-        else:
-            df_recent[c] = pd.to_numeric(col_data, errors="coerce")
-
-numeric_cols = df_recent.select_dtypes(include="number").columns.tolist()
-
-text_cols    = [c for c in df_recent.columns if c not in numeric_cols + ["Date"]]
-
-agg_dict = {
-    c: ["mean","max","min","std"]
-    for c in numeric_cols
-    if c!="Well Name"
+@st.cache_data(show_spinner=False)
+def aggregate_wells(data_version: str, _df_raw: pd.DataFrame):
+    """
+    well_engine.aggregate_wells, cached per data version: it doesn't depend
+    on thresholds, so reruns (threshold moves, grid clicks, …) skip the
+    groupby entirely.
+    """
+    return well_engine.aggregate_wells(_df_raw)
+
+with perf_timer("aggregate"):
+    df3, last_dates, hist_days = aggregate_wells(data_version, df_raw)
+flags_t0 = time.perf_counter()
+
+# ───────────── Flags, PoorPerformance / SpeedUp & Terrible‐Performance Score ─────────────
+flag_res = well_engine.compute_flags(df3, thr, hist_days)
+for msg in flag_res["warnings"]:
+    st.warning(msg)
+flag_map   = flag_res["flag_map"]
+drawdown   = flag_res["drawdown"]
+uptime_pct = flag_res["uptime_pct"]
+df3["TerribleScore"] = well_engine.terrible_score(df3, drawdown, thr, weights)
+
+# ───────────── Grid cell status (red/green) ─────────────
+# One vectorized pass: bit i of StyleBits is set when the i-th styled column
+# is flagged. The grid turns each bit into a CSS class via cellClassRules.
+#   "bg"   → red background if flagged, green otherwise
+#   "bad"  → red ✗ text if flagged (no background)
+#   "good" → green ✓ text if flagged (no background)
+grid_style = {
+    "At_Max_Capacity":        ("bg",   df3["At_Max_Capacity"]),
+    "Overload_Risk":          ("bg",   df3["Overload_Risk"]),
+    "High Motor Temp":        ("bg",   df3["HighMotorTemp"]),
+    "High Downtime":          ("bg",   df3["HighDowntime"]),
+    "Max Vibration":          ("bg",   df3["HighVib"]),
+    "Pressure Difference":    ("bg",   df3["Pressure Difference"] <= thr["PressureDiff"]),
+    "Frequency Spread Ratio": ("bg",   df3["Frequency Spread Ratio"] >= thr["FreqSpread"]),
+    "Amp Spread Ratio":       ("bg",   df3["SpreadFlag"]),
+    "Tubing-Casing Δ":        ("bg",   df3["LowDeltaFlag"]),
+    "NearUnderload Ratio":    ("bg",   df3["NearUnderload"]),
+    "Fault Count":            ("bg",   df3["FaultHigh"]),
+    "Uptime %":               ("bg",   df3["LowUptime"]),
+    "Normal_vs_Overload":     ("bad",  df3["Normal_vs_Overload"]),
+    "MissingSensor":          ("bad",  df3["MissingSensor"]),
+    "PoorPerformance":        ("bad",  df3["PoorPerformance"]),
+    "SpeedUp":                ("good", df3["SpeedUp"]),
 }
-# wrap the "first" in a list so pandas will do SeriesGroupBy.first, not DataFrameGroupBy.first
-agg_dict.update({
-    c: ["first"]
-    for c in text_cols
-    if c!="Well Name"
-})
-df3 = df_recent.groupby("Well Name").agg(agg_dict)
-df3.columns = ["_".join(c) if isinstance(c, tuple) else c for c in df3.columns]
-df3 = df3.reset_index()
-
-def col(base: str, stat: str) -> str:
-    return f"{base}_{stat}"
-
-# ───────────── Latest-day Normal vs Overload ─────────────
-latest = (
-    df_raw.sort_values("Date")
-          .groupby("Well Name", as_index=False)
-          .tail(1)
-          .set_index("Well Name")
-)
+GRID_STYLE_KINDS = {c: kind for c, (kind, _) in grid_style.items()}
+style_bits = pd.Series(np.zeros(len(df3), dtype=np.int32), index=df3.index)
+for bit, (_, flagged) in enumerate(grid_style.values()):
+    style_bits |= flagged.fillna(False).to_numpy(dtype=bool).astype(np.int32) << bit
+
+# ───────────── Flag bitmask for client-side filtering ─────────────
+# bit i of FlagBits = flag_map's i-th flag; the grid filters on it in the
+# browser, so picking a flag never re-sends the grid (≤ 31 flags for JS ints)
+FLAG_NAMES = list(flag_map)
+flag_bits = pd.Series(np.zeros(len(df3), dtype=np.int32), index=df3.index)
+for bit, flagged in enumerate(flag_map.values()):
+    flag_bits |= flagged.fillna(False).to_numpy(dtype=bool).astype(np.int32) << bit
+
+# ───────────── Flag-count curves for the threshold preview ─────────────
+# threshold key → (metric, comparison), the same predicates compute_flags used
+threshold_metrics = flag_res["metrics"]
+
+@st.cache_data(show_spinner=False)
+def flag_count_curves(data_version: str, _metrics: dict) -> dict:
+    """
+    Sorted metric values behind every single-threshold flag. The metrics
+    don't depend on thresholds, so this is built once per data version and
+    the sidebar can count flagged wells for any threshold by binary search.
+    Wells a flag can never fire for are NaN in the metric and dropped here,
+    so the counts match what Apply produces.
+    """
+    return {
+        key: (np.sort(pd.to_numeric(s, errors="coerce").dropna().to_numpy(dtype=float)), op)
+        for key, (s, op) in _metrics.items()
+    }
 
-# coerce to floats, turning any non-numeric into NaN
-df3["Latest_Normal"] = pd.to_numeric(
-    latest["Normal Running Amps"]
-        .reindex(df3["Well Name"])
-        .values,
-    errors="coerce"
-)
-df3["Latest_Overload"] = pd.to_numeric(
-    latest["Motor Overload"]
-        .reindex(df3["Well Name"])
-        .values,
-    errors="coerce"
-)
+st.session_state.flag_curves = flag_count_curves(data_version, threshold_metrics)
 
-# now this comparison will work
-df3["Normal_vs_Overload"] = df3["Latest_Normal"] >= df3["Latest_Overload"]
-
-# ───────────── Cap-load & risk (flipped) ─────────────
-df3["CapLoad"] = df3[col("Max Drive Amps", "mean")] / df3[col("Normal Running Amps", "mean")]
-df3["CapRisk"] = df3[col("Max Drive Amps", "mean")] / df3[col("Motor Overload", "mean")]
-
-df3["At_Max_Capacity"] = df3["CapLoad"] >= thr["CapLoadPct"]
-df3["Overload_Risk"]   = df3["CapRisk"] >= thr["RiskPct"]
-
-# ───────────── Additional flags and derived columns ─────────────
-drawdown = df3[col("Max Intake Pressure", "max")] - df3[col("Min Intake Pressure", "min")]
-df3["HighRunningDays"] = df3[col("Running Days", "mean")] > thr["HighRunningDays"]
-df3["HighDowntime"]    = df3[col("Downtime (Hr)", "mean")] > thr["HighDT"]
-df3["LowDeltaFlag"]    = (
-    df3[col("Avg Tubing", "mean")] - df3[col("Avg Casing", "mean")]
-) <= thr["LowDelta"]
-df3["NearUnderload Ratio"] = df3[col("Avg Drive Amps", "mean")] / df3[col("Motor Underload", "mean")]
-df3["NearUnderload"] = df3["NearUnderload Ratio"] < thr["NearUnderLower"]
-
-df3["Max Vibration"] = df3[[col("Avg Vib X", "mean"), col("Avg Vib Y", "mean")]].max(axis=1)
-df3["HighVib"] = df3["Max Vibration"] >= thr["VibHigh"]
-
-df3["HighMotorTemp"] = df3[col("Max Motor Temp", "max")] >= thr["TempHigh"]
-df3["Pressure Difference"] = (
-    df3[col("Avg Disch Pressure", "mean")]
-    - df3[col("Avg Intake Pressure", "mean")]
-)
-
-freq_range = (
-    df3[col("Max Drive Frequency", "max")]
-    - df3[col("Min Drive Frequency", "min")]
-)
-df3["Frequency Spread Ratio"] = np.where(
-    df3[col("Avg Drive Frequency", "mean")] > 0,
-    freq_range / df3[col("Avg Drive Frequency", "mean")],
-    np.nan
-)
-# ───────────── Compute Amp Spread Ratio & Flag ─────────────
-spread_ratio = (
-    (df3[col("Max Drive Amps", "max")] - df3[col("Min Drive Amps", "min")])
-    / df3[col("Avg Drive Amps", "mean")]
-)
-df3["ampSpreadRatio"] = spread_ratio.where(df3[col("Min Drive Amps", "min")] != 0, np.nan)
-df3["SpreadFlag"] = (
-    (df3["ampSpreadRatio"] >= thr["ampSpreadRatio"]) &
-    (df3[col("Min Drive Amps", "min")] != 0)
-)
-df3["Lost_Motor"] = (
-    (df3[col("Avg Motor Amps", "mean")] == 0) |
-    (use_flat & (df3[col("Avg Motor Amps", "std")] == 0))
-)
-df3["Lost_Intake"] = (
-    (df3[col("Avg Intake Pressure", "mean")] == 0) |
-    (use_flat & (df3[col("Avg Intake Pressure", "std")] == 0))
-)
-df3["MissingSensor"] = df3[["Lost_Motor", "Lost_Intake"]].any(axis=1)
-
-# Uptime %: scale fraction (0–1) → 0–100
-uptime_pct       = df3[col("Uptime (%)", "mean")] * 100
-df3["LowUptime"] = uptime_pct < thr["LowUptime"]
+# ───────────── Customer rollup cube ─────────────
+df3["Customer"] = df3["Well Name"].map(well2cust)
 
+@st.cache_data(show_spinner=False)
+def customer_partition(data_version: str, _customers: pd.Series) -> dict:
+    """
+    Customer → positional row indices into df3. df3's row order is fixed per
+    data version, so drill-down becomes an O(k) take of one customer's rows.
+    """
+    codes, uniques = pd.factorize(_customers)        # missing customer → -1
+    order  = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return {u: order[bounds[i]:bounds[i + 1]] for i, u in enumerate(uniques)}
 
+cust_rows = customer_partition(data_version, df3["Customer"])
 
+CUBE_FLAGS = [
+    "PoorPerformance", "SpeedUp", "HighMotorTemp", "MissingSensor", "ModemOffline",
+    "LowUptime", "HighVib", "SpreadFlag", "FaultHigh", "HighRunningDays",
+    "HighDowntime", "LowDeltaFlag", "At_Max_Capacity", "Overload_Risk", "NearUnderload",
+]
 
-# ───────────── Fault Count & Flag ─────────────
-# Choose the right raw fault-count column (daily vs weekly)
-fault_24 = col("Fault Count (24hr)", "mean")
-fault_7d = col("Fault Count\n(7 Day)",    "mean")
-if fault_24 in df3.columns:
-    fault_col = fault_24
-elif fault_7d in df3.columns:
-    fault_col = fault_7d
-else:
-    st.warning("No fault-count column found; defaulting to zero.")
-    fault_col = None
-
-if fault_col:
-    fault_mean = (
-        df3[fault_col]
-        .replace([np.inf, -np.inf], 0)
-        .fillna(0)
+@st.cache_data(show_spinner=False)
+def rollup_cube(data_version: str, thr_key: str, _df3: pd.DataFrame) -> pd.DataFrame:
+    """
+    Well count and per-flag counts for every Customer × Drive Type × Field.
+    The Customers overview, drive-type chart and Dashboard cards are all
+    slices of this, so it is built once per data version + threshold set
+    instead of being regrouped on every page visit.
+    """
+    dims = pd.DataFrame({
+        "Customer":   _df3["Customer"],
+        "Drive Type": _df3[col("Drive Type", "first")],
+        "Field":      _df3[col("Field", "first")] if col("Field", "first") in _df3 else np.nan,
+    }, index=_df3.index)
+    counts = _df3[CUBE_FLAGS].fillna(False).astype(int).assign(Wells=1)
+    return (
+        pd.concat([dims, counts], axis=1)
+          .groupby(list(dims.columns), dropna=False, as_index=False)
+          .sum()
     )
-else:
-    fault_mean = pd.Series(0, index=df3.index)
-
-# then downstream:
-df3["Fault Count"] = (fault_mean * hist_days).round().astype(int)
-df3["FaultHigh"]   = df3["Fault Count"] >= thr["HighFaultCount"]
-df3["ModemOffline"] = (
-    df3[col("State Detail/Op Mode", "first")] == "MODEM OFFLINE"
-)
-# ─── build a map from your sidebar strings → boolean series ─────────
-flag_map = {
-    "LowUptime":          df3["LowUptime"],
-    "HighVib":            df3["HighVib"],
-    "SpreadFlag":         df3["SpreadFlag"],
-    "HighMotorTemp":      df3["HighMotorTemp"],
-    "FaultHigh":          df3["FaultHigh"],
-
-    "High running days":  df3["HighRunningDays"],
-    "High Downtime":      df3["HighDowntime"],
-    "LowDeltaFlag":       df3["LowDeltaFlag"],
-
-    "At_Max_Capacity":    df3["At_Max_Capacity"],
-    "Overload_Risk":      df3["Overload_Risk"],
-    "High Motor Temp":    df3["HighMotorTemp"],
-    "Max Vibration":      df3["HighVib"],
-    "Amp Spread Ratio":       df3["SpreadFlag"],
-    "Tubing-Casing Δ":    df3["LowDeltaFlag"],
-    "Fault Count":        df3["FaultHigh"],
-    "Uptime %":           df3["LowUptime"],
-    "NearUnderload Ratio":df3["NearUnderload"],
-    "NearUnderload":      df3["NearUnderload"],
-    "Normal_vs_Overload": df3["Normal_vs_Overload"],
-    "MissingSensor":      df3["MissingSensor"],
-
-    "Avg Intake Pressure > HighIntake":
-        df3[col("Avg Intake Pressure","mean")] > thr["HighIntake"],
-    "Drawdown < SmallDrawdown":
-        drawdown < thr["SmallDrawdown"],
-}
 
-# ─── PoorPerformance now = OR over your selected criteria ────────────
-# ─── compute PoorPerformance via TRUE & FALSE lists ───────────────────
-# build the TRUE‐flags series
-pt = thr["PoorTrue"]
-if pt:
-    true_df = pd.concat([flag_map[c] for c in pt if c in flag_map], axis=1)
-    poor_true = true_df.any(axis=1)
-else:
-    poor_true = pd.Series(False, index=df3.index)
-
-# build the FALSE‐flags series
-pf = thr["PoorFalse"]
-if pf:
-    false_df = pd.concat([flag_map[c] for c in pf if c in flag_map], axis=1)
-    poor_false_ok = (~false_df).all(axis=1)
-else:
-    poor_false_ok = pd.Series(True, index=df3.index)
-
-# final PoorPerformance: any TRUE *and* all FALSE
-df3["PoorPerformance"] = poor_true & poor_false_ok
-
-
-
-# ─── SpeedUp = AND across all TRUE flags and all FALSE flags ─────────
-true_list  = thr["SpeedTrue"]
-false_list = thr["SpeedFalse"]
-series = []
-
-for c in true_list:
-    if c in flag_map:
-        series.append(flag_map[c])
-for c in false_list:
-    if c in flag_map:
-        series.append(~flag_map[c])
-
-# if no criteria selected, default to False
-if series:
-    df3["SpeedUp"] = pd.concat(series, axis=1).all(axis=1)
-else:
-    df3["SpeedUp"] = False
-
-
-
-# ───────────── Terrible‐Performance Score ─────────────
-df3["TerribleScore"] = (
-      weights["uptime"]       * df3["LowUptime"].astype(int)
-    + weights["missing"]      * df3["MissingSensor"].astype(int)
-    + weights["spread"]       * df3["ampSpreadRatio"].fillna(0)
-    + weights["motortemp"]    * df3["HighMotorTemp"].astype(int)
-    + weights["drawdown"]     * (drawdown < thr["SmallDrawdown"]).astype(int)
-    + weights["nearunderload"]* df3["NearUnderload"].astype(int)
-    + weights["vibration"]    * df3["HighVib"].astype(int)
-    + weights["fault"]        * df3["FaultHigh"].astype(int)
-)
+cube = rollup_cube(data_version, json.dumps(thr, sort_keys=True, default=str), df3)
+perf_since("flags", flags_t0)
 
 # ───────────── Build AG‐Grid table ───────────────────────────────────────
-df_show = df3.copy()
-# ─── INSERT a dummy Trigger column for the grid button ─────────────
-df_show["Trigger"] = "Trigger"
-
-# ─── Add hidden Boolean columns for PoorPerformance reasons ───
-df_show["LowUptime_bool"]    = df3["LowUptime"]       # True = failed uptime threshold
-df_show["HighVib_bool"]      = df3["HighVib"]         # True = failed vibration threshold
-df_show["SpreadFlag_bool"]   = df3["SpreadFlag"]      # True = failed spread‐ratio threshold
-df_show["HighMotorTemp_bool"]= df3["HighMotorTemp"]   # True = failed motor‐temp threshold
-df_show["FaultHigh_bool"]    = df3["FaultHigh"]       # True = failed fault‐count threshold
-df_show["HighRunningDays_bool"] = df3["HighRunningDays"]
-df_show["HighDowntime_bool"]    = df3["HighDowntime"]
-df_show["LowDeltaFlag_bool"]    = df3["LowDeltaFlag"]
-# ─── Add hidden Boolean columns for SpeedUp reasons ───
-#  1) Running Days < 90?
-df_show["Speed_RunDays_OK"]     = df3[col("Running Days", "mean")] < 90
-
-#  2) Avg Intake Pressure > HighIntake?
-df_show["Speed_AvgIntake_OK"]   = df3[col("Avg Intake Pressure", "mean")] > thr["HighIntake"]
-
-#  3) Drawdown < SmallDrawdown?
-#     (we already computed `drawdown = Max Intake – Min Intake` above)
-df_show["Speed_Drawdown_OK"]    = drawdown < thr["SmallDrawdown"]
-
-#  4) Overload_Risk == False?
-df_show["Speed_OverloadOK"]     = ~df3["Overload_Risk"].astype(bool)
-
-#  5) At_Max_Capacity == False?
-df_show["Speed_AtMaxOK"]        = ~df3["At_Max_Capacity"].astype(bool)
-
-# Numeric columns first
-df_show["High Motor Temp"]     = df3[col("Max Motor Temp", "max")]
-df_show["High Downtime"]       = df3[col("Downtime (Hr)", "mean")]
-df_show["Max Vibration"]       = df3["Max Vibration"]
-
-# Amp Spread Ratio / Tubing-Casing Δ / NearUnderload Ratio
-df_show["Amp Spread Ratio"]        = df3["ampSpreadRatio"]
-df_show["Tubing-Casing Δ"]     = df3[col("Avg Tubing", "mean")] - df3[col("Avg Casing", "mean")]
-df_show["NearUnderload Ratio"] = df3["NearUnderload Ratio"]
-df_show["Pressure Difference"] = df3["Pressure Difference"]
-df_show["Frequency Spread Ratio"]         = df3["Frequency Spread Ratio"]
-# Boolean‐derived columns replaced with numeric or checkmarks:
-df_show["Normal_vs_Overload"]  = df3["Normal_vs_Overload"].apply(lambda x: "✗" if x else "")
-df_show["MissingSensor"]       = df3["MissingSensor"].apply(lambda x: "✗" if x else "")
-
-df_show["Fault Count"] = df3["Fault Count"]       # numeric, colored below
-df_show["HighVib"]     = df3["Max Vibration"]     # numeric, colored below
-
-df_show["Uptime %"]    = uptime_pct               # numeric, colored below
-df_show["PoorPerformance"] = df3["PoorPerformance"].apply(lambda x: "✗" if x else "✓")
-df_show["SpeedUp"] = df3["SpeedUp"].apply(lambda x: "✓" if x else "✗")
-
-df_show["At_Max_Capacity"] = df3["CapLoad"]
-df_show["Overload_Risk"]   = df3["CapRisk"]
-
-df_show["Running Days"]        = df3[col("Running Days", "mean")]
-df_show["Drive Type"]          = df3[col("Drive Type", "first")]
-df_show["State Detail/Op Mode"]= df3[col("State Detail/Op Mode", "first")]
-
 # Link URL (first value for each well)
 df3["Link URL"] = df3[col("Link URL", "first")]
-df_show["Link URL"] = df3["Link URL"]
 
 # Columns to display, in order:
 display_cols = [
@@ -1206,537 +1050,584 @@ display_cols = [
     "Normal_vs_Overload",
     "MissingSensor", "Drive Type", "State Detail/Op Mode"
 ]
+
+# ─── Hidden Boolean columns behind the PoorPerformance / SpeedUp tooltips ───
+hidden_bools = {
+    "LowUptime_bool":       df3["LowUptime"],        # True = failed uptime threshold
+    "HighVib_bool":         df3["HighVib"],          # True = failed vibration threshold
+    "SpreadFlag_bool":      df3["SpreadFlag"],       # True = failed spread‐ratio threshold
+    "HighMotorTemp_bool":   df3["HighMotorTemp"],    # True = failed motor‐temp threshold
+    "FaultHigh_bool":       df3["FaultHigh"],        # True = failed fault‐count threshold
+    "HighRunningDays_bool": df3["HighRunningDays"],
+    "HighDowntime_bool":    df3["HighDowntime"],
+    "LowDeltaFlag_bool":    df3["LowDeltaFlag"],
+    # SpeedUp reasons
+    "Speed_RunDays_OK":     df3[col("Running Days", "mean")] < 90,
+    "Speed_AvgIntake_OK":   df3[col("Avg Intake Pressure", "mean")] > thr["HighIntake"],
+    "Speed_Drawdown_OK":    drawdown < thr["SmallDrawdown"],
+    "Speed_OverloadOK":     ~df3["Overload_Risk"].astype(bool),
+    "Speed_AtMaxOK":        ~df3["At_Max_Capacity"].astype(bool),
+}
+
+# sidebar SpeedUp labels → the hidden boolean field the tooltip reads
+speed_tooltip_fields = {
+    "Avg Intake Pressure > HighIntake": "Speed_AvgIntake_OK",
+    "Drawdown < SmallDrawdown":         "Speed_Drawdown_OK",
+    "High running days":                "HighRunningDays_bool",
+    "At_Max_Capacity":                  "Speed_AtMaxOK",
+    "Overload_Risk":                    "Speed_OverloadOK",
+}
+
+# the lists the tooltips are rendered with
+poor_true  = defs.get("PoorTrue", poor_defaults)
+poor_false = defs.get("PoorFalse", [])
+speed_true  = defs.get("SpeedTrue", speed_true_defaults)
+speed_false = defs.get("SpeedFalse", [])
+
+tooltip_fields = {f + "_bool" for f in poor_true + poor_false}
+tooltip_fields |= {speed_tooltip_fields.get(f, f + "_bool") for f in speed_true + speed_false}
+hidden_cols = [c for c in hidden_bools if c in tooltip_fields]
+
+# ─── Project the grid payload: display columns + Link URL + tooltip fields ───
+def display_frame(df3: pd.DataFrame) -> pd.DataFrame:
+    """display_cols + Link URL of a flagged, scored aggregate (the grid and the reports)."""
+    return pd.DataFrame({
+        "Well Name":              df3["Well Name"],
+        "Trigger":                "Trigger",   # dummy column for the grid button
+        "Running Days":           df3[col("Running Days", "mean")],
+        "TerribleScore":          df3["TerribleScore"],
+        "PoorPerformance":        np.where(df3["PoorPerformance"], "✗", "✓"),
+        "SpeedUp":                np.where(df3["SpeedUp"], "✓", "✗"),
+        "At_Max_Capacity":        df3["CapLoad"],
+        "Overload_Risk":          df3["CapRisk"],
+        "High Motor Temp":        df3[col("Max Motor Temp", "max")],
+        "High Downtime":          df3[col("Downtime (Hr)", "mean")],
+        "Max Vibration":          df3["Max Vibration"],
+        "Pressure Difference":    df3["Pressure Difference"],
+        "Frequency Spread Ratio": df3["Frequency Spread Ratio"],
+        "Amp Spread Ratio":       df3["ampSpreadRatio"],
+        "Tubing-Casing Δ":        df3[col("Avg Tubing", "mean")] - df3[col("Avg Casing", "mean")],
+        "Fault Count":            df3["Fault Count"],
+        "Uptime %":               df3[col("Uptime (%)", "mean")] * 100,
+        "NearUnderload Ratio":    df3["NearUnderload Ratio"],
+        "Normal_vs_Overload":     np.where(df3["Normal_vs_Overload"], "✗", ""),
+        "MissingSensor":          np.where(df3["MissingSensor"], "✗", ""),
+        "Drive Type":             df3[col("Drive Type", "first")],
+        "State Detail/Op Mode":   df3[col("State Detail/Op Mode", "first")],
+        "Link URL":               df3[col("Link URL", "first")],
+    }, index=df3.index)
+
+df_show = display_frame(df3).assign(
+    StyleBits=style_bits,     # grid-only helper columns, never in df3
+    FlagBits=flag_bits,
+    **{c: hidden_bools[c] for c in hidden_cols},
+)
+
 # ───── Fields available for custom cards ─────
 # Only include the numeric display columns from df_show
 card_fields = df3.select_dtypes(include=[np.number]).columns.tolist()
-with st.sidebar.expander("Custom Cards", expanded=False):
-    
-    custom = settings.get(current_key, {}).get("custom_cards", [])
-    # List & remove
-    for i, card in enumerate(custom):
-        c1, c2 = st.columns([4,1])
-        with c1:
-            st.markdown(f"**{card['label']}**: {card['field']} {card['operator']} {card['threshold']}")
-        with c2:
-            if st.button("❌", key=f"rm_card_{i}"):
-                settings[current_key]["custom_cards"].pop(i)
-                SETTINGS_FILE.write_text(json.dumps(settings, indent=2))
-                st.rerun()
-    # Add new
-    if len(custom) < 5:
-        lbl    = st.text_input("Label")
-        st.markdown("**Condition 1**")
-        field1 = st.selectbox("Field",    card_fields, key="c1f")
-        op1     = st.selectbox("Operator", [">","<","="],    key="c1o")
-        val1    = st.number_input("Threshold", value=0.0,    key="c1v")
-
-        add2    = st.checkbox("Add second condition?",      key="add2")
-        if add2:
-            st.markdown("**Condition 2**")
-            field2 = st.selectbox("Field (2)", card_fields,  key="c2f")
-            op2     = st.selectbox("Operator (2)", [">","<","="], key="c2o")
-            val2    = st.number_input("Threshold (2)", value=0.0, key="c2v")
-            comb    = st.radio("Combine with", ["AND","OR"], index=0, key="c2c")
-        else:
-            field2 = op2 = val2 = comb = None
-
-        color  = st.text_input("Color (hex)", "#336699", key="c_color")
-        if st.button("Add card"):
-            new = {
-                "label": lbl,
-                "conditions": [
-                    {"field": field1, "op": op1, "value": val1}
-                ],
-                "combiner": comb or "AND",
-                "color": color
-            }
+@st.fragment
+def custom_cards_editor(card_fields: list, current_key: str):
+    """
+    Custom-card editor. Typing in it reruns only this panel; adding or
+    removing a card saves the settings and reruns the app to show it.
+    """
+    with perf_timer("custom_cards_editor"), st.expander("Custom Cards", expanded=False):
+        custom = settings.get(current_key, {}).get("custom_cards", [])
+        # List & remove
+        for i, card in enumerate(custom):
+            c1, c2 = st.columns([4,1])
+            with c1:
+                conds = card.get("conditions") or [
+                    {"field": card.get("field"), "op": card.get("operator"), "value": card.get("threshold")}
+                ]
+                rule = f" {card.get('combiner', 'AND')} ".join(f"{c['field']} {c['op']} {c['value']}" for c in conds)
+                st.markdown(f"**{card['label']}**: {rule}")
+            with c2:
+                if st.button("❌", key=f"rm_card_{i}"):
+                    drop = lambda entry, i=i: {**entry, "custom_cards": entry["custom_cards"][:i] + entry["custom_cards"][i + 1:]}
+                    if save_settings(current_key, drop, st.session_state.settings_seen.get(current_key), where=st):
+                        st.rerun()
+        # Add new
+        if len(custom) < 5:
+            lbl    = st.text_input("Label")
+            st.markdown("**Condition 1**")
+            field1 = st.selectbox("Field",    card_fields, key="c1f")
+            op1     = st.selectbox("Operator", [">","<","="],    key="c1o")
+            val1    = st.number_input("Threshold", value=0.0,    key="c1v")
+
+            add2    = st.checkbox("Add second condition?",      key="add2")
             if add2:
-                new["conditions"].append(
-                    {"field": field2, "op": op2, "value": val2}
-                )
-            custom.append(new)
-            SETTINGS_FILE.write_text(json.dumps(settings, indent=2))
-            st.rerun()
+                st.markdown("**Condition 2**")
+                field2 = st.selectbox("Field (2)", card_fields,  key="c2f")
+                op2     = st.selectbox("Operator (2)", [">","<","="], key="c2o")
+                val2    = st.number_input("Threshold (2)", value=0.0, key="c2v")
+                comb    = st.radio("Combine with", ["AND","OR"], index=0, key="c2c")
+            else:
+                field2 = op2 = val2 = comb = None
+
+            color  = st.text_input("Color (hex)", "#336699", key="c_color")
+            if st.button("Add card"):
+                new = {
+                    "label": lbl,
+                    "conditions": [
+                        {"field": field1, "op": op1, "value": val1}
+                    ],
+                    "combiner": comb or "AND",
+                    "color": color
+                }
+                if add2:
+                    new["conditions"].append(
+                        {"field": field2, "op": op2, "value": val2}
+                    )
+                def add(entry):
+                    # a customer's first entry starts from DEFAULT's thresholds, not from nothing
+                    if entry is None:
+                        entry = copy.deepcopy({k: v for k, v in settings["DEFAULT"].items() if k != "custom_cards"})
+                    return {**entry, "custom_cards": entry.get("custom_cards", []) + [new]}
+                if save_settings(current_key, add, st.session_state.settings_seen.get(current_key), where=st):
+                    st.rerun()
+
+with st.sidebar:
+    custom_cards_editor(card_fields, current_key)
 
 
 # ---------------------- JS Cell‐Style + Link‐Renderer ----------------------
-js_color = JsCode(f"""
-function(p) {{
-    // Convert Python night_mode (True/False) → JS boolean (true/false)
-    var isDark = {str(night_mode).lower()};  
-
-    // Define color pairs for light vs dark mode
-    var lightRed  = '#FFB3B3';
-    var lightGreen = '#C6F7C6';
-    var darkRed   = '#E74C3C';    // darker red for contrast
-    var darkGreen = '#2ECC71';    // emerald green in dark mode
-    var cellText  = isDark ? '#FFFFFF' : '#000000';
-
-    // At_Max_Capacity coloring: red ≥ threshold, green otherwise
-    if (p.colDef.field === 'At_Max_Capacity') {{
-        var bg = (p.value >= {thr["CapLoadPct"]}) 
-            ? (isDark ? darkRed : lightRed)
-            : (isDark ? darkGreen : lightGreen);
-        return {{ 'backgroundColor': bg, 'color': cellText }};
-    }}
-
-    // Overload_Risk coloring: red ≥ threshold, green otherwise
-    if (p.colDef.field === 'Overload_Risk') {{
-        var bg = (p.value >= {thr["RiskPct"]})
-            ? (isDark ? darkRed : lightRed)
-            : (isDark ? darkGreen : lightGreen);
-        return {{ 'backgroundColor': bg, 'color': cellText }};
-    }}
-
-    // High Motor Temp coloring: red ≥ threshold, green otherwise
-    if (p.colDef.field === 'High Motor Temp') {{
-        var bg = (p.value !== null && p.value >= {thr["TempHigh"]})
-            ? (isDark ? darkRed : lightRed)
-            : (isDark ? darkGreen : lightGreen);
-        return {{ 'backgroundColor': bg, 'color': cellText }};
-    }}
-
-    // High Downtime coloring: red > threshold, green otherwise
-    if (p.colDef.field === 'High Downtime') {{
-        var bg = (p.value > {thr["HighDT"]})
-            ? (isDark ? darkRed : lightRed)
-            : (isDark ? darkGreen : lightGreen);
-        return {{ 'backgroundColor': bg, 'color': cellText }};
-    }}
-
-    // Max Vibration coloring: red ≥ threshold, green otherwise
-    if (p.colDef.field === 'Max Vibration') {{
-        var bg = (p.value >= {thr["VibHigh"]})
-            ? (isDark ? darkRed : lightRed)
-            : (isDark ? darkGreen : lightGreen);
-        return {{ 'backgroundColor': bg, 'color': cellText }};
-    }}
-
-    // Amp Spread Ratio coloring: red ≥ threshold, green otherwise
-    if (p.colDef.field === 'Amp Spread Ratio') {{
-        var bg = ((p.value !== null) && (p.value >= {thr["ampSpreadRatio"]}))
-            ? (isDark ? darkRed : lightRed)
-            : (isDark ? darkGreen : lightGreen);
-        return {{ 'backgroundColor': bg, 'color': cellText }};
-    }}
-    if (p.colDef.field === 'Pressure Difference') {{
-        var bg = (p.value <= {thr["PressureDiff"]})
-            ? (isDark ? darkRed : lightRed)
-            : (isDark ? darkGreen : lightGreen);
-        return {{ 'backgroundColor': bg, 'color': cellText }};
-    }}
-
-    // Frequency Spread Ratio coloring: red ≥ threshold, green otherwise
-    if (p.colDef.field === 'Frequency Spread Ratio') {{
-        var bg = (p.value >= {thr["FreqSpread"]})
-            ? (isDark ? darkRed : lightRed)
-            : (isDark ? darkGreen : lightGreen);
-        return {{ 'backgroundColor': bg, 'color': cellText }};
-    }}
-
-    // Tubing-Casing Δ coloring: red ≤ threshold, green otherwise
-    if (p.colDef.field === 'Tubing-Casing Δ') {{
-        var bg = (p.value <= {thr["LowDelta"]})
-            ? (isDark ? darkRed : lightRed)
-            : (isDark ? darkGreen : lightGreen);
-        return {{ 'backgroundColor': bg, 'color': cellText }};
-    }}
-
-    // NearUnderload Ratio coloring: red < threshold, green otherwise
-    if (p.colDef.field === 'NearUnderload Ratio') {{
-        var bg = (p.value < {thr["NearUnderLower"]})
-            ? (isDark ? darkRed : lightRed)
-            : (isDark ? darkGreen : lightGreen);
-        return {{ 'backgroundColor': bg, 'color': cellText }};
-    }}
-
-    // NearUnderload boolean: red “✗” if True
-    if (p.colDef.field === 'NearUnderload') {{
-        if (p.value === '✗') {{
-            return {{ 'color': (isDark ? '#FF6961' : '#FF0000') }};
-        }}
-        return null;
-    }}
-
-    // Normal_vs_Overload: red “✗” if True
-    if (p.colDef.field === 'Normal_vs_Overload') {{
-        if (p.value === '✗') {{
-            return {{ 'color': (isDark ? '#FF6961' : '#FF0000') }};
-        }}
-        return null;
-    }}
-
-    // MissingSensor boolean: red “✗” if True
-    if (p.colDef.field === 'MissingSensor') {{
-        if (p.value === '✗') {{
-            return {{ 'color': (isDark ? '#FF6961' : '#FF0000') }};
-        }}
-        return null;
-    }}
-
-    // Fault Count: red if ≥ threshold, green otherwise
-    if (p.colDef.field === 'Fault Count') {{
-        var bg = (p.value >= {thr["HighFaultCount"]})
-            ? (isDark ? darkRed : lightRed)
-            : (isDark ? darkGreen : lightGreen);
-        return {{ 'backgroundColor': bg, 'color': cellText }};
-    }}
-
-    // HighVib: red if ≥ threshold, green otherwise
-    if (p.colDef.field === 'HighVib') {{
-        var bg = (p.value >= {thr["VibHigh"]})
-            ? (isDark ? darkRed : lightRed)
-            : (isDark ? darkGreen : lightGreen);
-        return {{ 'backgroundColor': bg, 'color': cellText }};
-    }}
-
-    // Uptime %: red if < LowUptime threshold, green otherwise
-    if (p.colDef.field === 'Uptime %') {{
-        var bg = (p.value < {thr["LowUptime"]})
-            ? (isDark ? darkRed : lightRed)
-            : (isDark ? darkGreen : lightGreen);
-        return {{ 'backgroundColor': bg, 'color': cellText }};
-    }}
-
-    // PoorPerformance boolean: red “✗” if True (no background)
-    if (p.colDef.field === 'PoorPerformance') {{
-        if (p.value === '✗') {{
-            return {{ 'color': (isDark ? '#FF6961' : '#FF0000') }};
-        }}
-        return null;
-    }}
-
-    // SpeedUp: green “✓” if True (no background)
-    if (p.colDef.field === 'SpeedUp') {{
-        if (p.value === '✓') {{
-            return {{ 'color': (isDark ? '#77DD77' : '#00AA00') }};
-        }}
-        return null;
-    }}
-
-    // If no conditions matched, return null so AG-Grid uses default
-    return null;
-}}
-""")
-
-gb = GridOptionsBuilder.from_dataframe(df_show[display_cols])
-
-# Configure “Well Name” as a clickable hyperlink or red if no URL
-gb.configure_column(
-    "Well Name",
-    pinned="left",
-    cellRenderer=JsCode("""
-        function (params) {
-            const url   = params.data["Link URL"];
-            const value = params.value || "";
-            if (url) {
-                // If there’s a URL, wrap the well name in an <a> tag:
-                params.eGridCell.innerHTML =
-                    `<a href="${url}" target="_blank">${value}</a>`;
-            } else {
-                // Otherwise, show the well name in red
-                params.eGridCell.innerHTML =
-                    `<span style="color:red">${value}</span>`;
+@st.cache_resource(show_spinner=False)
+def build_grid_options(schema: pd.DataFrame, style_kinds: dict, flag_names: list,
+                       display_cols: list, hidden_cols: list,
+                       poor_true: list, poor_false: list,
+                       speed_true: list, speed_false: list) -> dict:
+    """
+    Build the AG-Grid options (cell class rules, renderers, tooltips).
+    Thresholds are already baked into StyleBits, so this is memoized on the
+    columns and Poor/Speed lists only – `schema` is a zero-row frame, so
+    only the column dtypes enter the key.
+    The cached dict is shared – callers must hand AgGrid a copy.
+    """
+    gb = GridOptionsBuilder.from_dataframe(schema)
+
+    # Configure “Well Name” as a clickable hyperlink or red if no URL
+    gb.configure_column(
+        "Well Name",
+        pinned="left",
+        cellRenderer=JsCode("""
+            function (params) {
+                const url   = params.data["Link URL"];
+                const value = params.value || "";
+                if (url) {
+                    // If there’s a URL, wrap the well name in an <a> tag:
+                    params.eGridCell.innerHTML =
+                        `<a href="${url}" target="_blank">${value}</a>`;
+                } else {
+                    // Otherwise, show the well name in red
+                    params.eGridCell.innerHTML =
+                        `<span style="color:red">${value}</span>`;
+                }
+                return null;
             }
-            return null;
-        }
-    """)
-)
-# ─── Configure our new Trigger button column ──────────────────────────
-gb.configure_column(
-    "Trigger",
-    headerName="",
-    pinned="left",
-    width=100,
-    cellRenderer=JsCode("""
-        function(params) {
-            const well = params.data["Well Name"];
-            const href = window.location.pathname
-                       + "?trigger_well="
-                       + encodeURIComponent(well);
-            // inject a real <button> into the cell
-            params.eGridCell.innerHTML = 
-                `<button style="width:80px;" 
-                         onclick="window.location.href='${href}'">
-                     Trigger
-                 </button>`;
-            return null;
+        """)
+    )
+    # ─── Configure our new Trigger button column ──────────────────────────
+    # ─── “Filter wells by flag” lives in the Trigger header, client-side ───
+    flag_filter_header = JsCode("""
+        class FlagFilterHeader {
+            init(params) {
+                const flags = %(flags)s;
+                const sel = document.createElement("select");
+                sel.title = "Filter wells by flag";
+                sel.style.width = "100%%";
+                sel.add(new Option("All flags", 0));
+                flags.forEach((f, i) => sel.add(new Option(f, 1 << i)));
+                sel.value = String(window.wrFlagBit || 0);
+                sel.addEventListener("change", () => {
+                    window.wrFlagBit = Number(sel.value);
+                    params.api.onFilterChanged();
+                });
+                this.eGui = sel;
+            }
+            getGui()  { return this.eGui; }
+            refresh() { return true; }
         }
-    """)
-)
-
-# Pin “Running Days” so it sits to the left of “Well Name”
-gb.configure_column(
-    "Running Days",
-    pinned="left",
-    type=["numericColumn"],
-    valueFormatter="x.toFixed(1)",
-    headerTooltip="Mean Running Days over lookback window"
-)
-
-# Pin TerribleScore with tooltip
-gb.configure_column(
-    "TerribleScore",
-    pinned="left",
-    type=["numericColumn"],
-    headerTooltip=(
-        "TerribleScore = "
-        "(LowUptime × uptime weight) + "
-        "(MissingSensor × missing weight) + "
-        "(ampSpreadRatio × spread weight) + "
-        "(HighMotorTemp × motortemp weight) + "
-        "((Max Intake – Min Intake) < SmallDrawdown threshold × drawdown weight) + "
-        "(NearUnderload × nearunderload weight) + "
-        "(HighVib × vibration weight) + "
-        "(FaultHigh × fault count weight)."
+    """ % {"flags": json.dumps(flag_names)})
+    gb.configure_grid_options(
+        isExternalFilterPresent=JsCode("function() { return !!window.wrFlagBit; }"),
+        doesExternalFilterPass=JsCode(
+            "function(node) { return (node.data.FlagBits & window.wrFlagBit) !== 0; }"
+        ),
+    )
+    gb.configure_column(
+        "Trigger",
+        headerName="",
+        headerComponent=flag_filter_header,
+        pinned="left",
+        width=160,
+        cellRenderer=JsCode("""
+            function(params) {
+                const well = params.data["Well Name"];
+                const href = window.location.pathname
+                           + "?trigger_well="
+                           + encodeURIComponent(well);
+                // inject a real <button> into the cell
+                params.eGridCell.innerHTML = 
+                    `<button style="width:80px;" 
+                             onclick="window.location.href='${href}'">
+                         Trigger
+                     </button>`;
+                return null;
+            }
+        """)
     )
-)
-
-poor_true = defs.get("PoorTrue", poor_defaults)
-poor_false = defs.get("PoorFalse", [])
 
-gb.configure_column(
-    "PoorPerformance",
-    pinned="left",
-    type=["textColumn"],
-    headerTooltip=(
-        "Displays ✗ if any TRUE‐flag is met or any FALSE‐flag is violated."
-    ),
-    tooltipValueGetter=JsCode(f"""
-        function(params) {{
-            if (params.value === '✓') return null;
-            const trueList  = {json.dumps(poor_true)};
-            const falseList = {json.dumps(poor_false)};
-            const d = params.data;
-            let lines = [];
-            // TRUE‐flags first
-            trueList.forEach(flag => {{
-                const ok = d[flag + '_bool'];
-                lines.push(`${{flag}} is ${{ok}}: ${{ok ? 'passed' : 'failed'}}`);
-            }});
-            // then FALSE‐flags
-            falseList.forEach(flag => {{
-                const ok = d[flag + '_bool'];
-                lines.push(`${{flag}} is ${{ok}}: ${{ok ? 'passed' : 'failed'}}`);
-            }});
-            return lines.join("\\n");
-        }}
-    """)
-)
+    # Pin “Running Days” so it sits to the left of “Well Name”
+    gb.configure_column(
+        "Running Days",
+        pinned="left",
+        type=["numericColumn"],
+        valueFormatter="x.toFixed(1)",
+        headerTooltip="Mean Running Days over lookback window"
+    )
 
-# pull your saved lists out of defs
-speed_true  = defs.get("SpeedTrue", speed_true_defaults)
-speed_false = defs.get("SpeedFalse", [])
+    # Pin TerribleScore with tooltip
+    gb.configure_column(
+        "TerribleScore",
+        pinned="left",
+        type=["numericColumn"],
+        headerTooltip=(
+            "TerribleScore = "
+            "(LowUptime × uptime weight) + "
+            "(MissingSensor × missing weight) + "
+            "(ampSpreadRatio × spread weight) + "
+            "(HighMotorTemp × motortemp weight) + "
+            "((Max Intake – Min Intake) < SmallDrawdown threshold × drawdown weight) + "
+            "(NearUnderload × nearunderload weight) + "
+            "(HighVib × vibration weight) + "
+            "(FaultHigh × fault count weight)."
+        )
+    )
 
-# pre-dump to JSON
-true_list_json  = json.dumps(speed_true)
-false_list_json = json.dumps(speed_false)
+    gb.configure_column(
+        "PoorPerformance",
+        pinned="left",
+        type=["textColumn"],
+        headerTooltip=(
+            "Displays ✗ if any TRUE‐flag is met or any FALSE‐flag is violated."
+        ),
+        tooltipValueGetter=JsCode(f"""
+            function(params) {{
+                if (params.value === '✓') return null;
+                const trueList  = {json.dumps(poor_true)};
+                const falseList = {json.dumps(poor_false)};
+                const d = params.data;
+                let lines = [];
+                // TRUE‐flags first
+                trueList.forEach(flag => {{
+                    const ok = d[flag + '_bool'];
+                    lines.push(`${{flag}} is ${{ok}}: ${{ok ? 'passed' : 'failed'}}`);
+                }});
+                // then FALSE‐flags
+                falseList.forEach(flag => {{
+                    const ok = d[flag + '_bool'];
+                    lines.push(`${{flag}} is ${{ok}}: ${{ok ? 'passed' : 'failed'}}`);
+                }});
+                return lines.join("\\n");
+            }}
+        """)
+    )
 
-gb.configure_column(
-    "SpeedUp",
-    pinned="left",
-    type=["textColumn"],
-    headerTooltip="Displays ✓ only if all TRUE-flags are met and FALSE-flags are clear.",
-    tooltipValueGetter=JsCode(
-        """
-        function(params) {
-            if (params.value === '✓') return null;
-            const trueList  = %(true)s;
-            const falseList = %(false)s;
-            const d = params.data;
-
-            // map your sidebar labels → the actual boolean-column names in `d`
-            const map = {
-              "Avg Intake Pressure > HighIntake": "Speed_AvgIntake_OK",
-              "Drawdown < SmallDrawdown":         "Speed_Drawdown_OK",
-              "High running days":                "HighRunningDays_bool",
-              "At_Max_Capacity":                  "Speed_AtMaxOK",
-              "Overload_Risk":                    "Speed_OverloadOK"
-              // add more mappings here if you expose them…
-            };
-
-            function describe(flag) {
-              const field = map[flag] || (flag + "_bool");
-              const val   = d[field];
-              const ok    = (typeof val === "boolean") ? val : undefined;
-              const status = ok === undefined ? "undefined" : ok;
-              const result = ok ? "passed" : "failed";
-              return `${flag} is ${status}: ${result}`;
+    # pre-dump to JSON
+    true_list_json  = json.dumps(speed_true)
+    false_list_json = json.dumps(speed_false)
+    field_map_json  = json.dumps(speed_tooltip_fields)
+
+    gb.configure_column(
+        "SpeedUp",
+        pinned="left",
+        type=["textColumn"],
+        headerTooltip="Displays ✓ only if all TRUE-flags are met and FALSE-flags are clear.",
+        tooltipValueGetter=JsCode(
+            """
+            function(params) {
+                if (params.value === '✓') return null;
+                const trueList  = %(true)s;
+                const falseList = %(false)s;
+                const d = params.data;
+
+                // map your sidebar labels → the actual boolean-column names in `d`
+                // (add more mappings to speed_tooltip_fields if you expose them…)
+                const map = %(fields)s;
+
+                function describe(flag) {
+                  const field = map[flag] || (flag + "_bool");
+                  const val   = d[field];
+                  const ok    = (typeof val === "boolean") ? val : undefined;
+                  const status = ok === undefined ? "undefined" : ok;
+                  const result = ok ? "passed" : "failed";
+                  return `${flag} is ${status}: ${result}`;
+                }
+
+                let lines = [];
+                trueList.forEach(f => lines.push(describe(f)));
+                falseList.forEach(f => lines.push(describe(f)));
+                return lines.join("\\n");
             }
-
-            let lines = [];
-            trueList.forEach(f => lines.push(describe(f)));
-            falseList.forEach(f => lines.push(describe(f)));
-            return lines.join("\\n");
-        }
-        """ % {
-            "true":  true_list_json,
-            "false": false_list_json
-        }
+            """ % {
+                "true":   true_list_json,
+                "false":  false_list_json,
+                "fields": field_map_json
+            }
+        )
     )
-)
-# Configure each derived column’s tooltip & formatting:
-gb.configure_column(
-    "At_Max_Capacity",
-    type=["numericColumn"],
-    valueFormatter="x.toFixed(2)",
-    headerTooltip=(
-        "At_Max_Capacity = Max Drive Amps ÷ Normal Running Amps.\n"
-        "Cell is red if ≥ Cap load pct threshold, green otherwise."
+    # Configure each derived column’s tooltip & formatting:
+    gb.configure_column(
+        "At_Max_Capacity",
+        type=["numericColumn"],
+        valueFormatter="x.toFixed(2)",
+        headerTooltip=(
+            "At_Max_Capacity = Max Drive Amps ÷ Normal Running Amps.\n"
+            "Cell is red if ≥ Cap load pct threshold, green otherwise."
+        )
     )
-)
-gb.configure_column(
-    "Overload_Risk",
-    type=["numericColumn"],
-    valueFormatter="x.toFixed(2)",
-    headerTooltip=(
-        "Overload_Risk = Max Drive Amps ÷ Motor Overload.\n"
-        "Cell is red if ≥ Risk pct threshold, green otherwise."
+    gb.configure_column(
+        "Overload_Risk",
+        type=["numericColumn"],
+        valueFormatter="x.toFixed(2)",
+        headerTooltip=(
+            "Overload_Risk = Max Drive Amps ÷ Motor Overload.\n"
+            "Cell is red if ≥ Risk pct threshold, green otherwise."
+        )
     )
-)
-gb.configure_column(
-    "High Motor Temp",
-    type=["numericColumn"],
-    valueFormatter="x.toFixed(1)",
-    headerTooltip=(
-        "High Motor Temp = Max Motor Temp.\n"
-        "Cell is red if ≥ High motor temp threshold, green otherwise."
+    gb.configure_column(
+        "High Motor Temp",
+        type=["numericColumn"],
+        valueFormatter="x.toFixed(1)",
+        headerTooltip=(
+            "High Motor Temp = Max Motor Temp.\n"
+            "Cell is red if ≥ High motor temp threshold, green otherwise."
+        )
     )
-)
-gb.configure_column(
-    "High Downtime",
-    type=["numericColumn"],
-    valueFormatter="x.toFixed(1)",
-    headerTooltip=(
-        "High Downtime = average Downtime (Hr) over lookback window.\n"
-        "Cell is red if > High downtime hrs threshold, green otherwise."
+    gb.configure_column(
+        "High Downtime",
+        type=["numericColumn"],
+        valueFormatter="x.toFixed(1)",
+        headerTooltip=(
+            "High Downtime = average Downtime (Hr) over lookback window.\n"
+            "Cell is red if > High downtime hrs threshold, green otherwise."
+        )
     )
-)
-gb.configure_column(
-    "Max Vibration",
-    type=["numericColumn"],
-    valueFormatter="x.toFixed(2)",
-    headerTooltip=(
-        "Max Vibration = max(Avg Vib X, Avg Vib Y) over lookback.\n"
-        "Cell is red if ≥ High vibration threshold, green otherwise."
+    gb.configure_column(
+        "Max Vibration",
+        type=["numericColumn"],
+        valueFormatter="x.toFixed(2)",
+        headerTooltip=(
+            "Max Vibration = max(Avg Vib X, Avg Vib Y) over lookback.\n"
+            "Cell is red if ≥ High vibration threshold, green otherwise."
+        )
     )
-)
-gb.configure_column(
-    "Amp Spread Ratio",
-    type=["numericColumn"],
-    valueFormatter="x.toFixed(2)",
-    headerTooltip=(
-        "ampSpreadRatio = (Max Drive Amps − Min Drive Amps) ÷ (Avg Drive Amps).\n"
-        "If Min Drive Amps = 0 → displayed as N/A.\n"
-        "Cell is red if ≥ Amp Spread Ratio threshold, green otherwise."
+    gb.configure_column(
+        "Amp Spread Ratio",
+        type=["numericColumn"],
+        valueFormatter="x.toFixed(2)",
+        headerTooltip=(
+            "ampSpreadRatio = (Max Drive Amps − Min Drive Amps) ÷ (Avg Drive Amps).\n"
+            "If Min Drive Amps = 0 → displayed as N/A.\n"
+            "Cell is red if ≥ Amp Spread Ratio threshold, green otherwise."
+        )
     )
-)
 
-gb.configure_column(
-    "Tubing-Casing Δ",
-    type=["numericColumn"],
-    valueFormatter="x.toFixed(2)",
-    headerTooltip=(
-        "Tubing-Casing Δ = Avg Tubing Pressure − Avg Casing Pressure.\n"
-        "Cell is red if ≤ Low Tub-Casing Δ threshold, green otherwise."
+    gb.configure_column(
+        "Tubing-Casing Δ",
+        type=["numericColumn"],
+        valueFormatter="x.toFixed(2)",
+        headerTooltip=(
+            "Tubing-Casing Δ = Avg Tubing Pressure − Avg Casing Pressure.\n"
+            "Cell is red if ≤ Low Tub-Casing Δ threshold, green otherwise."
+        )
     )
-)
-gb.configure_column(
-    "Pressure Difference",
-    type=["numericColumn"],
-    valueFormatter="x == null ? '' : x.toFixed(1)",
-    headerTooltip=(
-        "Pressure Difference = Avg Disch Pressure − Avg Intake Pressure."
-        "Cell is red if ≤ Pressure Difference threshold, green otherwise."
+    gb.configure_column(
+        "Pressure Difference",
+        type=["numericColumn"],
+        valueFormatter="x == null ? '' : x.toFixed(1)",
+        headerTooltip=(
+            "Pressure Difference = Avg Disch Pressure − Avg Intake Pressure."
+            "Cell is red if ≤ Pressure Difference threshold, green otherwise."
+        )
     )
-)
-# ---------- NEW: Frequency Spread Ratio --------------------------------
-gb.configure_column(
-    "Frequency Spread Ratio",
-    type=["numericColumn"],
-    valueFormatter="x == null ? '' : x.toFixed(2)",
-    headerTooltip=(
-        "Frequency Spread Ratio = (Max − Min) ÷ Avg Drive Frequency (unitless).\n"
-        "Cell is red if ≥ Frequency Spread Ratio threshold, green otherwise."
+    # ---------- NEW: Frequency Spread Ratio --------------------------------
+    gb.configure_column(
+        "Frequency Spread Ratio",
+        type=["numericColumn"],
+        valueFormatter="x == null ? '' : x.toFixed(2)",
+        headerTooltip=(
+            "Frequency Spread Ratio = (Max − Min) ÷ Avg Drive Frequency (unitless).\n"
+            "Cell is red if ≥ Frequency Spread Ratio threshold, green otherwise."
+        )
     )
-)
-gb.configure_column(
-    "NearUnderload Ratio",
-    type=["numericColumn"],
-    valueFormatter="x.toFixed(2)",
-    headerTooltip=(
-        "NearUnderload Ratio = Avg Drive Amps ÷ Motor Underload.\n"
-        "Cell is red if < Near-underload lower bound, green otherwise."
+    gb.configure_column(
+        "NearUnderload Ratio",
+        type=["numericColumn"],
+        valueFormatter="x.toFixed(2)",
+        headerTooltip=(
+            "NearUnderload Ratio = Avg Drive Amps ÷ Motor Underload.\n"
+            "Cell is red if < Near-underload lower bound, green otherwise."
+        )
     )
-)
 
-gb.configure_column(
-    "Normal_vs_Overload",
-    type=["textColumn"],
-    headerTooltip=(
-        "True if (Latest Normal Running Amps) ≥ (Latest Motor Overload), else False.\n"
-        "Displays a red “✗” if True, blank if False."
+    gb.configure_column(
+        "Normal_vs_Overload",
+        type=["textColumn"],
+        headerTooltip=(
+            "True if (Latest Normal Running Amps) ≥ (Latest Motor Overload), else False.\n"
+            "Displays a red “✗” if True, blank if False."
+        )
     )
-)
-gb.configure_column(
-    "MissingSensor",
-    type=["textColumn"],
-    headerTooltip=(
-        "True if Avg Motor Amps=0 or Avg Intake Pressure=0 or flat-line in either.\n"
-        "Displays a red “✗” if True, blank if False."
+    gb.configure_column(
+        "MissingSensor",
+        type=["textColumn"],
+        headerTooltip=(
+            "True if Avg Motor Amps=0 or Avg Intake Pressure=0 or flat-line in either.\n"
+            "Displays a red “✗” if True, blank if False."
+        )
     )
-)
-gb.configure_column(
-    "Fault Count",
-    type=["numericColumn"],
-    valueFormatter="x.toFixed(0)",
-    headerTooltip=(
-        "Fault Count = cumulative faults over lookback window.\n"
-        "Cell is red if ≥ High fault count threshold, green otherwise."
+    gb.configure_column(
+        "Fault Count",
+        type=["numericColumn"],
+        valueFormatter="x.toFixed(0)",
+        headerTooltip=(
+            "Fault Count = cumulative faults over lookback window.\n"
+            "Cell is red if ≥ High fault count threshold, green otherwise."
+        )
     )
-)
 
-gb.configure_column(
-    "Uptime %",
-    type=["numericColumn"],
-    valueFormatter="x == null ? '' : x.toFixed(1)",
-    headerTooltip=(
-        "Uptime % = mean uptime percentage over lookback window.\n"
-        "Cell is red if < Low uptime threshold, green otherwise."
+    gb.configure_column(
+        "Uptime %",
+        type=["numericColumn"],
+        valueFormatter="x == null ? '' : x.toFixed(1)",
+        headerTooltip=(
+            "Uptime % = mean uptime percentage over lookback window.\n"
+            "Cell is red if < Low uptime threshold, green otherwise."
+        )
     )
-)
 
-gb.configure_column(
-    "Drive Type",
-    type=["textColumn"],
-    headerTooltip="Drive Type (first value over lookback window)."
-)
-gb.configure_column(
-    "State Detail/Op Mode",
-    type=["textColumn"],
-    headerTooltip="State Detail/Op Mode (first value over lookback window)."
-)
-# ─── Hide the helper Boolean fields from the visible grid ───
-gb.configure_column("LowUptime_bool",       hide=True)
-gb.configure_column("HighVib_bool",         hide=True)
-gb.configure_column("SpreadFlag_bool",      hide=True)
-gb.configure_column("HighMotorTemp_bool",   hide=True)
-gb.configure_column("FaultHigh_bool",       hide=True)
-
-gb.configure_column("Speed_RunDays_OK",     hide=True)
-gb.configure_column("Speed_AvgIntake_OK",   hide=True)
-gb.configure_column("Speed_Drawdown_OK",    hide=True)
-gb.configure_column("Speed_OverloadOK",     hide=True)
-gb.configure_column("Speed_AtMaxOK",        hide=True)
-gb.configure_column("HighRunningDays_bool", hide=True)
-gb.configure_column("HighDowntime_bool",    hide=True)
-gb.configure_column("LowDeltaFlag_bool",    hide=True)
-
-gb.configure_grid_options(enableBrowserTooltips=True)
-gb.configure_default_column(resizable=True, minWidth=120)
-gb.configure_grid_options(domLayout='normal')
-gb.configure_columns(display_cols, cellStyle=js_color)
-grid_opts = gb.build()
+    gb.configure_column(
+        "Drive Type",
+        type=["textColumn"],
+        headerTooltip="Drive Type (first value over lookback window)."
+    )
+    gb.configure_column(
+        "State Detail/Op Mode",
+        type=["textColumn"],
+        headerTooltip="State Detail/Op Mode (first value over lookback window)."
+    )
+    # ─── Hide the helper Boolean fields from the visible grid ───
+    for c in hidden_cols:
+        gb.configure_column(c, hide=True)
+
+    # checkboxes on “Well Name” (+ select-all in its header) for “Trigger selected”
+    gb.configure_selection("multiple", use_checkbox=True, header_checkbox=True)
+
+    gb.configure_grid_options(enableBrowserTooltips=True)
+    gb.configure_default_column(resizable=True, minWidth=120)
+    gb.configure_grid_options(domLayout='normal')
+    # red/green status comes precomputed in StyleBits – no per-cell JS
+    for bit, (field, kind) in enumerate(style_kinds.items()):
+        flagged = f"(data.StyleBits & {1 << bit}) !== 0"
+        if kind == "bg":
+            rules = {"wr-red": flagged, "wr-green": f"!{flagged}"}
+        else:
+            rules = {f"wr-mark-{kind}": flagged}
+        gb.configure_column(field, cellClassRules=rules)
+    return gb.build()
+
+# AgGrid mutates the options it is given, so never pass the cached dict itself
+grid_opts = copy.deepcopy(build_grid_options(
+    df_show[display_cols].head(0), GRID_STYLE_KINDS, FLAG_NAMES,
+    display_cols, hidden_cols,
+    poor_true, poor_false, speed_true, speed_false,
+))
+
+# ───────────── Helper: table exports ─────────────
+EXPORT_JOBS_KEPT = 16   # finished exports kept server-wide, oldest dropped first
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """Content hash of a frame (values + column names) – the export cache key."""
+    h = hashlib.md5(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    h.update("|".join(map(str, df.columns)).encode())
+    return h.hexdigest()
+
+# display column → threshold key whose breach the PDF/Excel exports paint
+# red (green otherwise), mirroring the grid's "bg" columns
+EXPORT_THRESHOLD_COLS = {
+    "At_Max_Capacity":        "CapLoadPct",
+    "Overload_Risk":          "RiskPct",
+    "High Motor Temp":        "TempHigh",
+    "High Downtime":          "HighDT",
+    "Max Vibration":          "VibHigh",
+    "Pressure Difference":    "PressureDiff",
+    "Frequency Spread Ratio": "FreqSpread",
+    "Amp Spread Ratio":       "ampSpreadRatio",
+    "Tubing-Casing Δ":        "LowDelta",
+    "Fault Count":            "HighFaultCount",
+    "Uptime %":               "LowUptime",
+    "NearUnderload Ratio":    "NearUnderLower",
+}
+# ✗ / ✓ marker columns: (marker, "bad" → red text | "good" → green text)
+EXPORT_MARK_COLS = {
+    "PoorPerformance":    ("✗", "bad"),
+    "Normal_vs_Overload": ("✗", "bad"),
+    "MissingSensor":      ("✗", "bad"),
+    "SpeedUp":            ("✓", "good"),
+}
+
+def export_rules(thr: dict) -> dict:
+    """{display col: (op, threshold)} for the export colouring, ops as the flags use them."""
+    return {c: (threshold_metrics[k][1], thr[k]) for c, k in EXPORT_THRESHOLD_COLS.items()}
+
+def customer_report(customer: str, wells: pd.DataFrame, thr: dict, weights: dict, title: str):
+    """Report-pool task: flag + score one customer's wells with their own thresholds, then render."""
+    scored = well_engine.score_wells(wells, hist_days, thr, weights)
+    table  = display_frame(scored)[display_cols].sort_values("TerribleScore", ascending=False)
+    return well_reports.customer_report(customer, table, export_rules(thr), EXPORT_MARK_COLS, title)
+
+@st.cache_resource(show_spinner=False)
+def export_pool() -> ThreadPoolExecutor:
+    """Worker threads for exports, so rendering never blocks a script run."""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="export")
+
+@st.cache_resource(show_spinner=False)
+def report_pool() -> ThreadPoolExecutor:
+    """
+    Worker threads for report bundles, one customer per task. Threads rather
+    than processes: a spawned worker re-runs the main module, which under
+    Streamlit is this script.
+    """
+    return ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="report")
+
+@st.cache_resource(show_spinner=False)
+def export_jobs():
+    """Server-wide (kind, key) → Future map, plus the lock guarding it."""
+    return {}, threading.Lock()
+
+def export_job(kind: str, key: str):
+    """The export future for this table, or None if it was never requested."""
+    jobs, lock = export_jobs()
+    with lock:
+        return jobs.get((kind, key))
+
+def submit_export(kind: str, key: str, fn, *args):
+    """Start `fn(*args)` in the export pool unless this exact export already exists."""
+    jobs, lock = export_jobs()
+    with lock:
+        if (kind, key) not in jobs:
+            while len(jobs) >= EXPORT_JOBS_KEPT:
+                jobs.pop(next(iter(jobs)))
+            jobs[(kind, key)] = export_pool().submit(fn, *args)
+        return jobs[(kind, key)]
+
+def drop_export(kind: str, key: str):
+    jobs, lock = export_jobs()
+    with lock:
+        jobs.pop((kind, key), None)
 
 # ───────────── Page toggle ─────────────
 
@@ -1744,129 +1635,38 @@ grid_opts = gb.build()
 if page == "Customers":
     st.title("Customer Overview")
 
-    # map each well → its customer
-    df3["Customer"] = df3["Well Name"].map(well2cust)
-    df_show["Customer"] = df3["Customer"]
-    # ───────────── Precompute drive‐type counts per customer ─────────────
+    # ───────────── Slices of the rollup cube ─────────────
     drive_counts_df = (
-        df_show
-         .groupby(["Customer", "Drive Type"])
-         .size()
-         .reset_index(name="Count")
+        cube.groupby(["Customer", "Drive Type"])["Wells"]
+            .sum()
+            .reset_index(name="Count")
     )
     # Total across all customers
     overall_drive_counts = (
-        df_show
-        .groupby("Drive Type")
-        .size()
-        .reset_index(name="Count")
+        cube.groupby("Drive Type")["Wells"]
+            .sum()
+            .reset_index(name="Count")
     )
     with st.expander("Drive types chart", expanded=False):
         drive_df = overall_drive_counts.sort_values("Count", ascending=False)
         st.bar_chart(drive_df.set_index("Drive Type")["Count"])
 
-
-
-
-    # build your metrics, including per-customer well count
+    # per-customer well count + flag counts
     cust_metrics = (
-        df3.groupby("Customer")
-           .agg(
-               WellCount             = ("Well Name",       "count"),
-               PoorPerformance_count = ("PoorPerformance", "sum"),
-               SpeedUp_count         = ("SpeedUp",         "sum"),
-               HighMotorTemp_count   = ("HighMotorTemp",   "sum"),
-               MissingSensor_count   = ("MissingSensor",   "sum"),
-               ModemOffline_count    = ("ModemOffline",    "sum"),
-           )
-           .reset_index()
+        cube.groupby("Customer")
+            .agg(
+                WellCount             = ("Wells",           "sum"),
+                PoorPerformance_count = ("PoorPerformance", "sum"),
+                SpeedUp_count         = ("SpeedUp",         "sum"),
+                HighMotorTemp_count   = ("HighMotorTemp",   "sum"),
+                MissingSensor_count   = ("MissingSensor",   "sum"),
+                ModemOffline_count    = ("ModemOffline",    "sum"),
+            )
+            .reset_index()
     )
     cust_metrics = cust_metrics[cust_metrics["Customer"].str.strip() != ""]
 
 
-    # ───────────── Summary Metrics Row (Customer Overview) ─────────────
-    num_customers = cust_metrics["Customer"].nunique()
-    total_wells   = cust_metrics["WellCount"].sum()
-    total_poor    = int(cust_metrics["PoorPerformance_count"].sum())
-    total_speedup = int(cust_metrics["SpeedUp_count"].sum())
-    total_temp    = int(cust_metrics["HighMotorTemp_count"].sum())
-    total_missing = int(cust_metrics["MissingSensor_count"].sum())
-    total_modem = int((df3["ModemOffline"]).sum())
-
-    cols = st.columns([2, 1, 1, 1, 1, 1, 1])
-# ─── Customer-Summary card (click → show all customers in Dashboard) ──────────
-    with cols[0]:
-        # two‐line Markdown label
-        summary_label = "Customer Summary\n" + f"{num_customers} customers"
-        clicked = st.button(
-            summary_label,
-            key="card_summary",
-            help="Click to open the Dashboard with every customer",
-            use_container_width=True,
-        )
-
-        # style the <button> inside the <div data-testid="card_summary">
-        st.markdown("""
-        <style>
-            /* target the wrapper-div by your key, then its inner <button> */
-            div[data-testid="card_summary"] button {
-                background-color: #002062 !important;   /* blue bg */
-                color:           #f4bb2a !important;   /* gold text */
-                border: none !important;
-                border-radius: 8px !important;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.15) !important;
-
-                /* same height as your metric cards */
-                height: 80px !important;
-                width:  100% !important;
-
-                /* stack & center the two lines */
-                display:        flex !important;
-                flex-direction: column !important;
-                justify-content: center !important;
-                align-items:     center !important;
-
-                padding: 0 !important;  /* rely on height */
-            }
-
-            /* “Customer Summary” line */
-            div[data-testid="card_summary"] button > div:first-child {
-                font-size: 18px !important;
-                font-weight: 600 !important;
-                line-height: 1 !important;
-            }
-            /* “XX customers” line */
-            div[data-testid="card_summary"] button > div:last-child {
-                font-size: 14px !important;
-                margin-top: 4px !important;
-            }
-            </style>
-            """, unsafe_allow_html=True)
-
-        if clicked:
-            st.session_state.selected_customer = None
-            st.session_state.view_page = "Dashboard"
-            st.rerun()
-
-
-    # Total Wells card
-    with cols[1]:
-        st.markdown(f"""
-            <div style="
-                background-color:#002062;
-                color:#f4bb2a;
-                padding:12px;
-                border-radius:8px;
-                box-shadow:0 2px 4px rgba(0,0,0,0.15);
-                text-align:center;
-            ">
-            <h2 style="margin:0;">Total Wells</h2>
-            <p style="margin:4px 0 0; font-size:16px;">
-                <strong>{total_wells}</strong>
-            </p>
-            </div>
-        """, unsafe_allow_html=True)
-
     # helper to render your flag cards
     def render_flag_card(col, title, value, light_bg, dark_bg, light_txt, dark_txt):
         style = (
@@ -1892,156 +1692,292 @@ if page == "Customers":
                 </div>
             """, unsafe_allow_html=True)
 
-    # Summary flag cards
-    render_flag_card(cols[2], "Poor Performance", total_poor,
-                     "#FDE0E0", "#8B0000", "#B00000", "#FFFFFF")
-    render_flag_card(cols[3], "Speed Up", total_speedup,
-                     "#E0FDE0", "#006400", "#006400", "#FFFFFF")
-    render_flag_card(cols[4], "High Motor Temp", total_temp,
-                     "#FFF1E0", "#CC8400", "#CC6600", "#FFFFFF")
-    render_flag_card(cols[5], "Missing Sensor", total_missing,
-                     "#F0E0FD", "#6A0080", "#8000CC", "#FFFFFF")
-    render_flag_card(cols[6],"Modem Offline",total_modem,
-                     "#E0E0E0","#444444","#000000", "#FFFFFF")
-    # ───── Render custom cards ─────
-    custom = settings.get(current_key, {}).get("custom_cards", [])
-    if custom:
-        # up to 5 cards in the same layout
-        cols_custom = st.columns([2] + [1] * min(len(custom), 5))
-        for idx, card in enumerate(custom[:5]):
-            with cols_custom[idx + 2]:
-                # build & combine each condition
-                mask = None
-                for cond in card["conditions"]:
-                    f, o, v = cond["field"], cond["op"], cond["value"]
-                    if   o == ">": m = df3[f] >  v
-                    elif o == "<": m = df3[f] <  v
-                    else:           m = df3[f] == v
-
-                    if mask is None:
-                        mask = m
-                    else:
-                        if card.get("combiner","AND") == "AND":
-                            mask = mask & m
-                        else:
-                            mask = mask | m
-
-                count = int(mask.sum())
-                bg    = card["color"] + "33"
-                txt   = card["color"]
+    @st.fragment
+    def customer_summary_cards(cust_metrics: pd.DataFrame, df3: pd.DataFrame):
+        """Fleet totals row + custom cards above the per-customer list."""
+        with perf_timer("summary_cards"):
+            # ───────────── Summary Metrics Row (Customer Overview) ─────────────
+            num_customers = cust_metrics["Customer"].nunique()
+            total_wells   = cust_metrics["WellCount"].sum()
+            total_poor    = int(cust_metrics["PoorPerformance_count"].sum())
+            total_speedup = int(cust_metrics["SpeedUp_count"].sum())
+            total_temp    = int(cust_metrics["HighMotorTemp_count"].sum())
+            total_missing = int(cust_metrics["MissingSensor_count"].sum())
+            total_modem   = int(cust_metrics["ModemOffline_count"].sum())
+
+            cols = st.columns([2, 1, 1, 1, 1, 1, 1])
+            # ─── Customer-Summary card (click → show all customers in Dashboard) ──────────
+            with cols[0]:
+                # two‐line Markdown label
+                summary_label = "Customer Summary\n" + f"{num_customers} customers"
+                clicked = st.button(
+                    summary_label,
+                    key="card_summary",
+                    help="Click to open the Dashboard with every customer",
+                    use_container_width=True,
+                )
+
+                # style the <button> inside the <div data-testid="card_summary">
+                st.markdown("""
+                <style>
+                    /* target the wrapper-div by your key, then its inner <button> */
+                    div[data-testid="card_summary"] button {
+                        background-color: #002062 !important;   /* blue bg */
+                        color:           #f4bb2a !important;   /* gold text */
+                        border: none !important;
+                        border-radius: 8px !important;
+                        box-shadow: 0 2px 4px rgba(0,0,0,0.15) !important;
+
+                        /* same height as your metric cards */
+                        height: 80px !important;
+                        width:  100% !important;
+
+                        /* stack & center the two lines */
+                        display:        flex !important;
+                        flex-direction: column !important;
+                        justify-content: center !important;
+                        align-items:     center !important;
+
+                        padding: 0 !important;  /* rely on height */
+                    }
+
+                    /* “Customer Summary” line */
+                    div[data-testid="card_summary"] button > div:first-child {
+                        font-size: 18px !important;
+                        font-weight: 600 !important;
+                        line-height: 1 !important;
+                    }
+                    /* “XX customers” line */
+                    div[data-testid="card_summary"] button > div:last-child {
+                        font-size: 14px !important;
+                        margin-top: 4px !important;
+                    }
+                    </style>
+                    """, unsafe_allow_html=True)
+
+                if clicked:
+                    st.session_state.selected_customer = None
+                    st.session_state.view_page = "Dashboard"
+                    st.rerun()
+
+
+            # Total Wells card
+            with cols[1]:
                 st.markdown(f"""
                     <div style="
-                        background-color:{bg};
-                        color:{txt};
+                        background-color:#002062;
+                        color:#f4bb2a;
                         padding:12px;
                         border-radius:8px;
-                        text-align:center;
                         box-shadow:0 2px 4px rgba(0,0,0,0.15);
+                        text-align:center;
                     ">
-                      <div style="font-size:14px;font-weight:600;">
-                        {card['label']}
-                      </div>
-                      <div style="font-size:24px;font-weight:bold;">
-                        {count}
-                      </div>
+                    <h2 style="margin:0;">Total Wells</h2>
+                    <p style="margin:4px 0 0; font-size:16px;">
+                        <strong>{total_wells}</strong>
+                    </p>
                     </div>
                 """, unsafe_allow_html=True)
 
+            # Summary flag cards
+            render_flag_card(cols[2], "Poor Performance", total_poor,
+                             "#FDE0E0", "#8B0000", "#B00000", "#FFFFFF")
+            render_flag_card(cols[3], "Speed Up", total_speedup,
+                             "#E0FDE0", "#006400", "#006400", "#FFFFFF")
+            render_flag_card(cols[4], "High Motor Temp", total_temp,
+                             "#FFF1E0", "#CC8400", "#CC6600", "#FFFFFF")
+            render_flag_card(cols[5], "Missing Sensor", total_missing,
+                             "#F0E0FD", "#6A0080", "#8000CC", "#FFFFFF")
+            render_flag_card(cols[6],"Modem Offline",total_modem,
+                             "#E0E0E0","#444444","#000000", "#FFFFFF")
+            # ───── Render custom cards ─────
+            custom = settings.get(current_key, {}).get("custom_cards", [])
+            if custom:
+                # up to 5 cards in the same layout
+                cols_custom = st.columns([2] + [1] * min(len(custom), 5))
+                for idx, card in enumerate(custom[:5]):
+                    with cols_custom[idx + 1]:
+                        # build & combine each condition
+                        mask = None
+                        for cond in card["conditions"]:
+                            f, o, v = cond["field"], cond["op"], cond["value"]
+                            if   o == ">": m = df3[f] >  v
+                            elif o == "<": m = df3[f] <  v
+                            else:           m = df3[f] == v
+
+                            if mask is None:
+                                mask = m
+                            else:
+                                if card.get("combiner","AND") == "AND":
+                                    mask = mask & m
+                                else:
+                                    mask = mask | m
+
+                        count = int(mask.sum())
+                        bg    = card["color"] + "33"
+                        txt   = card["color"]
+                        st.markdown(f"""
+                            <div style="
+                                background-color:{bg};
+                                color:{txt};
+                                padding:12px;
+                                border-radius:8px;
+                                text-align:center;
+                                box-shadow:0 2px 4px rgba(0,0,0,0.15);
+                            ">
+                              <div style="font-size:14px;font-weight:600;">
+                                {card['label']}
+                              </div>
+                              <div style="font-size:24px;font-weight:bold;">
+                                {count}
+                              </div>
+                            </div>
+                        """, unsafe_allow_html=True)
+
+    customer_summary_cards(cust_metrics, df3)
+
     st.markdown("---")
-    # ───────────── Per‐Customer Row Cards ─────────────
-    for i, row in cust_metrics.iterrows():
-        cust_name = row["Customer"]
-        c0, c1, c2, c3, c4, c5, c6 = st.columns([2,1,1,1,1,1,1])
-        with c0:
-            cust_label = f"**{cust_name}**"
-            clicked = st.button(
-                cust_label,
-                key=f"cust_card_{i}",
-                help=f"Open dashboard for {cust_name}",
-                use_container_width=True,
+    # ───────────── Per‐Customer table (search + paging) ─────────────
+    CUST_TABLE_COLS = {
+        "Customer":              "Customer",
+        "WellCount":             "Wells",
+        "PoorPerformance_count": "Poor Performance",
+        "SpeedUp_count":         "Speed Up",
+        "HighMotorTemp_count":   "High Motor Temp",
+        "MissingSensor_count":   "Missing Sensor",
+        "ModemOffline_count":    "Modem Offline",
+    }
+    # same palette as the flag cards: (light bg, dark bg)
+    CUST_TABLE_COLORS = {
+        "Poor Performance": ("#FDE0E0", "#8B0000"),
+        "Speed Up":         ("#E0FDE0", "#006400"),
+        "High Motor Temp":  ("#FFF1E0", "#CC8400"),
+        "Missing Sensor":   ("#F0E0FD", "#6A0080"),
+        "Modem Offline":    ("#E0E0E0", "#444444"),
+    }
+
+    @st.fragment
+    def customer_table(cust_metrics: pd.DataFrame, drive_counts_df: pd.DataFrame):
+        """
+        One dataframe for every customer instead of a row of widgets each,
+        so render time stays flat with the customer count. Search and
+        paging rerun only this fragment; picking a row opens its Dashboard.
+        """
+        with perf_timer("customer_table"):
+            drive_txt = (
+                drive_counts_df
+                .assign(txt=drive_counts_df["Drive Type"].astype(str) + ": "
+                            + drive_counts_df["Count"].astype(str))
+                .groupby("Customer")["txt"].agg(", ".join)
+            )
+            table = cust_metrics[list(CUST_TABLE_COLS)].rename(columns=CUST_TABLE_COLS)
+            table["Drive Types"] = table["Customer"].map(drive_txt).fillna("")
+            table["Custom Settings"] = table["Customer"].isin(
+                [k for k in settings if k != "DEFAULT"]
             )
-            st.markdown(f"""
-            <style>
-            /* inner button of this particular card */
-            div[data-testid="cust_card_{i}"] button {{
-                background-color: #002062 !important;
-                color:           #f4bb2a !important;
-                border: none !important;
-                border-radius: 8px !important;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.15) !important;
-
-                height: 80px !important;
-                width:  100% !important;
-                display:        flex !important;
-                justify-content: center !important;
-                align-items:     center !important;
-                padding: 0 !important;
-            }}
-            div[data-testid="cust_card_{i}"] button > div:first-child {{
-                font-size: 18px !important;
-                font-weight: 600 !important;
-            }}
-            </style>
-            """, unsafe_allow_html=True)
 
-            if clicked:
-                st.session_state.selected_customer = cust_name
+            c_search, c_size, c_page = st.columns([3, 1, 1])
+            query = c_search.text_input("Search customers", key="cust_search",
+                                        placeholder="Customer or drive type")
+            if query:
+                hit = (table["Customer"].str.contains(query, case=False, regex=False)
+                       | table["Drive Types"].str.contains(query, case=False, regex=False))
+                table = table[hit]
+            page_size = c_size.selectbox("Rows per page", [25, 50, 100], key="cust_page_size")
+            n_pages = max(1, -(-len(table) // page_size))
+            # unkeyed on purpose: a new page count (search, page size) resets to page 1
+            page_no = c_page.number_input(f"Page (of {n_pages})", 1, n_pages, 1)
+            shown = table.iloc[(page_no - 1) * page_size: page_no * page_size].reset_index(drop=True)
+
+            def shade(v, light, dark):
+                return f"background-color:{dark if night_mode else light}" if v > 0 else ""
+            styled = shown.style
+            for c, (light, dark) in CUST_TABLE_COLORS.items():
+                styled = styled.map(shade, subset=[c], light=light, dark=dark)
+
+            event = st.dataframe(
+                styled,
+                hide_index=True,
+                use_container_width=True,
+                on_select="rerun",
+                selection_mode="single-row",
+                key="cust_table",
+                column_config={
+                    "Custom Settings": st.column_config.CheckboxColumn("⚙️ Custom", width="small"),
+                },
+            )
+            st.caption(f"{len(table)} of {len(cust_metrics)} customers · select a row to open its dashboard")
+            if event.selection.rows:
+                st.session_state.selected_customer = shown.iloc[event.selection.rows[0]]["Customer"]
                 st.session_state.view_page        = "Dashboard"
                 st.rerun()
-            # ───── CUSTOM SETTINGS NOTICE & RESET — side-by-side ─────
-            if cust_name in settings and cust_name != "DEFAULT":
-                with st.container():
-                    col_notice, col_button = st.columns([3, 2])
-                    with col_notice:
-                        st.markdown(
-                            "<span style='color:#cc0000; font-weight:600;'>"
-                            "⚙️ Custom settings in use. Reset to default?"
-                            "</span>",
-                            unsafe_allow_html=True
-                        )
-                    with col_button:
-                        with st.form(key=f"reset_form_{i}", clear_on_submit=True):
-                            submit = st.form_submit_button("Reset to default settings")
-                            if submit:
-                                settings.pop(cust_name, None)
-                                SETTINGS_FILE.write_text(json.dumps(settings, indent=2))
-                                st.success(f"Settings for {cust_name} reset to default.")
-                                st.rerun()
-            # ───── DRIVE TYPE COUNTS ─────
-            cust_drives = drive_counts_df[drive_counts_df["Customer"] == cust_name]
-            if not cust_drives.empty:
-                st.markdown("**Drive types:**")
-                for _, dc in cust_drives.iterrows():
-                    st.markdown(f"- {dc['Drive Type']}: {dc['Count']}")
-
-
-        
-        # 2) Wells‐count card
-        with c1:
-            st.markdown(f"""
-                <div style="
-                    background-color:#002062;
-                    color:#f4bb2a;
-                    padding:12px;
-                    border-radius:8px;
-                    box-shadow:0 2px 4px rgba(0,0,0,0.15);
-                    text-align:center;
-                ">
-                <h2 style="margin:0;">{row["WellCount"]}</h2>
-                </div>
-            """, unsafe_allow_html=True)
-        # 3–6) Flags for each customer
-        render_flag_card(c2, "Poor Performance", int(row["PoorPerformance_count"]),
-                         "#FDE0E0", "#8B0000", "#B00000", "#FFFFFF")
-        render_flag_card(c3, "Speed Up", int(row["SpeedUp_count"]),
-                         "#E0FDE0", "#006400", "#006400", "#FFFFFF")
-        render_flag_card(c4, "High Motor Temp", int(row["HighMotorTemp_count"]),
-                         "#FFF1E0", "#CC8400", "#CC6600", "#FFFFFF")
-        render_flag_card(c5, "Missing Sensor", int(row["MissingSensor_count"]),
-                         "#F0E0FD", "#6A0080", "#8000CC", "#FFFFFF")
-        render_flag_card(c6,"Modem Offline",int(row["ModemOffline_count"]),
-                     "#E0E0E0","#444444","#000000", "#FFFFFF")
-        
+
+            # ───── CUSTOM SETTINGS RESET ─────
+            customised = [c for c in cust_metrics["Customer"] if c in settings and c != "DEFAULT"]
+            if customised:
+                col_pick, col_button = st.columns([3, 2])
+                reset_cust = col_pick.selectbox("⚙️ Customers with custom settings", customised)
+                if col_button.button("Reset to default settings", key="cust_reset"):
+                    # this table was rendered from `settings`, so that is the version being reset
+                    if save_settings(reset_cust, lambda _: None, well_settings.entry_digest(settings.get(reset_cust)),
+                                     where=st):
+                        st.rerun()
+
+    customer_table(cust_metrics, drive_counts_df)
+
+    # ───────────── Report bundle (all/selected customers → zip) ─────────────
+    @st.fragment(run_every=1)
+    def report_bundle_progress():
+        """
+        Progress of this session's bundle while customers are rendering. Once
+        they all are, one rerun lets report_bundle zip them and show the
+        download; this fragment isn't drawn again, so the timer stops.
+        """
+        job = st.session_state.report_job
+        done, total = sum(f.done() for f in job["parts"]), len(job["parts"])
+        if done == total:
+            st.rerun()
+        st.progress(done / max(total, 1), text=f"{done} / {total} customers rendered")
+
+    @st.fragment
+    def report_bundle(customers: list):
+        """Queue per-customer PDF + Excel reports (each with its saved thresholds) on the report pool."""
+        with st.expander("📦 Report bundle – PDF + Excel per customer", expanded=False):
+            picked = st.multiselect("Customers", customers, default=customers, key="bundle_customers")
+            job = st.session_state.get("report_job")
+            if (job is not None and job["zip"] is None and job["error"] is None
+                    and all(f.done() for f in job["parts"])):
+                # zipped here, not in a pool: a pool task waiting on its own pool's parts can deadlock
+                try:
+                    job["zip"] = well_reports.zip_reports(job["parts"], str(today))
+                except Exception as e:
+                    job["error"] = e
+            busy = job is not None and job["zip"] is None and job["error"] is None
+            if st.button("Build bundle", disabled=busy or not picked):
+                parts = [
+                    report_pool().submit(
+                        customer_report, c, df3.take(cust_rows[c]),
+                        *well_engine.thresholds_for(settings, c),
+                        f"{c} – Daily Well Report {today}",
+                    )
+                    for c in picked if c in cust_rows
+                ]
+                job = st.session_state.report_job = {"parts": parts, "zip": None, "error": None}
+            if job is None:
+                return
+            if job["error"] is not None:
+                st.error(f"❌ Report bundle failed: {job['error']}")
+            elif job["zip"] is not None:
+                st.download_button(
+                    "📥 Download report bundle (.zip)",
+                    data=job["zip"],
+                    file_name=f"well_reports_{today}.zip",
+                    mime="application/zip",
+                )
+            else:
+                report_bundle_progress()
+
+    report_bundle(cust_metrics["Customer"].tolist())
 
     st.stop()
 
@@ -2054,311 +1990,361 @@ if page == "Dashboard":
         # if a customer has been picked, only keep that subset
     cust = st.session_state.selected_customer
     if cust:
-        # ensure df3 has a Customer column
-        df3 = df3.copy()
-        df3["Customer"] = df3["Well Name"].map(well2cust)
-        df3 = df3[df3["Customer"] == cust]
-
-        # same for the AG-grid display frame
-        df_show = df_show.copy()
-        df_show["Customer"] = df_show["Well Name"].map(well2cust)
-        df_show = df_show[df_show["Customer"] == cust]
-
-    # 1) compute the four counts from df3:
-    poor_count      = int(df3["PoorPerformance"].sum())
-    speedup_count   = int(df3["SpeedUp"].sum())
-    hightemp_count  = int(df3["HighMotorTemp"].sum())
-    missing_count   = int(df3["MissingSensor"].sum())
-    modem_offline_count = int(df3["ModemOffline"].sum())
-
-    # 2) Create a row of 5 columns: one big for title/text, and four small for cards
-    col_title, col_poor, col_speedup, col_ht, col_miss, col_modem = st.columns([4,1,1,1,1,1])
-
-    # 2a) Title + “Loaded X wells” goes in the first column
-    with col_title:
-
-        # Dashboard title (per-customer or all)
-        cust = st.session_state.selected_customer
-        title_text = (
-            f"{cust} Daily Well-Performance Dashboard"
-            if cust else
-            "Daily Well-Performance Dashboard"
-        )
-        st.markdown(
-            f"<h1 style='margin:0; text-align:center; "
-            f"color:{'#ffffff' if night_mode else '#000000'};'>"
-            f"{title_text}</h1>",
-            unsafe_allow_html=True,
-        )
-        # “Loaded X wells from …” text
-        date_range = (
-            f"{min(last_dates)}"
-            if hist_days == 1
-            else f"{min(last_dates)} → {max(last_dates)}"
-        )
-        st.markdown(
-            f"<p style='margin:0; font-size:14px; "
-            f"color: {'#e0e0e0' if night_mode else '#333'};'>"
-            f"Loaded <strong>{len(df3)}</strong> wells from {hist_days} day"
-            f"{'s' if hist_days>1 else ''} ({date_range})</p>",
-            unsafe_allow_html=True,
-        )
-
-    # 2b) Four cards, one per metric:
-
-    # PoorPerformance (red)
-    light_bg, dark_bg = "#FDE0E0", "#8B0000"
-    light_txt, dark_txt = "#B00000", "#FFFFFF"
-    with col_poor:
-        card_style = (
-            f"background-color: {dark_bg}; color: {dark_txt};"
-            if night_mode else
-            f"background-color: {light_bg}; color: {light_txt};"
-        )
-        st.markdown(
-            f"""
-            <div style="
-                {card_style}
-                padding: 12px;
-                border-radius: 8px;
-                text-align: center;
-                box-shadow: 0px 2px 4px rgba(0,0,0,0.15);
-            ">
-                <div style="font-size:14px; font-weight:600; margin-bottom:4px;">
-                    Poor Performance
-                </div>
-                <div style="font-size:24px; font-weight:bold;">
-                    {poor_count}
-                </div>
-            </div>
-            """,
-            unsafe_allow_html=True,
-        )
-
-    # SpeedUp (green)
-    light_bg, dark_bg = "#E0FDE0", "#006400"
-    light_txt, dark_txt = "#006400", "#FFFFFF"
-    with col_speedup:
-        card_style = (
-            f"background-color: {dark_bg}; color: {dark_txt};"
-            if night_mode else
-            f"background-color: {light_bg}; color: {light_txt};"
-        )
-        st.markdown(
-            f"""
-            <div style="
-                {card_style}
-                padding: 12px;
-                border-radius: 8px;
-                text-align: center;
-                box-shadow: 0px 2px 4px rgba(0,0,0,0.15);
-            ">
-                <div style="font-size:14px; font-weight:600; margin-bottom:4px;">
-                    Speed Up
-                </div>
-                <div style="font-size:24px; font-weight:bold;">
-                    {speedup_count}
-                </div>
-            </div>
-            """,
-            unsafe_allow_html=True,
-        )
+        # positional take of the precomputed partition – no fleet-wide mask/copy
+        rows    = cust_rows.get(cust, np.empty(0, dtype=np.intp))
+        df3     = df3.take(rows)
+        df_show = df_show.take(rows)
+        cube    = cube[cube["Customer"] == cust]
+
+    @st.fragment
+    def dashboard_cards(df3: pd.DataFrame, cube: pd.DataFrame):
+        """Flag count cards + custom cards for the wells in view."""
+        with perf_timer("dashboard_cards"):
+            # 1) flag counts straight from the (customer-sliced) rollup cube
+            poor_count      = int(cube["PoorPerformance"].sum())
+            speedup_count   = int(cube["SpeedUp"].sum())
+            hightemp_count  = int(cube["HighMotorTemp"].sum())
+            missing_count   = int(cube["MissingSensor"].sum())
+            modem_offline_count = int(cube["ModemOffline"].sum())
+
+            # 2) Create a row of 5 columns: one big for title/text, and four small for cards
+            col_title, col_poor, col_speedup, col_ht, col_miss, col_modem = st.columns([4,1,1,1,1,1])
+
+            # 2a) Title + “Loaded X wells” goes in the first column
+            with col_title:
+
+                # Dashboard title (per-customer or all)
+                cust = st.session_state.selected_customer
+                title_text = (
+                    f"{cust} Daily Well-Performance Dashboard"
+                    if cust else
+                    "Daily Well-Performance Dashboard"
+                )
+                st.markdown(
+                    f"<h1 style='margin:0; text-align:center; "
+                    f"color:{'#ffffff' if night_mode else '#000000'};'>"
+                    f"{title_text}</h1>",
+                    unsafe_allow_html=True,
+                )
+                # “Loaded X wells from …” text
+                date_range = (
+                    f"{min(last_dates)}"
+                    if hist_days == 1
+                    else f"{min(last_dates)} → {max(last_dates)}"
+                )
+                st.markdown(
+                    f"<p style='margin:0; font-size:14px; "
+                    f"color: {'#e0e0e0' if night_mode else '#333'};'>"
+                    f"Loaded <strong>{len(df3)}</strong> wells from {hist_days} day"
+                    f"{'s' if hist_days>1 else ''} ({date_range})</p>",
+                    unsafe_allow_html=True,
+                )
 
-    # HighMotorTemp (orange)
-    light_bg, dark_bg = "#FFF1E0", "#CC8400"
-    light_txt, dark_txt = "#CC6600", "#FFFFFF"
-    with col_ht:
-        card_style = (
-            f"background-color: {dark_bg}; color: {dark_txt};"
-            if night_mode else
-            f"background-color: {light_bg}; color: {light_txt};"
-        )
-        st.markdown(
-            f"""
-            <div style="
-                {card_style}
-                padding: 12px;
-                border-radius: 8px;
-                text-align: center;
-                box-shadow: 0px 2px 4px rgba(0,0,0,0.15);
-            ">
-                <div style="font-size:14px; font-weight:600; margin-bottom:4px;">
-                    High Motor Temp
-                </div>
-                <div style="font-size:24px; font-weight:bold;">
-                    {hightemp_count}
-                </div>
-            </div>
-            """,
-            unsafe_allow_html=True,
-        )
+            # 2b) Four cards, one per metric:
 
-    # MissingSensor (purple)
-    light_bg, dark_bg = "#F0E0FD", "#6A0080"
-    light_txt, dark_txt = "#8000CC", "#FFFFFF"
-    with col_miss:
-        card_style = (
-            f"background-color: {dark_bg}; color: {dark_txt};"
-            if night_mode else
-            f"background-color: {light_bg}; color: {light_txt};"
-        )
-        st.markdown(
-            f"""
-            <div style="
-                {card_style}
-                padding: 12px;
-                border-radius: 8px;
-                text-align: center;
-                box-shadow: 0px 2px 4px rgba(0,0,0,0.15);
-            ">
-                <div style="font-size:14px; font-weight:600; margin-bottom:4px;">
-                    Missing Sensor
-                </div>
-                <div style="font-size:24px; font-weight:bold;">
-                    {missing_count}
-                </div>
-            </div>
-            """,
-            unsafe_allow_html=True,
-        )
-    # ─── Modem Offline ─────────────────────────────────────────
-    light_bg, dark_bg = "#E0E0E0", "#444444"
-    light_txt, dark_txt = "#000000", "#FFFFFF"
-    with col_modem:
-        card_style = (
-            f"background-color: {dark_bg}; color: {dark_txt};"
-            if night_mode else
-            f"background-color: {light_bg}; color: {light_txt};"
-        )
-        st.markdown(
-            f"""
-            <div style="
-                {card_style}
-                padding: 12px;
-                border-radius: 8px;
-                text-align: center;
-                box-shadow: 0px 2px 4px rgba(0,0,0,0.15);
-            ">
-                <div style="font-size:14px; font-weight:600; margin-bottom:4px;">
-                    Missing Sensor
-                </div>
-                <div style="font-size:24px; font-weight:bold;">
-                    {modem_offline_count}
-                </div>
-            </div>
-            """,
-            unsafe_allow_html=True,
-        )
-
-    # ───── Render custom cards ─────
-    custom = settings.get(current_key, {}).get("custom_cards", [])
-    if custom:
-        # up to 5 cards, blank spacer to align under “Poor Performance”
-        num_cards   = min(len(custom), 5)
-        cols_custom = st.columns([4] + [1] * num_cards)
-
-        for idx, card in enumerate(custom[:num_cards]):
-            # make sure we have a list of conditions
-            if "conditions" not in card:
-                continue  # skip any malformed entries
-            with cols_custom[idx + 1]:
-                mask = None
-                for cond in card["conditions"]:
-                    f, o, v = cond["field"], cond["op"], cond["value"]
-                    if   o == ">": m = df3[f] >  v
-                    elif o == "<": m = df3[f] <  v
-                    else         : m = df3[f] == v
-
-                    mask = m if mask is None else (
-                        (mask & m) if card.get("combiner","AND")=="AND" else (mask | m)
-                    )
+            # PoorPerformance (red)
+            light_bg, dark_bg = "#FDE0E0", "#8B0000"
+            light_txt, dark_txt = "#B00000", "#FFFFFF"
+            with col_poor:
+                card_style = (
+                    f"background-color: {dark_bg}; color: {dark_txt};"
+                    if night_mode else
+                    f"background-color: {light_bg}; color: {light_txt};"
+                )
+                st.markdown(
+                    f"""
+                    <div style="
+                        {card_style}
+                        padding: 12px;
+                        border-radius: 8px;
+                        text-align: center;
+                        box-shadow: 0px 2px 4px rgba(0,0,0,0.15);
+                    ">
+                        <div style="font-size:14px; font-weight:600; margin-bottom:4px;">
+                            Poor Performance
+                        </div>
+                        <div style="font-size:24px; font-weight:bold;">
+                            {poor_count}
+                        </div>
+                    </div>
+                    """,
+                    unsafe_allow_html=True,
+                )
 
-                count = int(mask.sum()) if mask is not None else 0
-                bg, txt = card["color"] + "33", card["color"]
+            # SpeedUp (green)
+            light_bg, dark_bg = "#E0FDE0", "#006400"
+            light_txt, dark_txt = "#006400", "#FFFFFF"
+            with col_speedup:
+                card_style = (
+                    f"background-color: {dark_bg}; color: {dark_txt};"
+                    if night_mode else
+                    f"background-color: {light_bg}; color: {light_txt};"
+                )
+                st.markdown(
+                    f"""
+                    <div style="
+                        {card_style}
+                        padding: 12px;
+                        border-radius: 8px;
+                        text-align: center;
+                        box-shadow: 0px 2px 4px rgba(0,0,0,0.15);
+                    ">
+                        <div style="font-size:14px; font-weight:600; margin-bottom:4px;">
+                            Speed Up
+                        </div>
+                        <div style="font-size:24px; font-weight:bold;">
+                            {speedup_count}
+                        </div>
+                    </div>
+                    """,
+                    unsafe_allow_html=True,
+                )
 
-                st.markdown(f"""
+            # HighMotorTemp (orange)
+            light_bg, dark_bg = "#FFF1E0", "#CC8400"
+            light_txt, dark_txt = "#CC6600", "#FFFFFF"
+            with col_ht:
+                card_style = (
+                    f"background-color: {dark_bg}; color: {dark_txt};"
+                    if night_mode else
+                    f"background-color: {light_bg}; color: {light_txt};"
+                )
+                st.markdown(
+                    f"""
                     <div style="
-                        background-color:{bg};
-                        color:{txt};
-                        padding:12px;
-                        border-radius:8px;
-                        text-align:center;
-                        box-shadow:0 2px 4px rgba(0,0,0,0.15);
+                        {card_style}
+                        padding: 12px;
+                        border-radius: 8px;
+                        text-align: center;
+                        box-shadow: 0px 2px 4px rgba(0,0,0,0.15);
                     ">
-                    <div style="font-size:14px;font-weight:600;">
-                        {card['label']}
+                        <div style="font-size:14px; font-weight:600; margin-bottom:4px;">
+                            High Motor Temp
+                        </div>
+                        <div style="font-size:24px; font-weight:bold;">
+                            {hightemp_count}
+                        </div>
                     </div>
-                    <div style="font-size:24px;font-weight:bold;">
-                        {count}
+                    """,
+                    unsafe_allow_html=True,
+                )
+
+            # MissingSensor (purple)
+            light_bg, dark_bg = "#F0E0FD", "#6A0080"
+            light_txt, dark_txt = "#8000CC", "#FFFFFF"
+            with col_miss:
+                card_style = (
+                    f"background-color: {dark_bg}; color: {dark_txt};"
+                    if night_mode else
+                    f"background-color: {light_bg}; color: {light_txt};"
+                )
+                st.markdown(
+                    f"""
+                    <div style="
+                        {card_style}
+                        padding: 12px;
+                        border-radius: 8px;
+                        text-align: center;
+                        box-shadow: 0px 2px 4px rgba(0,0,0,0.15);
+                    ">
+                        <div style="font-size:14px; font-weight:600; margin-bottom:4px;">
+                            Missing Sensor
+                        </div>
+                        <div style="font-size:24px; font-weight:bold;">
+                            {missing_count}
+                        </div>
                     </div>
+                    """,
+                    unsafe_allow_html=True,
+                )
+            # ─── Modem Offline ─────────────────────────────────────────
+            light_bg, dark_bg = "#E0E0E0", "#444444"
+            light_txt, dark_txt = "#000000", "#FFFFFF"
+            with col_modem:
+                card_style = (
+                    f"background-color: {dark_bg}; color: {dark_txt};"
+                    if night_mode else
+                    f"background-color: {light_bg}; color: {light_txt};"
+                )
+                st.markdown(
+                    f"""
+                    <div style="
+                        {card_style}
+                        padding: 12px;
+                        border-radius: 8px;
+                        text-align: center;
+                        box-shadow: 0px 2px 4px rgba(0,0,0,0.15);
+                    ">
+                        <div style="font-size:14px; font-weight:600; margin-bottom:4px;">
+                            Modem Offline
+                        </div>
+                        <div style="font-size:24px; font-weight:bold;">
+                            {modem_offline_count}
+                        </div>
                     </div>
-                """, unsafe_allow_html=True)
+                    """,
+                    unsafe_allow_html=True,
+                )
 
-    st.markdown("---")
+            # ───── Render custom cards ─────
+            custom = settings.get(current_key, {}).get("custom_cards", [])
+            if custom:
+                # up to 5 cards, blank spacer to align under “Poor Performance”
+                num_cards   = min(len(custom), 5)
+                cols_custom = st.columns([4] + [1] * num_cards)
+
+                for idx, card in enumerate(custom[:num_cards]):
+                    # make sure we have a list of conditions
+                    if "conditions" not in card:
+                        continue  # skip any malformed entries
+                    with cols_custom[idx + 1]:
+                        mask = None
+                        for cond in card["conditions"]:
+                            f, o, v = cond["field"], cond["op"], cond["value"]
+                            if   o == ">": m = df3[f] >  v
+                            elif o == "<": m = df3[f] <  v
+                            else         : m = df3[f] == v
+
+                            mask = m if mask is None else (
+                                (mask & m) if card.get("combiner","AND")=="AND" else (mask | m)
+                            )
+
+                        count = int(mask.sum()) if mask is not None else 0
+                        bg, txt = card["color"] + "33", card["color"]
+
+                        st.markdown(f"""
+                            <div style="
+                                background-color:{bg};
+                                color:{txt};
+                                padding:12px;
+                                border-radius:8px;
+                                text-align:center;
+                                box-shadow:0 2px 4px rgba(0,0,0,0.15);
+                            ">
+                            <div style="font-size:14px;font-weight:600;">
+                                {card['label']}
+                            </div>
+                            <div style="font-size:24px;font-weight:bold;">
+                                {count}
+                            </div>
+                            </div>
+                        """, unsafe_allow_html=True)
+
+    dashboard_cards(df3, cube)
 
-    options = ["All"] + list(flag_map.keys())
-    flag    = st.selectbox("Filter wells by flag", options)
-    view = df_show if flag == "All" else df_show[df3[flag]]
-    view = view.sort_values("TerribleScore", ascending=False)
-
-    grid_theme = "ag-theme-alpine-dark" if night_mode else "ag-theme-alpine"
-    from st_aggrid import GridUpdateMode, DataReturnMode
-
-    grid_response = AgGrid(
-        view,
-        gridOptions=grid_opts,
-        allow_unsafe_jscode=True,
-        theme=grid_theme,
-        update_mode=GridUpdateMode.MODEL_CHANGED,
-        data_return_mode=DataReturnMode.FILTERED_AND_SORTED,
-        use_container_width=True,
-        fit_columns_on_grid_load=False,
-    )
+    st.markdown("---")
 
-    df_live = pd.DataFrame(grid_response["data"])[display_cols]
-    # ─── PDF download via static HTML table ──────────────────────────────────
-    import pdfkit
-    
-    # Build a simple HTML page containing your DataFrame
-    table_html = df_live.to_html(index=False)
-    html = f"""
-    <html>
-    <head>
-      <style>
-        table, th, td {{
-          border: 1px solid #999;
-          border-collapse: collapse;
-          padding: 4px;
-        }}
-      </style>
-    </head>
-    <body>
-      {table_html}
-    </body>
-    </html>
-    """
-    
-    # Convert static HTML → PDF
-    pdf_bytes = pdfkit.from_string(html, False)
-    st.download_button(
-        label="📥 Download current table as PDF",
-        data=pdf_bytes,
-        file_name=f"well_report_{today}.pdf",
-        mime="application/pdf",
-    )
+    @st.fragment(run_every=1)
+    def export_pending(kind: str, key: str):
+        """
+        Polls a running export. Once it has finished, one rerun renders the
+        download instead – this fragment isn't drawn again, so its timer stops
+        and the file is sent once, not every second.
+        """
+        job = export_job(kind, key)
+        if job is None or job.done():
+            st.rerun()
+        st.caption(f"⏳ Building {kind.upper()}…")
+
+    def export_download(kind: str, key: str, label: str, file_name: str, mime: str):
+        """An export job's state: polling while it runs, then its download button (or error)."""
+        job = export_job(kind, key)
+        if job is None:
+            return
+        if not job.done():
+            export_pending(kind, key)
+        elif job.exception() is not None:
+            st.error(f"❌ {kind.upper()} export failed: {job.exception()}")
+            if st.button(f"Retry {kind.upper()}", key=f"retry_{kind}"):
+                drop_export(kind, key)
+                st.rerun()
+        else:
+            st.download_button(label=label, data=job.result(), file_name=file_name, mime=mime)
+
+    @st.fragment
+    def table_exports():
+        """PDF / Excel downloads of the rows the grid currently shows."""
+        with perf_timer("exports"):
+            df_live = st.session_state.df_live
+            # ─── PDF / Excel: built on request, off-thread, cached by table content ───
+            rules = export_rules(thr)
+            # the colouring depends on the thresholds too
+            key = hashlib.md5(f"{frame_digest(df_live)}{sorted(rules.items())}".encode()).hexdigest()
+
+            c_pdf, c_xlsx = st.columns(2)
+            with c_pdf:
+                if export_job("pdf", key) is None and st.button("🖨️ Prepare PDF of current table"):
+                    submit_export("pdf", key, well_pdf.render_table_pdf, df_live.copy(),
+                                  rules, EXPORT_MARK_COLS)
+                if export_job("pdf", key) is not None:
+                    export_download("pdf", key, "📥 Download current table as PDF",
+                                    f"well_report_{today}.pdf", "application/pdf")
+            with c_xlsx:
+                if export_job("xlsx", key) is None and st.button("📊 Prepare Excel of current table"):
+                    submit_export("xlsx", key, well_reports.render_table_xlsx, df_live.copy(),
+                                  rules, EXPORT_MARK_COLS)
+                if export_job("xlsx", key) is not None:
+                    export_download("xlsx", key, "📥 Download current table as Excel",
+                                    f"well_report_{today}.xlsx",
+                                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+    @st.fragment
+    def well_grid(view: pd.DataFrame, grid_opts: dict):
+        """
+        AG-Grid; sorting/filtering reruns only this fragment and its exports.
+        The flag filter runs in the browser (FlagBits + the grid's external
+        filter); FILTERED_AND_SORTED hands back the rows it lets through, so
+        df_live, the exports and bulk trigger follow it without re-filtering
+        here – and `view` itself never changes with the flag.
+        """
+        with perf_timer("grid"):
+            if show_timings or perf_log.isEnabledFor(logging.DEBUG):
+                # serialised like the grid receives it – only measured when someone looks
+                payload = len(view.to_json(orient="records", date_format="iso"))
+                perf_note("grid_payload", f"{len(view)} rows × {view.shape[1]} cols, {payload:,} bytes JSON")
+
+            grid_theme = "ag-theme-alpine-dark" if night_mode else "ag-theme-alpine"
+            red, green, text = ("#E74C3C", "#2ECC71", "#FFFFFF") if night_mode else ("#FFB3B3", "#C6F7C6", "#000000")
+            grid_css = {
+                ".wr-red":         {"background-color": f"{red} !important",   "color": f"{text} !important"},
+                ".wr-green":       {"background-color": f"{green} !important", "color": f"{text} !important"},
+                ".wr-mark-bad":    {"color": ("#FF6961" if night_mode else "#FF0000") + " !important"},
+                ".wr-mark-good":   {"color": ("#77DD77" if night_mode else "#00AA00") + " !important"},
+            }
+            from st_aggrid import GridUpdateMode, DataReturnMode
+
+            grid_response = AgGrid(
+                view,
+                gridOptions=grid_opts,
+                allow_unsafe_jscode=True,
+                theme=grid_theme,
+                custom_css=grid_css,
+                update_mode=GridUpdateMode.MODEL_CHANGED,
+                data_return_mode=DataReturnMode.FILTERED_AND_SORTED,
+                use_container_width=True,
+                fit_columns_on_grid_load=False,
+            )
 
-    # Excel download of the same
-    from io import BytesIO
-    buf = BytesIO()
-    with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
-        df_live.to_excel(writer, index=False, sheet_name="Wells")
-    buf.seek(0)
-    st.download_button(
-        label="📥 Download current table as Excel",
-        data=buf,
-        file_name=f"well_report_{today}.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
+            st.session_state.df_live = pd.DataFrame(grid_response["data"])[display_cols]
+
+            # ─── Bulk trigger: every checked well in one go ───
+            # only checked wells the grid still shows – a flag pick may have hidden some
+            selected = grid_response["selected_rows"]
+            if selected is not None and len(selected):
+                shown = set(st.session_state.df_live["Well Name"])
+                wells = [w for w in selected["Well Name"] if w in shown]
+            else:
+                wells = []
+            if wells and st.button(f"🚀 Trigger selected ({len(wells)})", key="trigger_selected"):
+                n8n_dispatcher().submit_many(wells)
+                st.session_state["n8n_triggered"] = list(dict.fromkeys(
+                    st.session_state.get("n8n_triggered", []) + wells
+                ))
+                st.rerun()   # one app rerun for the whole batch → results table below
+        table_exports()
+
+    view = df_show.sort_values("TerribleScore", ascending=False)
+    well_grid(view, grid_opts)
 
 else:
     # ─────────── “Raw Data” tab (unchanged) ───────────
@@ -2374,10 +2360,52 @@ else:
 
 
 # ─── If we have an n8n response, show it here ───────────────────────
-if "n8n_response" in st.session_state:
-    st.markdown(f"### n8n tickets for “{st.session_state.get('last_triggered_well','')}”")
-    df_tickets = pd.DataFrame(st.session_state["n8n_response"])
-    st.table(df_tickets)
+def n8n_table(results: list):
+    """One table for every triggered well (`n8n_response`): a row per ticket, or a status row."""
+    st.session_state["n8n_response"] = pd.DataFrame(well_n8n.ticket_rows(results))
+    st.dataframe(st.session_state["n8n_response"], hide_index=True, use_container_width=True)
+
+@st.fragment(run_every=1)
+def n8n_pending(wells: list):
+    """
+    Polls the dispatcher while triggers are in flight; the rest of the page is
+    not rerun while n8n works. Once none is pending, one rerun draws the final
+    table outside this fragment, which stops the timer.
+    """
+    results = n8n_dispatcher().results(wells)
+    pending = sum(r["status"] == "pending" for r in results)
+    if not pending:
+        st.rerun()
+    st.info(f"⏳ Waiting for n8n… {len(results) - pending}/{len(results)} done")
+    n8n_table(results)
+
+@st.fragment
+def n8n_tickets(wells: list):
+    """
+    Tickets for the triggered wells – polled by n8n_pending while any is in
+    flight. Tickets served from the cache show as "cached"; Refresh drops
+    them and asks n8n again.
+    """
+    c_title, c_refresh, c_clear = st.columns([4, 1, 1])
+    if c_refresh.button("🔄 Refresh", key="n8n_refresh", help="Ignore cached tickets and re-trigger these wells"):
+        n8n_ticket_cache().invalidate(wells)
+        n8n_dispatcher().submit_many(wells, refresh=True)
+    if c_clear.button("Clear", key="n8n_clear"):
+        st.session_state.pop("n8n_triggered", None)
+        st.session_state.pop("n8n_response", None)
+        st.rerun()
+    results = n8n_dispatcher().results(wells)
+    c_title.markdown(f"### n8n tickets for {len(results)} well(s)")
+    if any(r["status"] == "pending" for r in results):
+        n8n_pending(wells)
+        return
+    failed = sum(r["status"] == "error" for r in results)
+    if failed:
+        st.error(f"❌ {failed} trigger(s) failed – see the Error column.")
+    n8n_table(results)
+
+if st.session_state.get("n8n_triggered"):
+    n8n_tickets(st.session_state["n8n_triggered"])
 # To run from PowerShell or Command Prompt:
 # cd "C:\\Users\\Thai.phi\\OneDrive - Endurance Lift Solutions\\Desktop\\modbus dashboard"
 # cd "C:\\Users\\Thai.phi\\OneDrive - Endurance Lift Solutions\\Desktop\\modbus dashboard"
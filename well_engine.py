@@ -0,0 +1,515 @@
+# well_engine.py – headless well-review pipeline (no Streamlit)
+# -----------------------------------------------------------------------------------------
+# • parse:     load_source / load_sources → raw daily rows (same readers as the app)
+# • aggregate: aggregate_wells → one row per well over the last ROLL_DAYS dates
+# • flags:     compute_flags → threshold flags, PoorPerformance, SpeedUp
+# • score:     terrible_score → TerribleScore
+# • run_pipeline strings the four together; well_review_cli.py drives it in batch
+
+import datetime as dt
+import logging
+import re
+import zipfile
+from io import BytesIO
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import xlrd
+
+LOOKBACK_DAYS = 4   # today + previous 3 days
+ROLL_DAYS     = 3
+csv_date_re   = re.compile(r"(\d{4}-\d{2}-\d{2})", re.I)
+
+log = logging.getLogger(__name__)
+
+# widget defaults of the dashboard's threshold / weight panel
+DEFAULT_THRESHOLDS = {
+    "CapLoadPct": 1.05, "RiskPct": 1.05, "HighIntake": 300, "SmallDrawdown": 50,
+    "NearUnderLower": 1.43, "LowUptime": 90, "HighDT": 6, "VibHigh": 1.00,
+    "FreqSpread": 1.0, "ampSpreadRatio": 1.0, "TempHigh": 210, "LowDelta": 30,
+    "HighFaultCount": 1, "HighRunningDays": 90, "PressureDiff": 0.0,
+    "PoorTrue":   ["LowUptime", "HighVib", "SpreadFlag", "HighMotorTemp", "FaultHigh"],
+    "PoorFalse":  [],
+    "SpeedTrue":  ["Avg Intake Pressure > HighIntake", "Drawdown < SmallDrawdown",
+                   "High running days", "At_Max_Capacity", "Overload_Risk"],
+    "SpeedFalse": [],
+}
+DEFAULT_WEIGHTS = {
+    "uptime": 1.0, "missing": 1.0, "spread": 1.0, "motortemp": 1.0, "drawdown": 1.0,
+    "delta_tc": 1.0, "nearunderload": 1.0, "vibration": 1.0, "fault": 1.0,
+}
+
+
+def col(base: str, stat: str) -> str:
+    return f"{base}_{stat}"
+
+
+# ───────────── Helper: ensure Date column ─────────────
+def ensure_date_column(df: pd.DataFrame, source_name: str, *, excel_date=None):
+    if "Date" not in df.columns:
+        if excel_date is not None:
+            df.insert(0, "Date", pd.to_datetime(excel_date).date())
+        else:
+            m = csv_date_re.search(source_name)
+            day = m.group(1) if m else dt.date.today().strftime("%Y-%m-%d")
+            df.insert(0, "Date", pd.to_datetime(day).date())
+    return df
+
+
+# ───────────── Excel / CSV loaders ─────────────
+def load_excel(buf) -> pd.DataFrame:
+    """
+    Load .xlsx/.xlsm via pandas + openpyxl hyperlinks,
+    or .xls via xlrd (v1.2.0) with hyperlinks.
+    Always returns a DataFrame with a 'Date' column and 'Link URL'.
+    """
+    raw = buf.read()
+    fname = buf.name.lower()
+
+    # ─── .xlsx / .xlsm ────────────────────────────────────────────────
+    if fname.endswith((".xlsx", ".xlsm")):
+        # read data (header row=5 → index=4)
+        bio = BytesIO(raw)
+        df = pd.read_excel(bio, sheet_name=0, header=4)
+        df.columns = [str(c).strip() for c in df.columns]
+
+        # extract report date from AK2
+        bio.seek(0)
+        dt_val = pd.read_excel(bio, sheet_name=0, header=None, usecols="AK", nrows=2).iloc[1, 0]
+        df = ensure_date_column(df, fname, excel_date=dt_val)
+
+        # default Link URL
+        df["Link URL"] = None
+
+        # attempt to pull hyperlinks
+        try:
+            wb = openpyxl.load_workbook(BytesIO(raw), read_only=True, data_only=True)
+            ws = wb.active
+            # find "link" column in header row 5
+            link_idx = next(
+                (i for i, cell in enumerate(ws[5], start=1)
+                 if isinstance(cell.value, str) and "link" in cell.value.strip().lower()),
+                None
+            )
+            if link_idx:
+                links = []
+                for row in ws.iter_rows(min_row=6, max_row=6+len(df)-1, min_col=link_idx, max_col=link_idx):
+                    cell = row[0]
+                    links.append(cell.hyperlink.target if cell.hyperlink else None)
+                df["Link URL"] = links
+        except (zipfile.BadZipFile, openpyxl.utils.exceptions.InvalidFileException):
+            pass
+
+        return df
+
+    # ─── .xls ─────────────────────────────────────────────────────────
+    if fname.endswith(".xls"):
+        if xlrd.__version__ != "1.2.0":
+            raise RuntimeError(f"xlrd version must be 1.2.0, found {xlrd.__version__}")
+        raw_book = xlrd.open_workbook(file_contents=raw, formatting_info=True)
+        sheet    = raw_book.sheet_by_index(0)
+
+        # header row=5 → index 4
+        cols = [str(v).strip() for v in sheet.row_values(4)]
+        data = [sheet.row_values(r) for r in range(5, sheet.nrows)]
+        df   = pd.DataFrame(data, columns=cols)
+
+        # extract report date from AK2 (row=2, col AK=index 36)
+        dt_val = sheet.cell_value(1, 36)
+        df = ensure_date_column(df, fname, excel_date=dt_val)
+
+        df["Link URL"] = None
+        # find "link" header index
+        link_idx = next((i for i, h in enumerate(cols) if isinstance(h, str) and "link" in h.lower()), None)
+        if link_idx is not None and hasattr(sheet, "hyperlink_map"):
+            links = []
+            for r in range(5, sheet.nrows):
+                h = sheet.hyperlink_map.get((r, link_idx))
+                links.append(h.url_or_path if h else None)
+            df["Link URL"] = links
+
+        return df
+
+    # unsupported
+    raise ValueError(f"Unsupported Excel type: {fname}")
+
+def load_csv(buf, name) -> pd.DataFrame:
+    """Load CSV, ensure Date column, add Link URL placeholder."""
+    # THE FIX: Added header=4 to correctly read the CSV.
+    df = pd.read_csv(buf, header=4) 
+    df = ensure_date_column(df, name)
+    df["Link URL"] = None
+    return df
+
+
+def load_source(raw: bytes, name: str) -> pd.DataFrame:
+    """Parse one file's bytes with the CSV or Excel reader, picked by extension."""
+    buf = BytesIO(raw)
+    buf.name = name
+    return load_csv(buf, name) if name.lower().endswith(".csv") else load_excel(buf)
+
+
+def standardize_raw(dfs: list) -> pd.DataFrame:
+    """Concatenate parsed files, strip/drop blank headers, normalise the Customer header."""
+    df_raw = pd.concat(dfs, ignore_index=True)
+    df_raw.columns = [str(c).strip() for c in df_raw.columns]
+    df_raw = df_raw.drop(columns=[c for c in df_raw.columns if c == ""])
+    cust_col = next((c for c in df_raw.columns if c.strip().lower() == "customer"), None)
+    if cust_col and cust_col != "Customer":
+        df_raw = df_raw.rename(columns={cust_col: "Customer"})
+    return df_raw
+
+
+def well_customer_map(df_raw: pd.DataFrame) -> dict:
+    """
+    Well → customer from categorical codes: one integer scatter over the raw
+    rows (later rows win), then one dict entry per well.
+    """
+    wells = df_raw["Well Name"].astype("category")
+    custs = df_raw["Customer"].astype("category")
+    w_codes = wells.cat.codes.to_numpy()
+    c_codes = custs.cat.codes.to_numpy()
+    keep = w_codes >= 0
+    last = np.full(len(wells.cat.categories), -1, dtype=np.int64)
+    last[w_codes[keep]] = c_codes[keep]   # repeated indices: last assignment wins
+    return {
+        w: custs.cat.categories[c]
+        for w, c in zip(wells.cat.categories, last)
+        if c >= 0
+    }
+
+
+def aggregate_wells(df_raw: pd.DataFrame):
+    """
+    Roll the raw daily rows up to one row per well over the last ROLL_DAYS
+    dates. Returns (df3, last_dates, hist_days). Threshold-independent.
+    """
+    last_dates = sorted(df_raw["Date"].unique())[-ROLL_DAYS:]
+    df_recent  = df_raw[df_raw["Date"].isin(last_dates)].copy()
+    hist_days  = len(last_dates)
+
+    # ── RIGHT BEFORE the pd.to_numeric loop: Sanitize Uptime (%) ──
+    if "Uptime (%)" in df_recent.columns:
+        raw_uptime = (
+            df_recent["Uptime (%)"]
+                .astype(str)
+                .str.strip()
+                .str.replace('%', '', regex=False)
+                .str.lower()
+                .replace({'': np.nan, 'n/a': np.nan, 'na': np.nan, 'nan': np.nan, '--': np.nan})
+        )
+        num = pd.to_numeric(raw_uptime, errors='coerce')
+        # If ≤1.05 assume fraction (0–1); if >1.05 assume percent (0–100)
+        df_recent["Uptime (%)"] = np.where(num <= 1.05, num, num / 100.0)
+
+    # Convert all other columns (except text fields) to numeric
+    non_txt = {
+        "Well Name", "Field", "Installation Date", "Current Status",
+        "Pump Type", "Drive Type", "State Detail/Op Mode", "Links",
+        "Latest Fault", "Fault Date", "Link URL"
+    }
+
+    for c in df_recent.columns:
+        if c not in non_txt and c != "Date":
+            col_data = df_recent[c]
+            if not (isinstance(col_data, pd.Series) and col_data.ndim == 1):
+                log.warning("column %r left as is: not a 1-D Series (%s, ndim %s) – duplicate header?",
+                            c, type(col_data).__name__, getattr(col_data, "ndim", None))
+            else:
+                df_recent[c] = pd.to_numeric(col_data, errors="coerce")
+
+    numeric_cols = df_recent.select_dtypes(include="number").columns.tolist()
+
+    text_cols    = [c for c in df_recent.columns if c not in numeric_cols + ["Date"]]
+
+    agg_dict = {
+        c: ["mean","max","min","std"]
+        for c in numeric_cols
+        if c!="Well Name"
+    }
+    # wrap the "first" in a list so pandas will do SeriesGroupBy.first, not DataFrameGroupBy.first
+    agg_dict.update({
+        c: ["first"]
+        for c in text_cols
+        if c!="Well Name"
+    })
+    df3 = df_recent.groupby("Well Name").agg(agg_dict)
+    df3.columns = ["_".join(c) if isinstance(c, tuple) else c for c in df3.columns]
+    df3 = df3.reset_index()
+
+    # ───────────── Latest-day Normal vs Overload ─────────────
+    latest = (
+        df_raw.sort_values("Date")
+              .groupby("Well Name", as_index=False)
+              .tail(1)
+              .set_index("Well Name")
+    )
+
+    # coerce to floats, turning any non-numeric into NaN
+    df3["Latest_Normal"] = pd.to_numeric(
+        latest["Normal Running Amps"]
+            .reindex(df3["Well Name"])
+            .values,
+        errors="coerce"
+    )
+    df3["Latest_Overload"] = pd.to_numeric(
+        latest["Motor Overload"]
+            .reindex(df3["Well Name"])
+            .values,
+        errors="coerce"
+    )
+
+    # now this comparison will work
+    df3["Normal_vs_Overload"] = df3["Latest_Normal"] >= df3["Latest_Overload"]
+
+    return df3, last_dates, hist_days
+
+
+# threshold key → comparison that flags a well (metric <op> threshold)
+THRESHOLD_OPS = {
+    "CapLoadPct": ">=", "RiskPct": ">=", "HighIntake": ">", "SmallDrawdown": "<",
+    "NearUnderLower": "<", "LowUptime": "<", "HighDT": ">", "VibHigh": ">=",
+    "FreqSpread": ">=", "ampSpreadRatio": ">=", "TempHigh": ">=", "LowDelta": "<=",
+    "HighFaultCount": ">=", "HighRunningDays": ">", "PressureDiff": "<=",
+}
+_COMPARE = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal}
+
+
+def threshold_metrics(df3: pd.DataFrame, drawdown: pd.Series, uptime_pct: pd.Series) -> dict:
+    """
+    threshold key → (metric, comparison) behind every single-threshold flag.
+    A well a flag can never fire for, whatever the threshold, has NaN – e.g.
+    SpreadFlag needs Min Drive Amps ≠ 0 – so counting (metric <op> value)
+    gives exactly the wells compute_flags flags.
+    """
+    metrics = {
+        "CapLoadPct":      df3["CapLoad"],
+        "RiskPct":         df3["CapRisk"],
+        "HighIntake":      df3[col("Avg Intake Pressure", "mean")],
+        "SmallDrawdown":   drawdown,
+        "NearUnderLower":  df3["NearUnderload Ratio"],
+        "LowUptime":       uptime_pct,
+        "HighDT":          df3[col("Downtime (Hr)", "mean")],
+        "VibHigh":         df3["Max Vibration"],
+        "FreqSpread":      df3["Frequency Spread Ratio"],
+        "ampSpreadRatio":  df3["ampSpreadRatio"].where(df3[col("Min Drive Amps", "min")] != 0),
+        "TempHigh":        df3[col("Max Motor Temp", "max")],
+        "LowDelta":        df3[col("Avg Tubing", "mean")] - df3[col("Avg Casing", "mean")],
+        "HighFaultCount":  df3["Fault Count"],
+        "HighRunningDays": df3[col("Running Days", "mean")],
+        "PressureDiff":    df3["Pressure Difference"],
+    }
+    return {k: (pd.to_numeric(m, errors="coerce"), THRESHOLD_OPS[k]) for k, m in metrics.items()}
+
+
+def threshold_flag(metrics: dict, key: str, value) -> pd.Series:
+    """Boolean flag for one threshold; NaN metrics are never flagged."""
+    metric, op = metrics[key]
+    return pd.Series(_COMPARE[op](metric, value), index=metric.index).fillna(False).astype(bool)
+
+
+def compute_flags(df3: pd.DataFrame, thr: dict, hist_days: int) -> dict:
+    """
+    Add every threshold flag plus PoorPerformance / SpeedUp to `df3` (in
+    place). Returns the pieces the dashboard needs beyond df3's columns:
+    {"flag_map", "drawdown", "uptime_pct", "metrics", "warnings"} – `metrics`
+    is threshold_metrics(), the single source for the flags below.
+    """
+    use_flat = hist_days >= 3
+    warnings = []
+
+    # ───────────── Metrics (independent of the thresholds) ─────────────
+    df3["CapLoad"] = df3[col("Max Drive Amps", "mean")] / df3[col("Normal Running Amps", "mean")]
+    df3["CapRisk"] = df3[col("Max Drive Amps", "mean")] / df3[col("Motor Overload", "mean")]
+
+    drawdown = df3[col("Max Intake Pressure", "max")] - df3[col("Min Intake Pressure", "min")]
+    df3["NearUnderload Ratio"] = df3[col("Avg Drive Amps", "mean")] / df3[col("Motor Underload", "mean")]
+    df3["Max Vibration"] = df3[[col("Avg Vib X", "mean"), col("Avg Vib Y", "mean")]].max(axis=1)
+    df3["Pressure Difference"] = (
+        df3[col("Avg Disch Pressure", "mean")]
+        - df3[col("Avg Intake Pressure", "mean")]
+    )
+
+    freq_range = (
+        df3[col("Max Drive Frequency", "max")]
+        - df3[col("Min Drive Frequency", "min")]
+    )
+    df3["Frequency Spread Ratio"] = np.where(
+        df3[col("Avg Drive Frequency", "mean")] > 0,
+        freq_range / df3[col("Avg Drive Frequency", "mean")],
+        np.nan
+    )
+    # ───────────── Amp Spread Ratio (N/A when Min Drive Amps = 0) ─────────────
+    spread_ratio = (
+        (df3[col("Max Drive Amps", "max")] - df3[col("Min Drive Amps", "min")])
+        / df3[col("Avg Drive Amps", "mean")]
+    )
+    df3["ampSpreadRatio"] = spread_ratio.where(df3[col("Min Drive Amps", "min")] != 0, np.nan)
+    df3["Lost_Motor"] = (
+        (df3[col("Avg Motor Amps", "mean")] == 0) |
+        (use_flat & (df3[col("Avg Motor Amps", "std")] == 0))
+    )
+    df3["Lost_Intake"] = (
+        (df3[col("Avg Intake Pressure", "mean")] == 0) |
+        (use_flat & (df3[col("Avg Intake Pressure", "std")] == 0))
+    )
+    df3["MissingSensor"] = df3[["Lost_Motor", "Lost_Intake"]].any(axis=1)
+
+    # Uptime %: scale fraction (0–1) → 0–100
+    uptime_pct = df3[col("Uptime (%)", "mean")] * 100
+
+    # ───────────── Fault Count ─────────────
+    # Choose the right raw fault-count column (daily vs weekly)
+    fault_24 = col("Fault Count (24hr)", "mean")
+    fault_7d = col("Fault Count\n(7 Day)",    "mean")
+    if fault_24 in df3.columns:
+        fault_col = fault_24
+    elif fault_7d in df3.columns:
+        fault_col = fault_7d
+    else:
+        warnings.append("No fault-count column found; defaulting to zero.")
+        fault_col = None
+
+    if fault_col:
+        fault_mean = (
+            df3[fault_col]
+            .replace([np.inf, -np.inf], 0)
+            .fillna(0)
+        )
+    else:
+        fault_mean = pd.Series(0, index=df3.index)
+    df3["Fault Count"] = (fault_mean * hist_days).round().astype(int)
+
+    # ───────────── Threshold flags – one predicate per threshold ─────────────
+    metrics = threshold_metrics(df3, drawdown, uptime_pct)
+
+    def flag(key):
+        return threshold_flag(metrics, key, thr[key])
+
+    df3["At_Max_Capacity"] = flag("CapLoadPct")
+    df3["Overload_Risk"]   = flag("RiskPct")
+    df3["HighRunningDays"] = flag("HighRunningDays")
+    df3["HighDowntime"]    = flag("HighDT")
+    df3["LowDeltaFlag"]    = flag("LowDelta")
+    df3["NearUnderload"]   = flag("NearUnderLower")
+    df3["HighVib"]         = flag("VibHigh")
+    df3["HighMotorTemp"]   = flag("TempHigh")
+    df3["SpreadFlag"]      = flag("ampSpreadRatio")
+    df3["LowUptime"]       = flag("LowUptime")
+    df3["FaultHigh"]       = flag("HighFaultCount")
+    df3["ModemOffline"] = (
+        df3[col("State Detail/Op Mode", "first")] == "MODEM OFFLINE"
+    )
+    # ─── build a map from your sidebar strings → boolean series ─────────
+    flag_map = {
+        "LowUptime":          df3["LowUptime"],
+        "HighVib":            df3["HighVib"],
+        "SpreadFlag":         df3["SpreadFlag"],
+        "HighMotorTemp":      df3["HighMotorTemp"],
+        "FaultHigh":          df3["FaultHigh"],
+
+        "High running days":  df3["HighRunningDays"],
+        "High Downtime":      df3["HighDowntime"],
+        "LowDeltaFlag":       df3["LowDeltaFlag"],
+
+        "At_Max_Capacity":    df3["At_Max_Capacity"],
+        "Overload_Risk":      df3["Overload_Risk"],
+        "High Motor Temp":    df3["HighMotorTemp"],
+        "Max Vibration":      df3["HighVib"],
+        "Amp Spread Ratio":       df3["SpreadFlag"],
+        "Tubing-Casing Δ":    df3["LowDeltaFlag"],
+        "Fault Count":        df3["FaultHigh"],
+        "Uptime %":           df3["LowUptime"],
+        "NearUnderload Ratio":df3["NearUnderload"],
+        "NearUnderload":      df3["NearUnderload"],
+        "Normal_vs_Overload": df3["Normal_vs_Overload"],
+        "MissingSensor":      df3["MissingSensor"],
+
+        "Avg Intake Pressure > HighIntake": flag("HighIntake"),
+        "Drawdown < SmallDrawdown":         flag("SmallDrawdown"),
+    }
+
+    # ─── PoorPerformance now = OR over your selected criteria ────────────
+    # ─── compute PoorPerformance via TRUE & FALSE lists ───────────────────
+    # build the TRUE‐flags series
+    pt = thr["PoorTrue"]
+    if pt:
+        true_df = pd.concat([flag_map[c] for c in pt if c in flag_map], axis=1)
+        poor_true = true_df.any(axis=1)
+    else:
+        poor_true = pd.Series(False, index=df3.index)
+
+    # build the FALSE‐flags series
+    pf = thr["PoorFalse"]
+    if pf:
+        false_df = pd.concat([flag_map[c] for c in pf if c in flag_map], axis=1)
+        poor_false_ok = (~false_df).all(axis=1)
+    else:
+        poor_false_ok = pd.Series(True, index=df3.index)
+
+    # final PoorPerformance: any TRUE *and* all FALSE
+    df3["PoorPerformance"] = poor_true & poor_false_ok
+
+
+    # ─── SpeedUp = AND across all TRUE flags and all FALSE flags ─────────
+    true_list  = thr["SpeedTrue"]
+    false_list = thr["SpeedFalse"]
+    series = []
+
+    for c in true_list:
+        if c in flag_map:
+            series.append(flag_map[c])
+    for c in false_list:
+        if c in flag_map:
+            series.append(~flag_map[c])
+
+    # if no criteria selected, default to False
+    if series:
+        df3["SpeedUp"] = pd.concat(series, axis=1).all(axis=1)
+    else:
+        df3["SpeedUp"] = False
+
+    return {
+        "flag_map":   flag_map,
+        "drawdown":   drawdown,
+        "uptime_pct": uptime_pct,
+        "metrics":    metrics,
+        "warnings":   warnings,
+    }
+
+
+def terrible_score(df3: pd.DataFrame, drawdown: pd.Series, thr: dict, weights: dict) -> pd.Series:
+    """Weighted sum of the flags (and amp spread ratio) – higher is worse."""
+    return (
+          weights["uptime"]       * df3["LowUptime"].astype(int)
+        + weights["missing"]      * df3["MissingSensor"].astype(int)
+        + weights["spread"]       * df3["ampSpreadRatio"].fillna(0)
+        + weights["motortemp"]    * df3["HighMotorTemp"].astype(int)
+        + weights["drawdown"]     * (drawdown < thr["SmallDrawdown"]).astype(int)
+        + weights["nearunderload"]* df3["NearUnderload"].astype(int)
+        + weights["vibration"]    * df3["HighVib"].astype(int)
+        + weights["fault"]        * df3["FaultHigh"].astype(int)
+    )
+
+
+def thresholds_for(settings: dict, customer: str | None = None):
+    """(thr, weights) for a customer from a customer_settings.json dict, defaults filled in."""
+    saved = settings.get(customer) or settings.get("DEFAULT", {})
+    thr = {k: saved.get(k, v) for k, v in DEFAULT_THRESHOLDS.items()}
+    weights = {k: saved.get(k, v) for k, v in DEFAULT_WEIGHTS.items()}
+    return thr, weights
+
+
+def score_wells(df3: pd.DataFrame, hist_days: int, thr: dict, weights: dict) -> pd.DataFrame:
+    """flags → TerribleScore on an aggregated frame (a copy; the input is left alone)."""
+    df3 = df3.copy()
+    res = compute_flags(df3, thr, hist_days)
+    df3["TerribleScore"] = terrible_score(df3, res["drawdown"], thr, weights)
+    return df3
+
+
+def run_pipeline(df_raw: pd.DataFrame, thr: dict, weights: dict) -> pd.DataFrame:
+    """parse output → aggregate → flags → TerribleScore, worst wells first."""
+    df3, _, hist_days = aggregate_wells(df_raw)
+    return score_wells(df3, hist_days, thr, weights).sort_values("TerribleScore", ascending=False)
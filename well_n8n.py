@@ -0,0 +1,192 @@
+# well_n8n.py – background dispatcher for the n8n "Trigger" webhook
+# -----------------------------------------------------------------------------------------
+# • One pooled requests.Session shared by all sessions – keep-alive, no new TCP/TLS
+#   handshake per trigger
+# • submit() returns at once; worker threads POST {"well_name": …} and store the result
+# • Retries connection errors, timeouts, 429 and 5xx with exponential backoff + jitter
+#   (Retry-After honoured); other 4xx fail straight away
+# • A well already queued or in flight is not sent twice
+# • submit_many(): a whole selection at once – the wells go out concurrently
+# • TicketCache: tickets per well for `ttl` seconds, shareable between dispatchers;
+#   a fresh entry answers submit() without posting (refresh=True / invalidate() bypass it)
+# • No Streamlit import – the dashboard keeps one dispatcher in st.cache_resource
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class TriggerError(Exception):
+    """Raised for a response that should not be retried."""
+
+
+class TicketCache:
+    """Thread-safe well → tickets cache with a TTL; errors are never cached."""
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 5000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}               # well → (expires at, monotonic; tickets)
+
+    def get(self, well: str):
+        """Cached tickets for `well`, or None if absent / expired."""
+        with self._lock:
+            entry = self._entries.get(well)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[well]
+                return None
+            return entry[1]
+
+    def put(self, well: str, tickets):
+        with self._lock:
+            self._entries.pop(well, None)
+            self._entries[well] = (time.monotonic() + self.ttl, tickets)
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]   # oldest insert first
+
+    def invalidate(self, wells=None):
+        """Drop the given wells (one name or an iterable), or everything when None."""
+        with self._lock:
+            if wells is None:
+                self._entries.clear()
+                return
+            for w in [wells] if isinstance(wells, str) else wells:
+                self._entries.pop(w, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TriggerDispatcher:
+    def __init__(self, url: str, workers: int = 8, retries: int = 3,
+                 backoff: float = 0.5, timeout: float = 10.0, keep: int = 500,
+                 cache: TicketCache | None = None):
+        self.url = url
+        self.cache = cache
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.keep = keep                 # finished results kept, oldest dropped first
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="n8n")
+        self._lock = threading.Lock()
+        self._results = {}               # well → result dict (see submit)
+
+    # ───── public API ─────
+    def submit(self, well: str, refresh: bool = False) -> dict:
+        """
+        Queue a trigger for `well` (no-op if one is already pending); returns
+        its result dict. Tickets still fresh in the cache are returned as a
+        finished result without posting, unless `refresh` is set.
+        """
+        cached = None if refresh or self.cache is None else self.cache.get(well)
+        with self._lock:
+            res = self._results.get(well)
+            if res is not None and res["status"] == "pending":
+                return dict(res)
+            now = time.time()
+            res = self._results[well] = {
+                "well": well, "status": "pending", "tickets": None, "error": None,
+                "attempts": 0, "submitted": now, "finished": None, "elapsed": None,
+                "cached": cached is not None,
+            }
+            if cached is not None:
+                res.update(status="done", tickets=cached, finished=now, elapsed=0.0)
+            self._trim()
+        if cached is None:
+            self._pool.submit(self._run, well)
+        return dict(res)
+
+    def submit_many(self, wells, refresh: bool = False) -> list:
+        """Queue triggers for several wells; they are sent in parallel by the workers."""
+        return [self.submit(w, refresh) for w in dict.fromkeys(wells)]
+
+    def result(self, well: str) -> dict | None:
+        with self._lock:
+            res = self._results.get(well)
+            return dict(res) if res is not None else None
+
+    def results(self, wells) -> list:
+        with self._lock:
+            return [dict(self._results[w]) for w in wells if w in self._results]
+
+    def pending(self, wells) -> bool:
+        return any(r["status"] == "pending" for r in self.results(wells))
+
+    # ───── worker ─────
+    def _trim(self):
+        done = [w for w, r in self._results.items() if r["status"] != "pending"]
+        for w in done[:max(0, len(self._results) - self.keep)]:
+            del self._results[w]
+
+    def _update(self, well: str, **fields):
+        with self._lock:
+            if well in self._results:
+                self._results[well].update(fields)
+
+    def _delay(self, attempt: int, resp=None) -> float:
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), 30.0)
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    def _post(self, well: str):
+        for attempt in range(self.retries + 1):
+            self._update(well, attempts=attempt + 1)
+            resp = None
+            try:
+                resp = self.session.post(self.url, json={"well_name": well}, timeout=self.timeout)
+                if resp.status_code not in RETRY_STATUS:
+                    if not resp.ok:
+                        raise TriggerError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+                    return resp.json()
+                error = requests.HTTPError(f"HTTP {resp.status_code}", response=resp)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if attempt == self.retries:
+                raise error
+            time.sleep(self._delay(attempt, resp))
+
+    def _run(self, well: str):
+        t0 = time.perf_counter()
+        try:
+            tickets = self._post(well)
+            if self.cache is not None:
+                self.cache.put(well, tickets)
+            self._update(well, status="done", tickets=tickets,
+                         finished=time.time(), elapsed=time.perf_counter() - t0)
+        except Exception as e:
+            self._update(well, status="error", error=str(e),
+                         finished=time.time(), elapsed=time.perf_counter() - t0)
+
+
+def ticket_rows(results) -> list:
+    """
+    Flatten dispatcher results into one table: a row per ticket, tagged
+    with its well, or a single status row for wells still pending, failed
+    or without tickets.
+    """
+    rows = []
+    for res in results:
+        status = "cached" if res.get("cached") else res["status"]
+        base = {"Well Name": res["well"], "Trigger Status": status, "Attempts": res["attempts"]}
+        tickets = res["tickets"]
+        if isinstance(tickets, dict):
+            tickets = [tickets]
+        if res["status"] == "done" and tickets:
+            rows.extend({**base, **(t if isinstance(t, dict) else {"Ticket": t})} for t in tickets)
+        else:
+            rows.append({**base, "Error": res["error"]} if res["error"] else base)
+    return rows
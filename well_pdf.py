@@ -0,0 +1,145 @@
+# well_pdf.py – in-process PDF writer for the well table (reportlab)
+# -----------------------------------------------------------------------------------------
+# • Renders a DataFrame straight to PDF – no wkhtmltopdf process, no HTML pass
+# • Landscape pages, header row repeated on every page, page numbers
+# • Same colours as the grid: red/green backgrounds for threshold columns,
+#   red ✗ / green ✓ text for marker columns
+# • Used by the dashboard's PDF export; compare with pdfkit via bench_pdf.py
+
+import math
+import pathlib
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter, landscape
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate, TableStyle
+
+RED, GREEN = colors.HexColor("#FFB3B3"), colors.HexColor("#C6F7C6")
+TEXT_COLORS = {"bad": colors.HexColor("#FF0000"), "good": colors.HexColor("#00AA00")}
+HEADER_BG   = colors.HexColor("#002062")
+HEADER_TXT  = colors.HexColor("#f4bb2a")
+
+FONT_SIZE  = 6.5
+CHUNK_ROWS = 500   # rows per table flowable – keeps reportlab's page splitting cheap
+
+# Helvetica has no ✗/✓ glyphs: use DejaVu Sans when it is installed,
+# otherwise fall back to plain-ASCII markers.
+_FONT_PATHS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "C:/Windows/Fonts/DejaVuSans.ttf",
+]
+_ASCII_MARKS = {"✗": "X", "✓": "OK"}
+
+
+def _font() -> str:
+    if "DejaVuSans" in pdfmetrics.getRegisteredFontNames():
+        return "DejaVuSans"
+    for p in _FONT_PATHS:
+        if pathlib.Path(p).exists():
+            pdfmetrics.registerFont(TTFont("DejaVuSans", p))
+            return "DejaVuSans"
+    return "Helvetica"
+
+
+def _breach(values: pd.Series, op: str, threshold) -> np.ndarray:
+    v = pd.to_numeric(values, errors="coerce")
+    hit = {">=": v >= threshold, ">": v > threshold,
+           "<=": v <= threshold, "<": v < threshold}[op]
+    return hit.fillna(False).to_numpy(dtype=bool)
+
+
+def _cell_text(v) -> str:
+    if v is None or (isinstance(v, float) and not math.isfinite(v)):
+        return ""
+    if isinstance(v, (float, np.floating)):
+        return f"{v:,.2f}"
+    return str(v)
+
+
+def render_table_pdf(
+    df: pd.DataFrame,
+    rules: dict | None = None,
+    marks: dict | None = None,
+    title: str | None = None,
+) -> bytes:
+    """
+    Render `df` as a paginated PDF table.
+
+    rules: {column: (op, threshold)} – breaching cells red, the rest green.
+    marks: {column: (marker, "bad" | "good")} – marker cells red / green text.
+    """
+    rules, marks = rules or {}, marks or {}
+    font = _font()
+    ascii_marks = font == "Helvetica"
+
+    header_style = ParagraphStyle(
+        "hdr", fontName=font, fontSize=FONT_SIZE, leading=FONT_SIZE + 1.5, textColor=HEADER_TXT,
+    )
+    header = [Paragraph(str(c), header_style) for c in df.columns]
+
+    body = df.astype(object).map(_cell_text)
+    if ascii_marks:
+        body = body.replace(_ASCII_MARKS)
+
+    # per-column flags, computed once for the whole frame
+    bg = {df.columns.get_loc(c): _breach(df[c], op, t) for c, (op, t) in rules.items() if c in df.columns}
+    fg = {
+        df.columns.get_loc(c): ((df[c].astype(str) == m).to_numpy(), TEXT_COLORS[kind])
+        for c, (m, kind) in marks.items() if c in df.columns
+    }
+
+    page = landscape(letter)
+    width = page[0] - 0.6 * inch
+    # width ∝ the longer of header / typical cell text, within sane bounds
+    lens = np.array([
+        max(min(len(str(c)), 14), int(body[c].str.len().quantile(0.9)) if len(body) else 0, 3)
+        for c in df.columns
+    ], dtype=float)
+    col_widths = list(width * lens / lens.sum())
+
+    base = [
+        ("FONTNAME",      (0, 0), (-1, -1), font),
+        ("FONTSIZE",      (0, 0), (-1, -1), FONT_SIZE),
+        ("BACKGROUND",    (0, 0), (-1, 0),  HEADER_BG),
+        ("VALIGN",        (0, 0), (-1, -1), "MIDDLE"),
+        ("GRID",          (0, 0), (-1, -1), 0.25, colors.HexColor("#999999")),
+        ("TOPPADDING",    (0, 0), (-1, -1), 1.5),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 1.5),
+        ("LEFTPADDING",   (0, 0), (-1, -1), 2),
+        ("RIGHTPADDING",  (0, 0), (-1, -1), 2),
+    ]
+
+    story = []
+    if title:
+        story.append(Paragraph(title, ParagraphStyle("title", fontName=font, fontSize=12, spaceAfter=6)))
+    rows = body.values.tolist()
+    for start in range(0, max(len(rows), 1), CHUNK_ROWS):
+        chunk = rows[start:start + CHUNK_ROWS]
+        cmds = list(base)
+        for j, hit in bg.items():
+            for i, h in enumerate(hit[start:start + len(chunk)], start=1):
+                cmds.append(("BACKGROUND", (j, i), (j, i), RED if h else GREEN))
+        for j, (hit, colour) in fg.items():
+            for i in np.flatnonzero(hit[start:start + len(chunk)]) + 1:
+                cmds.append(("TEXTCOLOR", (j, int(i)), (j, int(i)), colour))
+        t = LongTable([header] + chunk, colWidths=col_widths, repeatRows=1)
+        t.setStyle(TableStyle(cmds))
+        story.append(t)
+
+    def _page_number(canvas, doc):
+        canvas.setFont("Helvetica", 7)
+        canvas.drawRightString(page[0] - 0.3 * inch, 0.25 * inch, f"Page {doc.page}")
+
+    buf = BytesIO()
+    SimpleDocTemplate(
+        buf, pagesize=page,
+        leftMargin=0.3 * inch, rightMargin=0.3 * inch, topMargin=0.35 * inch, bottomMargin=0.4 * inch,
+    ).build(story, onFirstPage=_page_number, onLaterPages=_page_number)
+    return buf.getvalue()
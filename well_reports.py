@@ -0,0 +1,96 @@
+# well_reports.py – Excel writer + per-customer report bundles
+# -----------------------------------------------------------------------------------------
+# • render_table_xlsx: streams a table into .xlsx (xlsxwriter constant_memory)
+#   with the grid's threshold colours as conditional formats
+# • customer_report: one customer's PDF + Excel pair (one report-pool task)
+# • zip_reports: gathers finished customer reports into a single .zip
+# • No Streamlit import, so scripts outside the dashboard can use it too
+
+import os
+import pathlib
+import re
+import tempfile
+import zipfile
+from concurrent.futures import as_completed
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+from xlsxwriter.utility import xl_rowcol_to_cell
+
+import well_pdf
+
+
+def render_table_xlsx(df: pd.DataFrame, rules: dict, marks: dict, chunk_rows: int = 5000) -> bytes:
+    """
+    Stream `df` into an .xlsx in xlsxwriter's constant_memory mode – rows go
+    to disk as they are written, so memory stays flat however many wells –
+    with conditional formats for `rules` ({display col: (op, threshold)})
+    and `marks` ({display col: (marker, "bad" | "good")}).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "wells.xlsx")
+        wb = xlsxwriter.Workbook(path, {"constant_memory": True})
+        ws = wb.add_worksheet("Wells")
+        fmt = {
+            "red":   wb.add_format({"bg_color": "#FFB3B3"}),
+            "green": wb.add_format({"bg_color": "#C6F7C6"}),
+            "bad":   wb.add_format({"font_color": "#FF0000"}),
+            "good":  wb.add_format({"font_color": "#00AA00"}),
+        }
+        ws.write_row(0, 0, [str(c) for c in df.columns], wb.add_format({"bold": True}))
+        ws.freeze_panes(1, 1)
+
+        # rows strictly in order (constant_memory requirement), NaN/inf → blank
+        for start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows].replace([np.inf, -np.inf], np.nan)
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            for r, row in enumerate(chunk.itertuples(index=False, name=None), start=start + 1):
+                ws.write_row(r, 0, row)
+
+        last = max(len(df), 1)
+        for c, (op, value) in rules.items():
+            if c not in df.columns:
+                continue
+            j    = df.columns.get_loc(c)
+            cell = xl_rowcol_to_cell(1, j, col_abs=True)
+            ws.conditional_format(1, j, last, j, {
+                "type": "formula", "criteria": f"=AND(ISNUMBER({cell}),{cell}{op}{value})",
+                "format": fmt["red"], "stop_if_true": True,
+            })
+            ws.conditional_format(1, j, last, j, {
+                "type": "formula", "criteria": "=TRUE", "format": fmt["green"],
+            })
+        for c, (mark, kind) in marks.items():
+            if c in df.columns:
+                j = df.columns.get_loc(c)
+                ws.conditional_format(1, j, last, j, {
+                    "type": "cell", "criteria": "==", "value": f'"{mark}"', "format": fmt[kind],
+                })
+        wb.close()
+        return pathlib.Path(path).read_bytes()
+
+
+def customer_report(customer: str, df: pd.DataFrame, rules: dict, marks: dict, title: str):
+    """(customer, pdf bytes, xlsx bytes) for one customer's well table."""
+    pdf = well_pdf.render_table_pdf(df, rules, marks, title=title)
+    xlsx = render_table_xlsx(df, rules, marks)
+    return customer, pdf, xlsx
+
+
+def safe_name(name: str) -> str:
+    """Customer name → something safe to use as a file name inside the zip."""
+    return re.sub(r"[^\w\-. ]+", "_", str(name)).strip() or "customer"
+
+
+def zip_reports(futures, stamp: str) -> bytes:
+    """Wait for customer_report futures and pack them as <customer>/<customer>_<stamp>.{pdf,xlsx}."""
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for fut in as_completed(futures):
+            customer, pdf, xlsx = fut.result()
+            base = safe_name(customer)
+            zf.writestr(f"{base}/{base}_{stamp}.pdf", pdf)
+            zf.writestr(f"{base}/{base}_{stamp}.xlsx", xlsx)
+    return buf.getvalue()
@@ -0,0 +1,124 @@
+# well_review_cli.py – headless batch run of the well-review pipeline
+# -----------------------------------------------------------------------------------------
+# • Input: files on the command line, or the recent files in --data-dir (like the app)
+# • Settings: customer_settings.json – each customer scored with its own thresholds
+#   and weights, falling back to DEFAULT
+# • Output: <out>/<customer>.csv (worst wells first) + <out>/summary.csv
+# • parse and per-customer flags/score run in worker processes; no Streamlit import
+#
+#   python well_review_cli.py --data-dir data --settings customer_settings.json --out reports
+#   python well_review_cli.py day1.xlsx day2.xlsx day3.xlsx --out reports --workers 8
+
+import argparse
+import datetime as dt
+import os
+import pathlib
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import well_engine
+import well_settings
+from well_reports import safe_name
+
+SOURCE_SUFFIXES = {".csv", ".xls", ".xlsx"}
+NO_CUSTOMER     = "(no customer)"
+
+# per-well result columns written for each customer (--all-columns writes everything)
+RESULT_COLUMNS = [
+    "Well Name", "Customer", "TerribleScore", "PoorPerformance", "SpeedUp",
+    "At_Max_Capacity", "Overload_Risk", "HighMotorTemp", "HighDowntime", "HighVib",
+    "SpreadFlag", "LowDeltaFlag", "FaultHigh", "LowUptime", "NearUnderload",
+    "MissingSensor", "ModemOffline", "Normal_vs_Overload",
+    "CapLoad", "CapRisk", "Max Vibration", "Pressure Difference", "Frequency Spread Ratio",
+    "ampSpreadRatio", "NearUnderload Ratio", "Fault Count",
+]
+SUMMARY_FLAGS = ["PoorPerformance", "SpeedUp", "HighMotorTemp", "MissingSensor", "ModemOffline"]
+
+
+def recent_sources(data_dir: pathlib.Path, today: dt.date) -> list:
+    """Files the dashboard would pick up: modified within LOOKBACK_DAYS, oldest first."""
+    candidates = [f for f in data_dir.glob("*") if f.suffix.lower() in SOURCE_SUFFIXES]
+    recent = [f for f in candidates
+              if (today - dt.date.fromtimestamp(f.stat().st_mtime)).days < well_engine.LOOKBACK_DAYS]
+    return sorted(recent, key=lambda f: f.stat().st_mtime)
+
+
+def parse_file(path: str) -> pd.DataFrame:
+    p = pathlib.Path(path)
+    return well_engine.load_source(p.read_bytes(), p.name)
+
+
+def score_customer(customer: str, df3: pd.DataFrame, hist_days: int, thr: dict, weights: dict,
+                   out_dir: str, all_columns: bool) -> dict:
+    """flags → TerribleScore for one customer's wells; writes its CSV, returns its summary row."""
+    scored = well_engine.score_wells(df3, hist_days, thr, weights)
+    scored = scored.sort_values("TerribleScore", ascending=False)
+    cols = list(scored.columns) if all_columns else [c for c in RESULT_COLUMNS if c in scored.columns]
+    path = pathlib.Path(out_dir) / f"{safe_name(customer)}.csv"
+    scored[cols].to_csv(path, index=False)
+    return {
+        "Customer": customer,
+        "Wells": len(scored),
+        **{f: int(scored[f].sum()) for f in SUMMARY_FLAGS if f in scored.columns},
+        "Worst Well": scored["Well Name"].iloc[0] if len(scored) else "",
+        "Worst Score": round(float(scored["TerribleScore"].iloc[0]), 3) if len(scored) else None,
+        "File": path.name,
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Run the well-review flags/score pipeline without the dashboard.")
+    ap.add_argument("files", nargs="*", help="CSV/XLS/XLSX reports (default: recent files in --data-dir)")
+    ap.add_argument("--data-dir", default="data", help="folder scanned when no files are given")
+    ap.add_argument("--settings", default="customer_settings.json", help="thresholds/weights per customer")
+    ap.add_argument("--out", default="well_review_out", help="output directory")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    ap.add_argument("--customer", help="customer name for files without a Customer column")
+    ap.add_argument("--all-columns", action="store_true", help="write every aggregated column")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    paths = [pathlib.Path(f) for f in args.files] or recent_sources(pathlib.Path(args.data_dir), dt.date.today())
+    if not paths:
+        print("❌ No input files given and none recent in", args.data_dir, file=sys.stderr)
+        return 1
+
+    settings = well_settings.SettingsStore(args.settings).load()
+    out_dir = pathlib.Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        # ── parse ──
+        dfs = list(pool.map(parse_file, [str(p) for p in paths]))
+        for p, df in zip(paths, dfs):
+            print(f"   📥 Loaded `{p.name}` ({len(df)} rows)", flush=True)
+        df_raw = well_engine.standardize_raw(dfs)
+        if "Customer" not in df_raw.columns:
+            df_raw["Customer"] = args.customer or NO_CUSTOMER
+
+        # ── aggregate ──
+        df3, last_dates, hist_days = well_engine.aggregate_wells(df_raw)
+        well2cust = well_engine.well_customer_map(df_raw)
+        df3["Customer"] = df3["Well Name"].map(well2cust).fillna(NO_CUSTOMER)
+        print(f"   🧮 {len(df3)} wells over {hist_days} day(s): {', '.join(map(str, last_dates))}", flush=True)
+
+        # ── flags → score, one task per customer ──
+        futures = []
+        for customer, part in df3.groupby("Customer", sort=True):
+            thr, weights = well_engine.thresholds_for(settings, customer)
+            futures.append(pool.submit(
+                score_customer, customer, part, hist_days, thr, weights, str(out_dir), args.all_columns,
+            ))
+        summary = pd.DataFrame([f.result() for f in futures])
+
+    summary.to_csv(out_dir / "summary.csv", index=False)
+    print(summary.to_string(index=False))
+    print(f"✅ {len(summary)} customer file(s) written to {out_dir} in {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
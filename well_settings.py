@@ -0,0 +1,143 @@
+# well_settings.py – cached, atomic store for customer_settings.json
+# -----------------------------------------------------------------------------------------
+# • load(): parsed settings cached by the file's (mtime, size); the file is stat'ed at
+#   most once every `max_age` seconds, so reruns with nothing changed do no I/O at all
+# • save()/update(): one customer key at a time, merged into the current file contents
+#   and written to a temp file + os.replace – a reader never sees a half-written file
+# • Concurrent edits: a writer passes the digest of the entry it started from; if
+#   another session saved that entry since, SettingsConflict is raised instead of
+#   overwriting it. Other customers' entries are never touched.
+# • One store per process (the dashboard keeps it in st.cache_resource); writes are
+#   serialised with a lock. No Streamlit import.
+
+import copy
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+import time
+
+DEFAULT_KEY = "DEFAULT"
+
+
+class SettingsConflict(Exception):
+    """The entry was changed by someone else since the caller read it."""
+
+    def __init__(self, key: str, current):
+        super().__init__(f"settings for {key!r} were changed by another session")
+        self.key = key
+        self.current = current
+
+
+def entry_digest(value) -> str:
+    """Stable fingerprint of one settings entry (None = entry absent)."""
+    raw = json.dumps(value, sort_keys=True, default=str).encode()
+    return hashlib.md5(raw).hexdigest()
+
+
+class SettingsStore:
+    def __init__(self, path, max_age: float = 2.0):
+        self.path = pathlib.Path(path)
+        self.max_age = max_age
+        self.error = None          # last parse error, for the UI to show
+        self._lock = threading.Lock()
+        self._settings = None
+        self._stamp = None         # (mtime_ns, size) of the parsed file
+        self._checked = 0.0        # monotonic time of the last stat()
+
+    # ───── reading ─────
+    def _file_stamp(self):
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _read(self) -> dict:
+        """Parse the file as it is now (caller holds the lock)."""
+        stamp = self._file_stamp()
+        self.error = None
+        settings = {}
+        if stamp is not None:
+            try:
+                settings = json.loads(self.path.read_text())
+            except Exception as e:
+                self.error = e
+                settings = {}
+        settings.setdefault(DEFAULT_KEY, {})
+        self._settings, self._stamp = settings, stamp
+        self._checked = time.monotonic()
+        return settings
+
+    def _refresh(self) -> dict:
+        if self._settings is None:
+            return self._read()
+        now = time.monotonic()
+        if now - self._checked < self.max_age:
+            return self._settings
+        self._checked = now
+        if self._file_stamp() != self._stamp:
+            return self._read()
+        return self._settings
+
+    def load(self) -> dict:
+        """
+        Current settings. The returned dict is shared between sessions:
+        treat it as read-only and change settings through save()/update().
+        """
+        with self._lock:
+            return self._refresh()
+
+    def digest(self, key: str) -> str:
+        return entry_digest(self.load().get(key))
+
+    # ───── writing ─────
+    def _write(self, settings: dict):
+        """temp file in the same folder + os.replace → atomic on POSIX and Windows."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=f".{self.path.name}.", suffix=".tmp", dir=self.path.parent)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(settings, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            pathlib.Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def update(self, key: str, fn, expected: str | None = None) -> str:
+        """
+        Replace settings[key] with fn(deep copy of the current entry or None);
+        fn returning None removes the entry (DEFAULT is reset to {} instead).
+        The file is re-read first, so other keys saved meanwhile are kept.
+        With `expected` set, raises SettingsConflict if the entry on disk no
+        longer matches it. Returns the new entry's digest.
+        """
+        with self._lock:
+            if self._settings is None or self._file_stamp() != self._stamp:
+                self._read()
+            current = self._settings
+            if expected is not None and entry_digest(current.get(key)) != expected:
+                raise SettingsConflict(key, copy.deepcopy(current.get(key)))
+
+            value = fn(copy.deepcopy(current.get(key)))
+            updated = dict(current)
+            if value is None:
+                updated.pop(key, None)
+            else:
+                updated[key] = value
+            updated.setdefault(DEFAULT_KEY, {})
+            self._write(updated)
+            self._settings, self._stamp = updated, self._file_stamp()
+            self._checked = time.monotonic()
+            return entry_digest(updated.get(key))
+
+    def save(self, key: str, value, expected: str | None = None) -> str:
+        """settings[key] = value (None removes the entry)."""
+        return self.update(key, lambda _: copy.deepcopy(value), expected)
+
+    def remove(self, key: str, expected: str | None = None) -> str:
+        return self.update(key, lambda _: None, expected)